@@ -19,8 +19,8 @@
     'depends': ['base', 'web'],
     'data': [
         'security/ir.model.access.csv',
+        'data/counter_buffer_data.xml',
         # 'views/views.xml',
-        # 'data/data.xml',
     ],
     'demo': [],
     'installable': True,
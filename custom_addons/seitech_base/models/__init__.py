@@ -1,3 +1,2 @@
 # -*- coding: utf-8 -*-
-# Add your model imports here
-# from . import your_model
+from . import counter_buffer
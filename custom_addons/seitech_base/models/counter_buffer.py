@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+
+
+class CounterBuffer(models.Model):
+    """Append-only buffer of counter increments.
+
+    High-frequency counters (views, helpful votes, ...) are not written on
+    their record: each increment is appended here, and a cron folds the
+    pending rows into the target columns with atomic ``x = x + n`` batches.
+    Target rows are never read-modify-written, so concurrent clicks neither
+    lock each other nor lose counts.
+    """
+    _name = 'seitech.counter.buffer'
+    _description = 'Buffered Counter Increment'
+    _log_access = False
+
+    model = fields.Char(string='Model', required=True)
+    res_id = fields.Integer(string='Record ID', required=True)
+    field_name = fields.Char(string='Field', required=True)
+    delta = fields.Integer(string='Delta', required=True, default=1)
+
+    def _check_counter_field(self, model, field_name):
+        """Return the (table, column) of an integer counter, or raise."""
+        if model not in self.env:
+            raise ValidationError(f'Unknown model: {model}')
+        Model = self.env[model]
+        field = Model._fields.get(field_name)
+        if not field or field.type != 'integer' or not field.store or field.compute:
+            raise ValidationError(f'{model}.{field_name} is not a stored integer counter.')
+        return Model._table, field_name
+
+    @api.model
+    def increment(self, records, field_name, delta=1):
+        """Queue ``delta`` on ``field_name`` of every record in ``records``."""
+        if not records:
+            return
+        self._check_counter_field(records._name, field_name)
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(records))
+        params = [value for res_id in records.ids for value in (records._name, res_id, field_name, delta)]
+        self.env.cr.execute(f"""
+            INSERT INTO seitech_counter_buffer (model, res_id, field_name, delta)
+            VALUES {values}
+        """, params)
+
+    @api.model
+    def _flush_counters(self, limit=10000):
+        """Fold up to ``limit`` pending increments into their counters.
+
+        Rows are claimed with SKIP LOCKED so concurrent flushes never apply
+        the same increment twice. Returns the number of rows folded.
+        """
+        self.env.cr.execute("""
+            DELETE FROM seitech_counter_buffer
+             WHERE id IN (
+                    SELECT id FROM seitech_counter_buffer
+                     ORDER BY id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                   )
+         RETURNING model, res_id, field_name, delta
+        """, (limit,))
+        rows = self.env.cr.fetchall()
+
+        totals = defaultdict(lambda: defaultdict(int))
+        for model, res_id, field_name, delta in rows:
+            totals[model, field_name][res_id] += delta
+
+        for (model, field_name), deltas in totals.items():
+            try:
+                table, column = self._check_counter_field(model, field_name)
+            except ValidationError:
+                # Model or field removed since the increment was queued
+                continue
+            values = ', '.join(['(%s, %s)'] * len(deltas))
+            params = [value for res_id, delta in deltas.items() for value in (res_id, delta)]
+            self.env.cr.execute(f"""
+                UPDATE "{table}" AS target
+                   SET "{column}" = COALESCE(target."{column}", 0) + pending.delta
+                  FROM (VALUES {values}) AS pending(id, delta)
+                 WHERE target.id = pending.id
+            """, params)
+            self.env[model].browse(list(deltas)).invalidate_recordset([field_name])
+        return len(rows)
+
+    @api.model
+    def _cron_flush_counters(self, batch_size=10000):
+        """Cron job: flush all pending increments, committing per batch."""
+        while self._flush_counters(limit=batch_size) == batch_size:
+            self.env.cr.commit()
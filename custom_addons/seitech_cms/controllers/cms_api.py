@@ -15,17 +15,43 @@ class CmsApiController(http.Controller):
             headers={'Content-Type': 'application/json'}
         )
 
+    def _get_request_lang(self, lang=None):
+        """Resolve the locale of a request (explicit ``lang`` param wins)"""
+        if lang and lang in dict(request.env['res.lang'].get_installed()):
+            return lang
+        return request.env.lang or 'en_US'
+
+    def _cached_response(self, key, lang=None, not_found='Content not found'):
+        """Serve pre-serialized CMS content, revalidated with the version as ETag"""
+        lang = self._get_request_lang(lang)
+        version, payload = request.env['seitech.cms.content'].sudo().get_serialized(key, lang)
+        etag = f'{version}-{lang}'
+        headers = {
+            'Content-Type': 'application/json',
+            'ETag': f'"{etag}"',
+            'Cache-Control': 'public, no-cache',
+            'X-Content-Version': str(version),
+        }
+        if request.httprequest.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        if payload == 'null':
+            return self._json_response({
+                'success': False,
+                'message': not_found
+            }, 404)
+        return Response(
+            f'{{"success": true, "version": {version}, "data": {payload}}}',
+            status=200,
+            headers=headers,
+        )
+
     # ==================== Site Settings ====================
 
     @http.route('/api/cms/settings', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
-    def get_site_settings(self):
+    def get_site_settings(self, **kwargs):
         """Get global site settings"""
         try:
-            settings = request.env['seitech.cms.site.settings'].sudo().get_settings()
-            return self._json_response({
-                'success': True,
-                'data': settings.get_api_data()
-            })
+            return self._cached_response('settings', kwargs.get('lang'))
         except Exception as e:
             return self._json_response({
                 'success': False,
@@ -33,18 +59,10 @@ class CmsApiController(http.Controller):
             }, 500)
 
     @http.route('/api/cms/navigation/<string:menu_type>', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
-    def get_navigation(self, menu_type):
+    def get_navigation(self, menu_type, **kwargs):
         """Get navigation menu by type"""
         try:
-            items = request.env['seitech.cms.navigation'].sudo().search([
-                ('menu_type', '=', menu_type),
-                ('is_published', '=', True),
-                ('parent_id', '=', False),  # Only top-level items
-            ])
-            return self._json_response({
-                'success': True,
-                'data': [item.get_api_data() for item in items]
-            })
+            return self._cached_response(f'navigation:{menu_type}', kwargs.get('lang'))
         except Exception as e:
             return self._json_response({
                 'success': False,
@@ -54,16 +72,10 @@ class CmsApiController(http.Controller):
     # ==================== Pages & Sections ====================
 
     @http.route('/api/cms/pages', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
-    def get_pages(self):
+    def get_pages(self, **kwargs):
         """Get all published pages"""
         try:
-            pages = request.env['seitech.cms.page'].sudo().search([
-                ('is_published', '=', True)
-            ])
-            return self._json_response({
-                'success': True,
-                'data': [page.get_api_data() for page in pages]
-            })
+            return self._cached_response('pages', kwargs.get('lang'))
         except Exception as e:
             return self._json_response({
                 'success': False,
@@ -71,24 +83,25 @@ class CmsApiController(http.Controller):
             }, 500)
 
     @http.route('/api/cms/pages/<string:slug>', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
-    def get_page_by_slug(self, slug):
+    def get_page_by_slug(self, slug, **kwargs):
         """Get page content by slug"""
         try:
-            page = request.env['seitech.cms.page'].sudo().search([
-                ('slug', '=', slug),
-                ('is_published', '=', True)
-            ], limit=1)
+            return self._cached_response(f'page:{slug}', kwargs.get('lang'), 'Page not found')
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e)
+            }, 500)
 
-            if not page:
-                return self._json_response({
-                    'success': False,
-                    'message': 'Page not found'
-                }, 404)
+    @http.route('/api/cms/bundle/<string:slug>', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
+    def get_page_bundle(self, slug, **kwargs):
+        """Get settings, all navigation menus and page content in one payload.
 
-            return self._json_response({
-                'success': True,
-                'data': page.get_api_data()
-            })
+        The response carries the CMS content version as ETag; clients send it
+        back in If-None-Match and get a 304 until any CMS record changes.
+        """
+        try:
+            return self._cached_response(f'bundle:{slug}', kwargs.get('lang'), 'Page not found')
         except Exception as e:
             return self._json_response({
                 'success': False,
@@ -482,67 +495,10 @@ class CmsApiController(http.Controller):
     # ==================== Combined Homepage Data ====================
 
     @http.route('/api/cms/homepage', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
-    def get_homepage_data(self):
+    def get_homepage_data(self, **kwargs):
         """Get all homepage content in a single request"""
         try:
-            # Get homepage page sections
-            homepage = request.env['seitech.cms.page'].sudo().search([
-                ('slug', '=', 'home'),
-                ('is_published', '=', True)
-            ], limit=1)
-
-            # Get featured testimonials
-            testimonials = request.env['seitech.cms.testimonial'].sudo().search([
-                ('is_published', '=', True),
-                ('is_featured', '=', True)
-            ], limit=6)
-
-            # Get homepage partners
-            partners = request.env['seitech.cms.partner'].sudo().search([
-                ('is_published', '=', True),
-                ('show_on_homepage', '=', True)
-            ])
-
-            # Get homepage team members
-            team = request.env['seitech.cms.team.member'].sudo().search([
-                ('is_published', '=', True),
-                ('show_on_homepage', '=', True)
-            ])
-
-            # Get featured FAQs
-            faqs = request.env['seitech.cms.faq'].sudo().search([
-                ('is_published', '=', True),
-                ('is_featured', '=', True)
-            ], limit=6)
-
-            # Get homepage statistics
-            statistics = request.env['seitech.cms.statistic'].sudo().search([
-                ('is_published', '=', True),
-                ('display_location', '=', 'homepage')
-            ], order='sequence')
-
-            # Get featured services
-            services = request.env['seitech.cms.service'].sudo().search([
-                ('is_published', '=', True),
-                ('show_on_homepage', '=', True)
-            ], order='sequence', limit=6)
-
-            # Get site settings
-            settings = request.env['seitech.cms.site.settings'].sudo().get_settings()
-
-            return self._json_response({
-                'success': True,
-                'data': {
-                    'page': homepage.get_api_data() if homepage else None,
-                    'testimonials': [t.get_api_data() for t in testimonials],
-                    'partners': [p.get_api_data() for p in partners],
-                    'team': [m.get_api_data() for m in team],
-                    'faqs': [f.get_api_data() for f in faqs],
-                    'statistics': [s.get_api_data() for s in statistics],
-                    'services': [s.get_api_data() for s in services],
-                    'settings': settings.get_api_data(),
-                }
-            })
+            return self._cached_response('homepage', kwargs.get('lang'))
         except Exception as e:
             return self._json_response({
                 'success': False,
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from . import content
 from . import page_section
 from . import testimonial
 from . import faq
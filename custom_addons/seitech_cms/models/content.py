@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import json
+from odoo import models, api, tools
+
+CONTENT_VERSION_SEQUENCE = 'seitech_cms_content_version_seq'
+
+
+class CmsContentMixin(models.AbstractModel):
+    """Bumps the CMS content version on any change to the inheriting model"""
+    _name = 'seitech.cms.content.mixin'
+    _description = 'CMS Content Versioning'
+
+    # Fields whose writes do not change published content (e.g. analytics)
+    _cms_volatile_fields = ()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['seitech.cms.content']._bump_content_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) - set(self._cms_volatile_fields):
+            self.env['seitech.cms.content']._bump_content_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['seitech.cms.content']._bump_content_version()
+        return res
+
+
+class CmsContent(models.AbstractModel):
+    """Versioned, pre-serialized CMS content served to the frontend"""
+    _name = 'seitech.cms.content'
+    _description = 'CMS Content Bundle'
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {CONTENT_VERSION_SEQUENCE}")
+
+    @api.model
+    def get_content_version(self):
+        """Return the current content version (monotonically increasing)"""
+        self.env.cr.execute(f"""
+            SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {CONTENT_VERSION_SEQUENCE}
+        """)
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _bump_content_version(self):
+        """Move to a new content version; cached payloads of older versions are
+        never served again.
+
+        Sequences take no row lock, so concurrent CMS edits do not serialize.
+        As they are not transactional either, the version is bumped again after
+        commit: a worker that rebuilt a payload from the not yet committed data
+        in between cached it under a version that is then already stale.
+        """
+        self.env.cr.execute(f"SELECT nextval('{CONTENT_VERSION_SEQUENCE}')")
+        if not self.env.cr.postcommit.data.get(CONTENT_VERSION_SEQUENCE):
+            self.env.cr.postcommit.data[CONTENT_VERSION_SEQUENCE] = True
+            registry = self.env.registry
+
+            @self.env.cr.postcommit.add
+            def bump_after_commit():
+                with registry.cursor() as cr:
+                    cr.execute(f"SELECT nextval('{CONTENT_VERSION_SEQUENCE}')")
+
+    @api.model
+    def get_serialized(self, key, lang=None):
+        """Return ``(version, json)`` for a content key in a given locale.
+
+        Keys: ``settings``, ``pages``, ``homepage``, ``navigation:<menu_type>``,
+        ``page:<slug>`` and ``bundle:<slug>``. The JSON is ``null`` when the
+        key resolves to nothing (e.g. an unknown page slug).
+        """
+        lang = lang or self.env.lang or 'en_US'
+        version = self.get_content_version()
+        kind, __, arg = key.partition(':')
+        if kind == 'navigation':
+            menu_types = self.env['seitech.cms.navigation']._fields['menu_type'].get_values(self.env)
+            if arg not in menu_types:
+                return version, 'null'
+        try:
+            return version, self._get_serialized_cached(key, lang, version)
+        except LookupError:
+            return version, 'null'
+
+    @api.model
+    @tools.ormcache('key', 'lang', 'version')
+    def _get_serialized_cached(self, key, lang, version):
+        content = self.sudo().with_context(lang=lang)
+        kind, __, arg = key.partition(':')
+        builder = getattr(content, f'_build_{kind}', None)
+        if builder is None:
+            raise ValueError(f'Unknown CMS content key: {key}')
+        data = builder(arg) if arg else builder()
+        if data is None:
+            # Raise rather than return, so that requests for unknown slugs do
+            # not fill the cache with misses
+            raise LookupError(key)
+        return json.dumps(data, default=str)
+
+    # ==================== Builders ====================
+
+    def _build_settings(self):
+        return self.env['seitech.cms.site.settings'].get_settings().get_api_data()
+
+    def _build_navigation(self, menu_type):
+        return self.env['seitech.cms.navigation'].get_menu_tree(menu_type)
+
+    def _build_pages(self):
+        pages = self.env['seitech.cms.page'].search([('is_published', '=', True)])
+        return [page.get_api_data() for page in pages]
+
+    def _build_page(self, slug):
+        page = self.env['seitech.cms.page'].search([
+            ('slug', '=', slug),
+            ('is_published', '=', True),
+        ], limit=1)
+        return page.get_api_data() if page else None
+
+    def _build_homepage(self):
+        testimonials = self.env['seitech.cms.testimonial'].search([
+            ('is_published', '=', True),
+            ('is_featured', '=', True),
+        ], limit=6)
+        partners = self.env['seitech.cms.partner'].search([
+            ('is_published', '=', True),
+            ('show_on_homepage', '=', True),
+        ])
+        team = self.env['seitech.cms.team.member'].search([
+            ('is_published', '=', True),
+            ('show_on_homepage', '=', True),
+        ])
+        faqs = self.env['seitech.cms.faq'].search([
+            ('is_published', '=', True),
+            ('is_featured', '=', True),
+        ], limit=6)
+        statistics = self.env['seitech.cms.statistic'].search([
+            ('is_published', '=', True),
+            ('display_location', '=', 'homepage'),
+        ], order='sequence')
+        services = self.env['seitech.cms.service'].search([
+            ('is_published', '=', True),
+            ('show_on_homepage', '=', True),
+        ], order='sequence', limit=6)
+        return {
+            'page': self._build_page('home'),
+            'testimonials': [t.get_api_data() for t in testimonials],
+            'partners': [p.get_api_data() for p in partners],
+            'team': [m.get_api_data() for m in team],
+            'faqs': [f.get_api_data() for f in faqs],
+            'statistics': [s.get_api_data() for s in statistics],
+            'services': [s.get_api_data() for s in services],
+            'settings': self._build_settings(),
+        }
+
+    def _build_bundle(self, slug):
+        """Everything a page render needs: settings, all menus and the page"""
+        page = self._build_page(slug)
+        if page is None:
+            return None
+        menu_types = self.env['seitech.cms.navigation']._fields['menu_type'].get_values(self.env)
+        trees = self.env['seitech.cms.navigation'].get_menu_trees()
+        bundle = {
+            'settings': self._build_settings(),
+            'navigation': {menu_type: trees.get(menu_type, []) for menu_type in menu_types},
+            'page': page,
+        }
+        if slug == 'home':
+            homepage = self._build_homepage()
+            for key in ('testimonials', 'partners', 'team', 'faqs', 'statistics', 'services'):
+                bundle[key] = homepage[key]
+        return bundle
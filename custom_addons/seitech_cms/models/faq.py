@@ -6,6 +6,7 @@ class CmsFaqCategory(models.Model):
     """FAQ Categories"""
     _name = 'seitech.cms.faq.category'
     _description = 'FAQ Category'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, name'
 
     name = fields.Char(string='Category Name', required=True)
@@ -44,7 +45,9 @@ class CmsFaq(models.Model):
     """Frequently Asked Questions"""
     _name = 'seitech.cms.faq'
     _description = 'FAQ'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'category_id, sequence, id'
+    _cms_volatile_fields = ('view_count', 'helpful_count', 'not_helpful_count')
 
     question = fields.Char(string='Question', required=True)
     answer = fields.Html(string='Answer', required=True)
@@ -83,13 +86,13 @@ class CmsFaq(models.Model):
         }
 
     def action_mark_helpful(self):
-        """Increment helpful count"""
-        self.helpful_count += 1
+        """Increment helpful count (buffered, applied by cron)"""
+        self.env['seitech.counter.buffer'].sudo().increment(self, 'helpful_count')
 
     def action_mark_not_helpful(self):
-        """Increment not helpful count"""
-        self.not_helpful_count += 1
+        """Increment not helpful count (buffered, applied by cron)"""
+        self.env['seitech.counter.buffer'].sudo().increment(self, 'not_helpful_count')
 
     def action_increment_views(self):
-        """Increment view count"""
-        self.view_count += 1
+        """Increment view count (buffered, applied by cron)"""
+        self.env['seitech.counter.buffer'].sudo().increment(self, 'view_count')
@@ -6,6 +6,7 @@ class CmsPage(models.Model):
     """CMS Page - represents a page on the frontend"""
     _name = 'seitech.cms.page'
     _description = 'CMS Page'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, name'
 
     name = fields.Char(string='Page Name', required=True)
@@ -41,6 +42,7 @@ class CmsSection(models.Model):
     """CMS Section - represents a section within a page"""
     _name = 'seitech.cms.section'
     _description = 'CMS Page Section'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, id'
 
     name = fields.Char(string='Section Name', required=True)
@@ -162,6 +164,7 @@ class CmsSectionItem(models.Model):
     """Section Items - for features, services, stats, etc."""
     _name = 'seitech.cms.section.item'
     _description = 'CMS Section Item'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, id'
 
     name = fields.Char(string='Item Name', required=True)
@@ -6,6 +6,7 @@ class CmsPartner(models.Model):
     """Partners, Accreditations, Client Logos"""
     _name = 'seitech.cms.partner'
     _description = 'CMS Partner/Accreditation'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'partner_type, sequence, name'
 
     name = fields.Char(string='Partner Name', required=True)
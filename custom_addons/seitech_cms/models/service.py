@@ -6,6 +6,7 @@ class CmsServiceCategory(models.Model):
     """Consultancy Service Categories"""
     _name = 'seitech.cms.service.category'
     _description = 'Service Category'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, name'
 
     name = fields.Char(string='Category Name', required=True)
@@ -43,6 +44,7 @@ class CmsService(models.Model):
     """Consultancy Services"""
     _name = 'seitech.cms.service'
     _description = 'Consultancy Service'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'category_id, sequence, name'
 
     name = fields.Char(string='Service Name', required=True)
@@ -140,6 +142,7 @@ class CmsStatistic(models.Model):
     """Site Statistics/Metrics for display"""
     _name = 'seitech.cms.statistic'
     _description = 'Site Statistic'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence'
 
     name = fields.Char(string='Statistic Name', required=True)
@@ -6,6 +6,7 @@ class CmsSiteSettings(models.Model):
     """Global Site Settings - Singleton pattern"""
     _name = 'seitech.cms.site.settings'
     _description = 'Site Settings'
+    _inherit = ['seitech.cms.content.mixin']
 
     name = fields.Char(string='Site Name', default='SEI Tech International')
 
@@ -145,6 +146,7 @@ class CmsNavigation(models.Model):
     """Navigation Menu Items"""
     _name = 'seitech.cms.navigation'
     _description = 'Navigation Menu'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'menu_type, sequence'
 
     name = fields.Char(string='Menu Item Name', required=True)
@@ -170,8 +172,8 @@ class CmsNavigation(models.Model):
     is_highlighted = fields.Boolean(string='Highlighted', help='For CTA buttons in nav')
     sequence = fields.Integer(string='Sequence', default=10)
 
-    def get_api_data(self):
-        """Return data formatted for API response"""
+    def _get_node_data(self):
+        """Return menu item data without its children"""
         self.ensure_one()
         return {
             'id': self.id,
@@ -181,5 +183,43 @@ class CmsNavigation(models.Model):
             'description': self.description or '',
             'openNewTab': self.open_new_tab,
             'isHighlighted': self.is_highlighted,
-            'children': [child.get_api_data() for child in self.child_ids.filtered('is_published')],
         }
+
+    def get_api_data(self):
+        """Return data formatted for API response"""
+        self.ensure_one()
+        data = self._get_node_data()
+        data['children'] = [child.get_api_data() for child in self.child_ids.filtered('is_published')]
+        return data
+
+    @api.model
+    def get_menu_tree(self, menu_type):
+        """Return the published menu of a type as nested API data."""
+        return self.get_menu_trees().get(menu_type, [])
+
+    @api.model
+    def get_menu_trees(self):
+        """Return ``{menu_type: nested API data}`` for every published menu.
+
+        All published items are loaded in one ordered query and assembled in
+        memory, instead of one query per level and branch.
+        """
+        items = self.search_fetch(
+            [('is_published', '=', True)],
+            ['name', 'menu_type', 'url', 'page_id', 'parent_id', 'icon',
+             'description', 'open_new_tab', 'is_highlighted'],
+            order='sequence, id',
+        )
+        nodes = {}
+        for item in items:
+            nodes[item.id] = dict(item._get_node_data(), children=[])
+
+        trees = {}
+        for item in items:
+            if item.parent_id:
+                # Children of unpublished items are dropped with their parent
+                if item.parent_id.id in nodes:
+                    nodes[item.parent_id.id]['children'].append(nodes[item.id])
+            else:
+                trees.setdefault(item.menu_type, []).append(nodes[item.id])
+        return trees
@@ -6,6 +6,7 @@ class CmsTeamMember(models.Model):
     """Team Members / Instructors / Staff"""
     _name = 'seitech.cms.team.member'
     _description = 'Team Member'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, name'
 
     name = fields.Char(string='Full Name', required=True)
@@ -6,6 +6,7 @@ class CmsTestimonial(models.Model):
     """Customer Testimonials"""
     _name = 'seitech.cms.testimonial'
     _description = 'CMS Testimonial'
+    _inherit = ['seitech.cms.content.mixin']
     _order = 'sequence, id'
 
     name = fields.Char(string='Customer Name', required=True)
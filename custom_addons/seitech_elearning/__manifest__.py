@@ -50,6 +50,12 @@
         'data/sequence_data.xml',
         'data/email_templates.xml',
         'data/cron_data.xml',
+        'data/certificate_queue_data.xml',
+        'data/enrollment_import_data.xml',
+        'data/mail_queue_data.xml',
+        'data/schedule_seat_data.xml',
+        'data/schedule_reminder_data.xml',
+        'data/checkout_data.xml',
         'data/badge_data.xml',
         'data/demo_content.xml',
         # Reports (must be before views that reference them)
@@ -57,6 +63,9 @@
         # Views
         'views/res_users_views.xml',
         'views/enrollment_views.xml',
+        'views/enrollment_import_views.xml',
+        'views/mail_queue_views.xml',
+        'views/checkout_views.xml',
         'views/certificate_views.xml',
         'views/assignment_views.xml',
         'views/schedule_views.xml',
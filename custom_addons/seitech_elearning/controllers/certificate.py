@@ -2,6 +2,9 @@
 from odoo import http
 from odoo.http import request
 
+# Maximum number of codes accepted by one batch verification
+MAX_BATCH_VERIFICATIONS = 500
+
 
 class CertificateController(http.Controller):
     """Controllers for certificate verification and download."""
@@ -17,6 +20,8 @@ class CertificateController(http.Controller):
         if code:
             result = Certificate.verify_certificate(code)
             certificate = result.get('certificate')
+            if certificate:
+                certificate._ensure_qr_codes()
 
         return request.render('seitech_elearning.certificate_verify', {
             'result': result,
@@ -33,26 +38,32 @@ class CertificateController(http.Controller):
     def verify_certificate_api(self, code, **kwargs):
         """API endpoint for certificate verification."""
         Certificate = request.env['seitech.certificate'].sudo()
-        result = Certificate.verify_certificate(code)
-
-        if result.get('valid') and result.get('certificate'):
-            cert = result['certificate']
+        return self._format_verification(Certificate.get_verification_result(code))
+
+    @http.route('/api/certificate/verify/batch', type='json', auth='public')
+    def verify_certificates_batch_api(self, codes, **kwargs):
+        """Verify many certificate codes at once (e.g. from HR systems)."""
+        if not isinstance(codes, list):
+            return {'success': False, 'message': 'codes must be a list'}
+        if len(codes) > MAX_BATCH_VERIFICATIONS:
             return {
-                'valid': True,
-                'certificate': {
-                    'number': cert.name,
-                    'holder_name': cert.user_id.name,
-                    'course_name': cert.channel_id.name,
-                    'issue_date': cert.issue_date.isoformat() if cert.issue_date else None,
-                    'expiration_date': cert.expiration_date.isoformat() if cert.expiration_date else None,
-                    'completion_percentage': cert.completion_percentage,
-                }
-            }
-        else:
-            return {
-                'valid': False,
-                'error': result.get('error', 'Verification failed'),
+                'success': False,
+                'message': f'At most {MAX_BATCH_VERIFICATIONS} codes can be verified at once',
             }
+        Certificate = request.env['seitech.certificate'].sudo()
+        results = Certificate.get_verification_results([str(code) for code in codes])
+        return {
+            'success': True,
+            'results': {code: self._format_verification(result) for code, result in results.items()},
+        }
+
+    def _format_verification(self, result):
+        if result.get('valid'):
+            return {'valid': True, 'certificate': result['data']}
+        return {
+            'valid': False,
+            'error': result.get('error', 'Verification failed'),
+        }
 
     @http.route('/my/certificates/<int:cert_id>', type='http', auth='user', website=True)
     def view_certificate(self, cert_id, **kwargs):
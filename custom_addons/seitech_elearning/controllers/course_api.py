@@ -70,31 +70,39 @@ class CourseApiController(http.Controller):
             - limit: Items per page (default: 12)
             - category: Category slug or ID
             - level: beginner, intermediate, advanced
-            - delivery: e-learning, face-to-face, virtual, in-house
+            - delivery: Course type (training, documentation)
             - search: Search term
+            - priceMin / priceMax: Price limits
             - sortBy: popularity, price-asc, price-desc, rating, newest
+
+        The response carries ``facets`` with per-category, level, delivery
+        method and price band counts for the current filter set.
         """
         try:
             Channel = request.env['slide.channel'].sudo()
 
-            # Build domain
+            # Build domain (non-faceted filters)
             domain = [('is_published', '=', True)]
 
             # Category filter
+            category_id = None
             if kwargs.get('category'):
                 try:
-                    cat_id = int(kwargs['category'])
-                    domain.append(('seitech_category_id', '=', cat_id))
+                    category_id = int(kwargs['category'])
                 except ValueError:
                     # Try slug lookup
                     Category = request.env['seitech.course.category'].sudo()
                     cat = Category.search([('slug', '=', kwargs['category'])], limit=1)
-                    if cat:
-                        domain.append(('seitech_category_id', '=', cat.id))
+                    category_id = cat.id or None
 
             # Level filter
-            if kwargs.get('level'):
-                domain.append(('difficulty_level', '=', kwargs['level']))
+            level = kwargs.get('level') or None
+
+            # Delivery filter (only values known to slide.channel are applied)
+            delivery = kwargs.get('delivery') or None
+            delivery_values = dict(Channel._fields['channel_type']._description_selection(request.env))
+            if delivery not in delivery_values:
+                delivery = None
 
             # Search filter
             if kwargs.get('search'):
@@ -111,6 +119,19 @@ class CourseApiController(http.Controller):
             if kwargs.get('priceMax'):
                 domain.append(('list_price', '<=', float(kwargs['priceMax'])))
 
+            # Facet counts and total, from a single grouped aggregation
+            facets = Channel._get_catalogue_facets(
+                domain, category_id=category_id, level=level, delivery=delivery,
+            )
+
+            facet_domain = list(domain)
+            if category_id:
+                facet_domain.append(('seitech_category_id', '=', category_id))
+            if level:
+                facet_domain.append(('difficulty_level', '=', level))
+            if delivery:
+                facet_domain.append(('channel_type', '=', delivery))
+
             # Sorting
             sort_by = kwargs.get('sortBy', 'popularity')
             order_mapping = {
@@ -127,21 +148,21 @@ class CourseApiController(http.Controller):
             limit = min(int(kwargs.get('limit', 12)), 100)
             offset = (page - 1) * limit
 
-            # Get total count
-            total = Channel.search_count(domain)
+            total = facets['total']
 
             # Get courses
-            courses = Channel.search(domain, offset=offset, limit=limit, order=order)
+            courses = Channel.search(facet_domain, offset=offset, limit=limit, order=order)
 
             # Get categories for filter options
             Category = request.env['seitech.course.category'].sudo()
             categories = Category.search([('is_published', '=', True)])
+            category_counts = {c['id']: c['count'] for c in facets['categories']}
             category_data = [{
                 'id': cat.id,
                 'name': cat.name,
                 'slug': cat.slug or str(cat.id),
                 'description': cat.description or '',
-                'courseCount': cat.course_count or 0,
+                'courseCount': category_counts.get(cat.id, 0),
                 'parentId': cat.parent_id.id if cat.parent_id else None,
             } for cat in categories]
 
@@ -157,9 +178,15 @@ class CourseApiController(http.Controller):
                     },
                     'categories': category_data,
                     'filters': {
-                        'levels': ['beginner', 'intermediate', 'advanced'],
-                        'deliveryMethods': ['e-learning', 'face-to-face', 'virtual', 'in-house'],
-                        'priceRange': {'min': 0, 'max': 5000},
+                        'levels': [f['value'] for f in facets['levels']],
+                        'deliveryMethods': [f['value'] for f in facets['deliveryMethods']],
+                        'priceRange': facets['priceRange'],
+                    },
+                    'facets': {
+                        'categories': facets['categories'],
+                        'levels': facets['levels'],
+                        'deliveryMethods': facets['deliveryMethods'],
+                        'priceBands': facets['priceBands'],
                     },
                 },
             })
@@ -208,30 +235,8 @@ class CourseApiController(http.Controller):
 
     def _get_course_detail_response(self, course):
         """Build detailed course response with curriculum and FAQs."""
-        # Get curriculum (slides grouped by category)
-        curriculum = []
-        if course.slide_ids:
-            categories_map = {}
-            for slide in course.slide_ids.sorted(key=lambda s: s.sequence):
-                cat_id = slide.category_id.id if slide.category_id else 0
-                cat_name = slide.category_id.name if slide.category_id else 'Uncategorized'
-
-                if cat_id not in categories_map:
-                    categories_map[cat_id] = {
-                        'id': cat_id,
-                        'name': cat_name,
-                        'slides': [],
-                    }
-
-                categories_map[cat_id]['slides'].append({
-                    'id': slide.id,
-                    'name': slide.name,
-                    'slideType': slide.slide_type,
-                    'duration': slide.completion_time or 0,
-                    'isPreview': slide.is_preview or False,
-                })
-
-            curriculum = list(categories_map.values())
+        # Get curriculum (slides grouped by section), cached per course version
+        curriculum = course._get_curriculum()['sections']
 
         # Get course FAQs (if slide.channel.faq model exists)
         faqs = []
@@ -250,6 +255,59 @@ class CourseApiController(http.Controller):
             'data': course_data,
         })
 
+    @http.route('/api/courses/<int:course_id>/curriculum', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
+    def get_course_curriculum(self, course_id, **kwargs):
+        """Get the curriculum outline (sections without lessons) of a course."""
+        try:
+            course = request.env['slide.channel'].sudo().browse(course_id)
+            if not course.exists() or not course.is_published:
+                return self._json_response({
+                    'success': False,
+                    'message': 'Course not found',
+                    'data': None,
+                }, status=404)
+
+            curriculum = course._get_curriculum()
+            return self._json_response({
+                'success': True,
+                'data': {
+                    'version': curriculum['version'],
+                    'sections': curriculum['outline'],
+                },
+            })
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e),
+                'data': None,
+            }, status=500)
+
+    @http.route('/api/courses/<int:course_id>/curriculum/<int:section_id>', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
+    def get_course_curriculum_section(self, course_id, section_id, **kwargs):
+        """Get the lessons of a single curriculum section (0 = uncategorized)."""
+        try:
+            course = request.env['slide.channel'].sudo().browse(course_id)
+            section = None
+            if course.exists() and course.is_published:
+                section = course._get_curriculum_section(section_id)
+            if not section:
+                return self._json_response({
+                    'success': False,
+                    'message': 'Section not found',
+                    'data': None,
+                }, status=404)
+
+            return self._json_response({
+                'success': True,
+                'data': section,
+            })
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e),
+                'data': None,
+            }, status=500)
+
     @http.route('/api/courses/<int:course_id>', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
     def get_course_detail(self, course_id, **kwargs):
         """Get single course details by ID."""
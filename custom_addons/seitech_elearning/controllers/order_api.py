@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 """Order API controller for course purchases."""
+import hashlib
 import json
 import logging
 from odoo import http
@@ -8,6 +9,14 @@ from odoo.http import request, Response
 _logger = logging.getLogger(__name__)
 
 
+class CheckoutError(Exception):
+    """Checkout failure answered with ``status``; rolls back the checkout."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
 class OrderAPIController(http.Controller):
     """REST API for course orders and checkout."""
 
@@ -20,7 +29,7 @@ class OrderAPIController(http.Controller):
             headers={
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, Idempotency-Key',
             }
         )
 
@@ -32,7 +41,7 @@ class OrderAPIController(http.Controller):
             headers={
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+                'Access-Control-Allow-Headers': 'Content-Type, Authorization, Idempotency-Key',
             }
         )
 
@@ -55,117 +64,47 @@ class OrderAPIController(http.Controller):
                     "price": 295.00
                 }
             ],
-            "paymentMethod": "card" (optional, for future payment integration)
+            "paymentMethod": "card" (optional, for future payment integration),
+            "idempotencyKey": "..." (optional, or the Idempotency-Key header)
         }
+
+        A retry with the same idempotency key gets the stored response of the
+        first request instead of a new order. Enrollments are returned
+        pending and activated shortly after by the checkout cron.
         """
         try:
             # Parse request body
             data = json.loads(request.httprequest.data.decode('utf-8'))
-            customer_data = data.get('customer', {})
-            items = data.get('items', [])
-
-            if not customer_data.get('email'):
-                return self._json_response({
-                    'success': False,
-                    'error': 'Customer email is required'
-                }, status=400)
-
-            if not items:
-                return self._json_response({
-                    'success': False,
-                    'error': 'No items in order'
-                }, status=400)
-
-            # Get or create partner
-            partner = self._get_or_create_partner(customer_data)
-            if not partner:
-                return self._json_response({
-                    'success': False,
-                    'error': 'Failed to create customer'
-                }, status=500)
-
-            # Get or create user for the partner
-            user = self._get_or_create_user(partner)
-
-            # Create order lines
-            order_lines = []
-            course_ids = []
-            Channel = request.env['slide.channel'].sudo()
-
-            for item in items:
-                course_id = item.get('courseId')
-                course = Channel.browse(course_id)
-
-                if not course.exists():
-                    _logger.warning(f"Course {course_id} not found")
-                    continue
-
-                course_ids.append(course_id)
-
-                # Get or create product for course
-                if not course.product_id:
-                    course.action_create_product()
-
-                if course.product_id:
-                    order_lines.append((0, 0, {
-                        'product_id': course.product_id.id,
-                        'product_uom_qty': 1,
-                        'price_unit': item.get('price', course.list_price),
-                        'name': course.name,
-                    }))
+            body_key = data.pop('idempotencyKey', None)
+            key = str(request.httprequest.headers.get('Idempotency-Key') or body_key or '').strip()
+            request_hash = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+            Checkout = request.env['seitech.checkout'].sudo()
+            # A failed checkout rolls back entirely, releasing its idempotency key
+            with request.env.cr.savepoint():
+                if key:
+                    checkout, replay = Checkout._claim(key, request_hash)
+                    if replay:
+                        if checkout.request_hash != request_hash:
+                            raise CheckoutError('Idempotency key already used with a different request', status=422)
+                        return self._json_response(checkout._get_response())
                 else:
-                    # Create order line without product (service)
-                    order_lines.append((0, 0, {
-                        'display_type': 'line_section',
-                        'name': course.name,
-                    }))
-
-            if not course_ids:
-                return self._json_response({
-                    'success': False,
-                    'error': 'No valid courses found'
-                }, status=400)
-
-            # Create sale order
-            SaleOrder = request.env['sale.order'].sudo()
-            order = SaleOrder.create({
-                'partner_id': partner.id,
-                'order_line': order_lines if order_lines else False,
-                'state': 'draft',
-            })
+                    checkout = Checkout.create({'request_hash': request_hash})
 
-            # For now, confirm the order immediately (simulating successful payment)
-            # In production, this would happen after payment confirmation
-            try:
-                order.action_confirm()
-            except Exception as e:
-                _logger.warning(f"Could not confirm order: {e}")
-
-            # Create enrollments directly (as payment is simulated)
-            enrollments = self._create_enrollments(order, user, course_ids)
-
-            return self._json_response({
-                'success': True,
-                'data': {
-                    'orderId': order.id,
-                    'orderReference': order.name,
-                    'total': order.amount_total,
-                    'currency': order.currency_id.name,
-                    'status': order.state,
-                    'enrollments': [{
-                        'id': e.id,
-                        'courseName': e.channel_id.name,
-                        'courseSlug': e.channel_id.seo_name or str(e.channel_id.id),
-                        'status': e.state,
-                    } for e in enrollments]
-                }
-            })
+                order, response = self._place_order(data)
+                checkout._set_confirmed(order, response)
+            return self._json_response(response)
 
         except json.JSONDecodeError:
             return self._json_response({
                 'success': False,
                 'error': 'Invalid JSON in request body'
             }, status=400)
+        except CheckoutError as e:
+            return self._json_response({
+                'success': False,
+                'error': str(e)
+            }, status=e.status)
         except Exception as e:
             _logger.exception("Error creating order")
             return self._json_response({
@@ -173,6 +112,89 @@ class OrderAPIController(http.Controller):
                 'error': str(e)
             }, status=500)
 
+    def _place_order(self, data):
+        """Create and confirm the order; return ``(order, response data)``.
+
+        Enrollments are created pending by the order confirmation; their
+        activation and welcome emails run afterwards in the checkout cron.
+        """
+        customer_data = data.get('customer', {})
+        items = data.get('items', [])
+
+        if not customer_data.get('email'):
+            raise CheckoutError('Customer email is required')
+        if not items:
+            raise CheckoutError('No items in order')
+
+        # Get or create partner
+        partner = self._get_or_create_partner(customer_data)
+        if not partner:
+            raise CheckoutError('Failed to create customer', status=500)
+
+        # Resolve all courses at once
+        Channel = request.env['slide.channel'].sudo()
+        item_course_ids = []
+        for item in items:
+            try:
+                item_course_ids.append(int(item.get('courseId')))
+            except (TypeError, ValueError):
+                item_course_ids.append(0)
+        courses = Channel.browse(set(item_course_ids) - {0}).exists()
+        if not courses:
+            raise CheckoutError('No valid courses found')
+        # Products are prepared when courses are published; this covers stragglers
+        courses._prepare_products()
+
+        order_lines = []
+        for item, course_id in zip(items, item_course_ids):
+            course = courses.filtered(lambda c: c.id == course_id)
+            if not course:
+                _logger.warning(f"Course {item.get('courseId')} not found")
+                continue
+            order_lines.append((0, 0, {
+                'product_id': course.product_id.id,
+                'product_uom_qty': 1,
+                'price_unit': item.get('price', course.list_price),
+                'name': course.name,
+            }))
+
+        # Create sale order
+        SaleOrder = request.env['sale.order'].sudo()
+        order = SaleOrder.create({
+            'partner_id': partner.id,
+            'order_line': order_lines,
+            'state': 'draft',
+        })
+
+        # For now, confirm the order immediately (simulating successful payment)
+        # In production, this would happen after payment confirmation
+        try:
+            order.action_confirm()
+        except Exception as e:
+            _logger.exception("Could not confirm order %s", order.name)
+            raise CheckoutError(f'Order could not be confirmed: {e}', status=500) from e
+
+        # Only the enrollments this order created, not earlier ones of the customer
+        enrollments = request.env['seitech.enrollment'].sudo().search([
+            ('sale_order_id', '=', order.id),
+        ])
+        return order, {
+            'success': True,
+            'data': {
+                'orderId': order.id,
+                'orderReference': order.name,
+                'total': order.amount_total,
+                'currency': order.currency_id.name,
+                'status': order.state,
+                'enrollments': [{
+                    'id': e.id,
+                    'courseName': e.channel_id.name,
+                    'courseSlug': e.channel_id.seo_name or str(e.channel_id.id),
+                    'status': e.state,
+                } for e in enrollments]
+            }
+        }
+
     def _get_or_create_partner(self, customer_data):
         """Get or create a partner from customer data."""
         Partner = request.env['res.partner'].sudo()
@@ -198,106 +220,6 @@ class OrderAPIController(http.Controller):
 
         return partner
 
-    def _get_or_create_user(self, partner):
-        """Get or create a portal user for the partner."""
-        User = request.env['res.users'].sudo()
-        _logger.info(f"Looking for user for partner {partner.id} ({partner.email})")
-
-        # Check if user already exists by partner
-        user = User.search([('partner_id', '=', partner.id)], limit=1)
-        if user:
-            _logger.info(f"Found user by partner_id: {user.id}")
-            return user
-
-        # Check by login/email
-        user = User.search([('login', '=ilike', partner.email)], limit=1)
-        if user:
-            _logger.info(f"Found user by login: {user.id}")
-            # Link user to partner if not linked
-            if not user.partner_id or user.partner_id.id != partner.id:
-                _logger.info(f"Updating user partner_id from {user.partner_id.id if user.partner_id else None} to {partner.id}")
-            return user
-
-        # Create portal user directly
-        try:
-            # Get portal group
-            portal_group = request.env.ref('base.group_portal', raise_if_not_found=False)
-            if not portal_group:
-                _logger.error("Portal group not found - base.group_portal does not exist")
-                return None
-
-            _logger.info(f"Creating new portal user for {partner.email}")
-            # In Odoo 19, we must set group_ids during creation to override defaults
-            # The default _default_groups assigns base.group_user which conflicts with portal
-            user = User.with_context(no_reset_password=True).create({
-                'name': partner.name,
-                'login': partner.email,
-                'email': partner.email,
-                'partner_id': partner.id,
-                'active': True,
-                'group_ids': [(6, 0, [portal_group.id])],  # Replace all groups with just portal
-            })
-            _logger.info(f"Created portal user: {user.id}")
-            return user
-        except Exception as e:
-            _logger.exception(f"Could not create portal user for {partner.email}: {e}")
-            return None
-
-    def _create_enrollments(self, order, user, course_ids):
-        """Create enrollments for all courses in the order."""
-        Enrollment = request.env['seitech.enrollment'].sudo()
-        Channel = request.env['slide.channel'].sudo()
-        enrollments = []
-
-        _logger.info(f"Creating enrollments for order {order.id}, user {user.id if user else None}, courses {course_ids}")
-
-        if not user:
-            _logger.error("No user provided for enrollment creation - user is None")
-            return enrollments
-
-        for course_id in course_ids:
-            course = Channel.browse(course_id)
-            if not course.exists():
-                _logger.warning(f"Course {course_id} not found")
-                continue
-
-            _logger.info(f"Processing enrollment for course {course.id} ({course.name})")
-
-            # Check if already enrolled
-            existing = Enrollment.search([
-                ('channel_id', '=', course.id),
-                ('user_id', '=', user.id),
-            ], limit=1)
-
-            if existing:
-                _logger.info(f"User already enrolled in course {course_id}, enrollment {existing.id}, state: {existing.state}")
-                # Activate if pending (simulating payment confirmation)
-                if existing.state in ('draft', 'pending'):
-                    _logger.info(f"Activating existing enrollment {existing.id}")
-                    existing.action_activate()
-                enrollments.append(existing)
-                continue
-
-            # Create enrollment
-            try:
-                _logger.info(f"Creating new enrollment for user {user.id} in course {course.id}")
-                enrollment = Enrollment.create({
-                    'channel_id': course.id,
-                    'user_id': user.id,
-                    'enrollment_type': 'paid',
-                    'amount_paid': course.list_price,
-                    'sale_order_id': order.id,
-                    'state': 'draft',  # Start as draft, action_activate will set to active
-                })
-                _logger.info(f"Created enrollment {enrollment.id}, activating...")
-                enrollment.action_activate()
-                _logger.info(f"Enrollment {enrollment.id} activated, state: {enrollment.state}")
-                enrollments.append(enrollment)
-            except Exception as e:
-                _logger.exception(f"Failed to create enrollment for course {course_id}: {e}")
-
-        return enrollments
-
     @http.route('/api/orders/<int:order_id>', type='http', auth='public', methods=['GET'], csrf=False)
     def get_order(self, order_id, **kwargs):
         """Get order details by ID."""
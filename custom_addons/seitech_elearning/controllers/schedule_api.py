@@ -1,8 +1,25 @@
 # -*- coding: utf-8 -*-
 import json
-from datetime import datetime
-from odoo import http
-from odoo.http import request
+from datetime import datetime, timedelta, timezone
+from odoo import http, api, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.http import request, Response
+
+# Widest [from, to) window served by the JSON calendar feed
+MAX_CALENDAR_DAYS = 93
+
+# iCalendar export: default window, widest window and rows fetched per batch
+ICAL_DEFAULT_PAST_DAYS = 30
+ICAL_DEFAULT_FUTURE_DAYS = 365
+MAX_ICAL_DAYS = 400
+ICAL_BATCH_SIZE = 200
+
+# Stored fields read by the calendar feeds
+CALENDAR_FIELDS = [
+    'name', 'channel_id', 'instructor_id', 'start_datetime', 'end_datetime', 'timezone',
+    'meeting_type', 'location', 'state', 'max_attendees', 'seats_taken', 'waitlist_count',
+    'write_date',
+]
 
 
 class ScheduleApiController(http.Controller):
@@ -26,7 +43,7 @@ class ScheduleApiController(http.Controller):
         # Compute available spots
         max_attendees = schedule.max_attendees or 0
         attendee_count = schedule.attendee_count or 0
-        available_spots = -1 if max_attendees == 0 else max(0, max_attendees - attendee_count)
+        available_spots = -1 if max_attendees == 0 else max(0, max_attendees - schedule.seats_taken)
 
         data = {
             'id': schedule.id,
@@ -46,6 +63,7 @@ class ScheduleApiController(http.Controller):
             'maxAttendees': max_attendees,
             'attendeeCount': attendee_count,
             'availableSpots': available_spots,
+            'waitlistCount': schedule.waitlist_count or 0,
             'registrationRequired': schedule.registration_required,
             'registrationDeadline': schedule.registration_deadline.isoformat() if schedule.registration_deadline else None,
             'state': schedule.state or 'draft',
@@ -94,7 +112,8 @@ class ScheduleApiController(http.Controller):
             - upcoming: Only show future schedules (default: true)
         """
         try:
-            Schedule = request.env['seitech.schedule'].sudo()
+            # bin_size: only test for images, do not load them
+            Schedule = request.env['seitech.schedule'].sudo().with_context(bin_size=True)
             now = datetime.utcnow()
 
             # Build domain
@@ -176,7 +195,7 @@ class ScheduleApiController(http.Controller):
     def get_upcoming_schedules(self, **kwargs):
         """Get upcoming schedules for homepage display."""
         try:
-            Schedule = request.env['seitech.schedule'].sudo()
+            Schedule = request.env['seitech.schedule'].sudo().with_context(bin_size=True)
             now = datetime.utcnow()
             limit = int(kwargs.get('limit', 6))
 
@@ -196,6 +215,195 @@ class ScheduleApiController(http.Controller):
                 'data': None,
             }, status=500)
 
+    def _parse_window(self, kwargs, max_days, default=None):
+        """Parse the ``from``/``to`` query params into a naive UTC [start, end) window."""
+        def parse(value):
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if moment.tzinfo:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            return moment
+
+        if kwargs.get('from') and kwargs.get('to'):
+            start, end = parse(kwargs['from']), parse(kwargs['to'])
+        elif default:
+            start, end = default
+        else:
+            raise ValueError('Both "from" and "to" are required')
+        if end <= start:
+            raise ValueError('"to" must be after "from"')
+        if end - start > timedelta(days=max_days):
+            raise ValueError(f'The window cannot exceed {max_days} days')
+        return start, end
+
+    def _get_calendar_domain(self, kwargs, start, end, default_states):
+        """Sessions starting in [start, end), served by the (state, start_datetime) index."""
+        state = kwargs.get('state')
+        states = default_states if not state else None if state == 'all' else [state]
+        domain = [('start_datetime', '>=', start), ('start_datetime', '<', end)]
+        if states:
+            domain.append(('state', 'in', states))
+        for param, field in (('courseId', 'channel_id'), ('instructorId', 'instructor_id')):
+            if kwargs.get(param):
+                try:
+                    domain.append((field, '=', int(kwargs[param])))
+                except ValueError:
+                    pass
+        if kwargs.get('meetingType'):
+            domain.append(('meeting_type', '=', kwargs['meetingType']))
+        return domain
+
+    def _get_calendar_data(self, schedule):
+        """Compact session entry for calendar views, from stored fields only."""
+        max_attendees = schedule.max_attendees or 0
+        return {
+            'id': schedule.id,
+            'name': schedule.name,
+            'courseId': schedule.channel_id.id or None,
+            'courseName': schedule.channel_id.name or '',
+            'instructorName': schedule.instructor_id.name or '',
+            'startDatetime': schedule.start_datetime.isoformat() if schedule.start_datetime else None,
+            'endDatetime': schedule.end_datetime.isoformat() if schedule.end_datetime else None,
+            'timezone': schedule.timezone or 'Europe/London',
+            'meetingType': schedule.meeting_type or 'in_person',
+            'location': schedule.location or '',
+            'state': schedule.state or 'draft',
+            'maxAttendees': max_attendees,
+            'seatsTaken': schedule.seats_taken,
+            'availableSpots': -1 if max_attendees == 0 else max(0, max_attendees - schedule.seats_taken),
+            'waitlistCount': schedule.waitlist_count or 0,
+        }
+
+    @http.route('/api/schedules/calendar', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
+    def get_schedule_calendar(self, **kwargs):
+        """
+        Get every session starting in a [from, to) window, for month and week views.
+
+        Query params:
+            - from, to: Window bounds (ISO format, required, at most 93 days apart)
+            - courseId, instructorId, meetingType: Optional filters
+            - state: Filter by state (default: scheduled, "all" for any)
+        """
+        try:
+            try:
+                start, end = self._parse_window(kwargs, MAX_CALENDAR_DAYS)
+            except ValueError as e:
+                return self._json_response({
+                    'success': False,
+                    'message': str(e),
+                    'data': None,
+                }, status=400)
+
+            Schedule = request.env['seitech.schedule'].sudo()
+            schedules = Schedule.search_fetch(
+                self._get_calendar_domain(kwargs, start, end, ['scheduled']),
+                CALENDAR_FIELDS,
+                order='start_datetime asc, id asc',
+            )
+            return self._json_response({
+                'success': True,
+                'data': {
+                    'from': start.isoformat(),
+                    'to': end.isoformat(),
+                    'sessions': [self._get_calendar_data(s) for s in schedules],
+                },
+            })
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e),
+                'data': None,
+            }, status=500)
+
+    @http.route('/api/schedules/calendar.ics', type='http', auth='public', methods=['GET'], csrf=False)
+    def export_schedule_calendar(self, **kwargs):
+        """
+        iCalendar feed of the sessions in a [from, to) window.
+
+        Without from/to the feed covers the last 30 and next 365 days, which
+        suits external calendar subscriptions. Cancelled sessions are included
+        with STATUS:CANCELLED so subscribed calendars drop them.
+        """
+        now = datetime.utcnow()
+        try:
+            start, end = self._parse_window(kwargs, MAX_ICAL_DAYS, default=(
+                now - timedelta(days=ICAL_DEFAULT_PAST_DAYS),
+                now + timedelta(days=ICAL_DEFAULT_FUTURE_DAYS),
+            ))
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype='text/plain')
+
+        domain = self._get_calendar_domain(
+            kwargs, start, end, ['scheduled', 'in_progress', 'completed', 'cancelled'],
+        )
+        schedule_ids = request.env['seitech.schedule'].sudo().search(domain, order='start_datetime asc, id asc').ids
+        return Response(
+            self._iter_ical(request.env.registry, request.env.lang, schedule_ids, request.httprequest.host),
+            mimetype='text/calendar',
+            headers=[
+                ('Content-Disposition', 'inline; filename="live-classes.ics"'),
+                ('Access-Control-Allow-Origin', '*'),
+            ],
+            direct_passthrough=True,
+        )
+
+    def _iter_ical(self, registry, lang, schedule_ids, host):
+        """Yield the iCalendar document batch by batch.
+
+        The body is produced after the request cursor is closed, so sessions
+        are read through a cursor of our own, ICAL_BATCH_SIZE at a time.
+        """
+        yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//SEI Tech//Live Classes//EN\r\n' \
+              'CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\nX-WR-CALNAME:SEI Tech Live Classes\r\n'
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {'lang': lang})
+            Schedule = env['seitech.schedule']
+            for index in range(0, len(schedule_ids), ICAL_BATCH_SIZE):
+                schedules = Schedule.browse(schedule_ids[index:index + ICAL_BATCH_SIZE])
+                schedules.fetch(CALENDAR_FIELDS)
+                yield ''.join(self._ical_event(schedule, host, stamp) for schedule in schedules.exists())
+                env.invalidate_all()
+        yield 'END:VCALENDAR\r\n'
+
+    def _ical_event(self, schedule, host, stamp):
+        def fmt(moment):
+            return moment.strftime('%Y%m%dT%H%M%SZ')
+
+        description = [f'Course: {schedule.channel_id.name or ""}']
+        if schedule.instructor_id:
+            description.append(f'Instructor: {schedule.instructor_id.name}')
+        location = schedule.location if schedule.meeting_type == 'in_person' else 'Online'
+        lines = [
+            ('BEGIN', 'VEVENT'),
+            ('UID', f'seitech-schedule-{schedule.id}@{host}'),
+            ('DTSTAMP', stamp),
+            ('DTSTART', fmt(schedule.start_datetime)),
+            ('DTEND', fmt(schedule.end_datetime)),
+            ('SUMMARY', self._ical_escape(schedule.name)),
+            ('DESCRIPTION', self._ical_escape('\n'.join(description))),
+            ('LOCATION', self._ical_escape(location or '')),
+            ('STATUS', 'CANCELLED' if schedule.state == 'cancelled' else 'CONFIRMED'),
+            ('LAST-MODIFIED', fmt(schedule.write_date)),
+            ('END', 'VEVENT'),
+        ]
+        return ''.join(self._ical_fold(f'{name}:{value}') for name, value in lines)
+
+    def _ical_escape(self, value):
+        return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+    def _ical_fold(self, line):
+        """Fold a content line at 75 octets (RFC 5545 section 3.1)."""
+        parts, current, size = [], '', 0
+        for char in line:
+            width = len(char.encode('utf-8'))
+            if size + width > 75:
+                parts.append(current)
+                current, size = ' ', 1
+            current += char
+            size += width
+        parts.append(current)
+        return '\r\n'.join(parts) + '\r\n'
+
     @http.route('/api/schedules/<int:schedule_id>', type='http', auth='public', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
     def get_schedule_detail(self, schedule_id, **kwargs):
         """Get single schedule details."""
@@ -226,7 +434,6 @@ class ScheduleApiController(http.Controller):
         """Register current user for a schedule."""
         try:
             Schedule = request.env['seitech.schedule'].sudo()
-            Attendee = request.env['seitech.schedule.attendee'].sudo()
             schedule = Schedule.browse(schedule_id)
 
             if not schedule.exists():
@@ -241,13 +448,6 @@ class ScheduleApiController(http.Controller):
                     'message': 'Registration is not available for this session',
                 }, status=400)
 
-            # Check capacity
-            if schedule.max_attendees > 0 and schedule.attendee_count >= schedule.max_attendees:
-                return self._json_response({
-                    'success': False,
-                    'message': 'This session is fully booked',
-                }, status=400)
-
             # Check deadline
             if schedule.registration_deadline:
                 now = datetime.utcnow()
@@ -257,43 +457,85 @@ class ScheduleApiController(http.Controller):
                         'message': 'Registration deadline has passed',
                     }, status=400)
 
-            # Check if already registered
-            existing = Attendee.search([
-                ('schedule_id', '=', schedule_id),
-                ('user_id', '=', request.env.user.id),
-                ('state', 'in', ('registered', 'attended')),
-            ], limit=1)
-
-            if existing:
-                return self._json_response({
-                    'success': False,
-                    'message': 'You are already registered for this session',
-                }, status=400)
-
-            # Parse request body for notes
-            notes = ''
+            # Parse request body for notes and reservation options
+            body = {}
             try:
                 body = json.loads(request.httprequest.data or '{}')
-                notes = body.get('notes', '')
             except json.JSONDecodeError:
                 pass
 
-            # Create attendee record
-            attendee = Attendee.create({
-                'schedule_id': schedule_id,
-                'user_id': request.env.user.id,
-                'notes': notes,
-                'state': 'registered',
+            # Seats are reserved atomically; a full session can go to the waitlist
+            try:
+                attendee = schedule._register(
+                    request.env.user,
+                    notes=body.get('notes', ''),
+                    hold=bool(body.get('hold')),
+                    waitlist=bool(body.get('waitlist')),
+                )
+            except UserError as e:
+                return self._json_response({
+                    'success': False,
+                    'message': str(e),
+                }, status=400)
+
+            messages = {
+                'registered': 'Successfully registered for this session',
+                'held': 'Your seat is held, please confirm your registration',
+                'waitlisted': 'This session is full, you have been added to the waitlist',
+            }
+            return self._json_response({
+                'success': True,
+                'message': messages[attendee.state],
+                'data': self._get_registration_data(attendee),
             })
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e),
+            }, status=500)
 
+    @http.route('/api/schedules/<int:schedule_id>/register/confirm', type='http', auth='user', methods=['POST', 'OPTIONS'], csrf=False, cors='*')
+    def confirm_schedule_registration(self, schedule_id, **kwargs):
+        """Confirm the seat held by the current user."""
+        try:
+            attendee = self._get_my_attendee(schedule_id)
+            if not attendee or attendee.state != 'held':
+                return self._json_response({
+                    'success': False,
+                    'message': 'No seat is held for you on this session',
+                }, status=404)
+            try:
+                attendee._confirm_hold()
+            except UserError as e:
+                return self._json_response({
+                    'success': False,
+                    'message': str(e),
+                }, status=400)
             return self._json_response({
                 'success': True,
                 'message': 'Successfully registered for this session',
-                'data': {
-                    'attendeeId': attendee.id,
-                    'scheduleId': schedule_id,
-                    'registrationDate': attendee.registration_date.isoformat() if attendee.registration_date else None,
-                },
+                'data': self._get_registration_data(attendee),
+            })
+        except Exception as e:
+            return self._json_response({
+                'success': False,
+                'message': str(e),
+            }, status=500)
+
+    @http.route('/api/schedules/<int:schedule_id>/cancel', type='http', auth='user', methods=['POST', 'OPTIONS'], csrf=False, cors='*')
+    def cancel_schedule_registration(self, schedule_id, **kwargs):
+        """Cancel the current user's registration, hold or waitlist entry."""
+        try:
+            attendee = self._get_my_attendee(schedule_id)
+            if not attendee or attendee.state not in ('held', 'registered', 'waitlisted'):
+                return self._json_response({
+                    'success': False,
+                    'message': 'You are not registered for this session',
+                }, status=404)
+            attendee.action_cancel()
+            return self._json_response({
+                'success': True,
+                'message': 'Your registration has been cancelled',
             })
         except Exception as e:
             return self._json_response({
@@ -301,6 +543,21 @@ class ScheduleApiController(http.Controller):
                 'message': str(e),
             }, status=500)
 
+    def _get_my_attendee(self, schedule_id):
+        return request.env['seitech.schedule.attendee'].sudo().search([
+            ('schedule_id', '=', schedule_id),
+            ('user_id', '=', request.env.user.id),
+        ], limit=1)
+
+    def _get_registration_data(self, attendee):
+        return {
+            'attendeeId': attendee.id,
+            'scheduleId': attendee.schedule_id.id,
+            'state': attendee.state,
+            'registrationDate': attendee.registration_date.isoformat() if attendee.registration_date else None,
+            'holdExpiresAt': attendee.hold_expires_at.isoformat() if attendee.hold_expires_at else None,
+        }
+
     @http.route('/api/schedules/my-registrations', type='http', auth='user', methods=['GET', 'OPTIONS'], csrf=False, cors='*')
     def get_my_registrations(self, **kwargs):
         """Get schedules the current user is registered for."""
@@ -309,7 +566,7 @@ class ScheduleApiController(http.Controller):
 
             attendees = Attendee.search([
                 ('user_id', '=', request.env.user.id),
-                ('state', 'in', ('registered', 'attended')),
+                ('state', 'in', ('held', 'waitlisted', 'registered', 'attended')),
             ], order='schedule_id desc')
 
             schedules = []
@@ -3,6 +3,9 @@ from . import res_users
 from . import slide_channel
 from . import slide_slide
 from . import enrollment
+from . import enrollment_import
+from . import mail_queue
+from . import checkout
 from . import certificate
 from . import assignment
 from . import schedule
@@ -1,8 +1,30 @@
 # -*- coding: utf-8 -*-
 import uuid
+import base64
 import hashlib
-from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+import logging
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import MissingError, ValidationError
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+# Attempts before a queued certificate render is marked as failed
+MAX_RENDER_ATTEMPTS = 3
+
+CERTIFICATE_REPORT = 'seitech_elearning.action_report_certificate'
+
+# Versions the verification cache; bumped when any verification data changes
+VERIFICATION_VERSION_SEQUENCE = 'seitech_certificate_verification_version_seq'
+
+# Fields exposed by public verification: writes to them bump the version
+VERIFICATION_FIELDS = {
+    'name', 'verification_code', 'state', 'user_id', 'channel_id',
+    'issue_date', 'expiration_date', 'completion_percentage',
+}
+
+# Template images embedded in every rendered certificate
+TEMPLATE_IMAGE_FIELDS = ('logo', 'signature_1_image', 'signature_2_image')
 
 
 class CertificateTemplate(models.Model):
@@ -51,6 +73,20 @@ class CertificateTemplate(models.Model):
         help='0 = no expiration',
     )
 
+    def _get_render_assets(self):
+        """Data URIs of the template images, cached per template version."""
+        self.ensure_one()
+        return self._get_render_assets_cached(self.id, fields.Datetime.to_string(self.write_date))
+
+    @api.model
+    @tools.ormcache('template_id', 'version')
+    def _get_render_assets_cached(self, template_id, version):
+        template = self.sudo().browse(template_id)
+        return {
+            name: f'data:image/png;base64,{template[name].decode()}' if template[name] else False
+            for name in TEMPLATE_IMAGE_FIELDS
+        }
+
 
 class Certificate(models.Model):
     """Issued certificates for course completions."""
@@ -71,7 +107,6 @@ class Certificate(models.Model):
         required=True,
         copy=False,
         readonly=True,
-        index=True,
     )
     verification_url = fields.Char(
         string='Verification URL',
@@ -135,6 +170,17 @@ class Certificate(models.Model):
     certificate_pdf = fields.Binary(string='Certificate PDF', attachment=True)
     certificate_filename = fields.Char(string='PDF Filename')
 
+    # Render queue (PDF rendering and email run in a cron, not in the request)
+    render_state = fields.Selection([
+        ('none', 'Not Queued'),
+        ('pending', 'Pending'),
+        ('done', 'Rendered'),
+        ('failed', 'Failed'),
+    ], string='PDF Render Status', default='none', required=True, copy=False, index=True)
+    render_send_mail = fields.Boolean(string='Email After Render', copy=False)
+    render_attempts = fields.Integer(string='Render Attempts', default=0, copy=False)
+    render_error = fields.Text(string='Render Error', copy=False)
+
     # QR Code
     qr_code = fields.Binary(string='QR Code', attachment=True)
 
@@ -155,10 +201,44 @@ class Certificate(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('seitech.certificate') or _('New')
             if not vals.get('verification_code'):
                 vals['verification_code'] = self._generate_verification_code()
-        records = super().create(vals_list)
-        for record in records:
-            record._generate_qr_code()
-        return records
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'verification_code' in vals:
+            # The QR code encodes the verification URL: regenerate it lazily
+            vals = dict(vals, qr_code=False)
+        res = super().write(vals)
+        if VERIFICATION_FIELDS.intersection(vals):
+            self._bump_verification_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._bump_verification_version()
+        return res
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {VERIFICATION_VERSION_SEQUENCE}")
+        # Public verification looks certificates up by code on every request
+        self.env.cr.execute("""
+            SELECT 1
+              FROM pg_index i
+              JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+             WHERE i.indrelid = 'seitech_certificate'::regclass
+               AND i.indisunique
+               AND i.indnatts = 1
+               AND a.attname = 'verification_code'
+        """)
+        if not self.env.cr.fetchone():
+            create_unique_index(
+                self.env.cr, 'seitech_certificate_verification_code_uniq', self._table, ['verification_code']
+            )
+        # The expiry cron only ever scans issued certificates
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS seitech_certificate_issued_expiration_idx
+                ON seitech_certificate (expiration_date)
+             WHERE state = 'issued' AND expiration_date IS NOT NULL
+        """)
 
     def _generate_verification_code(self):
         """Generate unique verification code."""
@@ -172,55 +252,180 @@ class Certificate(models.Model):
         for cert in self:
             cert.verification_url = f'{base_url}/certificate/verify/{cert.verification_code}'
 
-    def _generate_qr_code(self):
-        """Generate QR code for certificate verification."""
+    def _ensure_qr_codes(self):
+        """Generate the QR codes these certificates are still missing.
+
+        QR codes are produced on first render or verification instead of at
+        creation, and stored as filestore attachments.
+        """
+        if not self.ids:
+            return
+        with_qr = self.env['ir.attachment'].sudo().search_fetch([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'qr_code'),
+            ('res_id', 'in', self.ids),
+        ], ['res_id'])
+        existing = set(with_qr.mapped('res_id'))
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        for cert in self:
+            if cert.id in existing or not cert.verification_code:
+                continue
+            qr_code = self._get_qr_code_png(cert.verification_code, base_url)
+            if not qr_code:
+                # qrcode library not installed
+                return
+            cert.qr_code = qr_code
+
+    @api.model
+    @tools.ormcache('verification_code', 'base_url')
+    def _get_qr_code_png(self, verification_code, base_url):
+        """Base64 PNG of the QR code pointing to a verification URL."""
         try:
             import qrcode
             import io
-            import base64
+        except ImportError:
+            return False
 
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(self.verification_url)
-            qr.make(fit=True)
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(f'{base_url}/certificate/verify/{verification_code}')
+        qr.make(fit=True)
 
-            img = qr.make_image(fill_color='black', back_color='white')
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            self.qr_code = base64.b64encode(buffer.getvalue())
-        except ImportError:
-            # qrcode library not installed
-            pass
+        img = qr.make_image(fill_color='black', back_color='white')
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return base64.b64encode(buffer.getvalue())
+
+    @api.model
+    def _backfill_qr_codes(self, batch_size=500):
+        """Generate missing QR codes of issued certificates, committing per batch.
+
+        Returns the number of certificates processed.
+        """
+        certificates = self.search([('state', 'in', ('issued', 'expired'))], order='id')
+        total = 0
+        for start in range(0, len(certificates), batch_size):
+            batch = certificates[start:start + batch_size]
+            batch._ensure_qr_codes()
+            self.env.cr.commit()
+            self.env.invalidate_all()
+            total += len(batch)
+        return total
+
+    def action_issue(self, send_mail=True):
+        """Issue the certificate.
+
+        The certificate is issued right away; its PDF is rendered and the
+        notification email sent by the render queue cron.
+        """
+        from dateutil.relativedelta import relativedelta
+
+        issued = self.filtered(lambda c: c.state == 'draft')
+        now = fields.Datetime.now()
+        for cert in issued:
+            vals = {'state': 'issued', 'issue_date': now}
+
+            # Capture completion data
+            enrollment = cert.enrollment_id
+            if enrollment:
+                vals['completion_percentage'] = enrollment.completion_percentage
+                vals['time_spent'] = enrollment.time_spent // 60  # Convert to hours
+
+            # Set expiration if template has one
+            if cert.template_id and cert.template_id.expiration_period:
+                vals['expiration_date'] = now + relativedelta(months=cert.template_id.expiration_period)
+
+            cert.write(vals)
+
+        issued._enqueue_render(send_mail=send_mail)
+        return True
+
+    def _enqueue_render(self, send_mail=True):
+        """Queue PDF rendering (and optionally the email) for these certificates.
+
+        With ``send_mail=None`` the certificates keep their pending email flag.
+        """
+        if not self:
+            return
+        vals = {
+            'render_state': 'pending',
+            'render_attempts': 0,
+            'render_error': False,
+        }
+        if send_mail is not None:
+            vals['render_send_mail'] = send_mail
+        self.write(vals)
+        cron = self.env.ref('seitech_elearning.ir_cron_render_certificates', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
 
-    def action_issue(self):
-        """Issue the certificate."""
+    @api.model
+    def _claim_render_batch(self, batch_size):
+        """Lock a batch of pending certificates for this worker.
+
+        SKIP LOCKED lets several workers drain the queue concurrently without
+        rendering the same certificate twice.
+        """
+        self.flush_model(['render_state'])
+        self.env.cr.execute("""
+            SELECT id FROM seitech_certificate
+             WHERE render_state = 'pending'
+             ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (batch_size,))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _render_queued(self):
+        """Render, attach and email a claimed batch of certificates."""
+        try:
+            with self.env.cr.savepoint():
+                self._ensure_qr_codes()
+            qr_pending = self.browse()
+        except Exception:
+            _logger.warning('Batch QR code generation of %s certificates failed', len(self), exc_info=True)
+            self.invalidate_recordset(['qr_code'])
+            # Retried one by one below, so failures count as render attempts
+            qr_pending = self
+        # Without their QR codes the certificates are rendered one by one below
+        pdfs = {} if qr_pending else self._render_pdf_batch()
         for cert in self:
-            if cert.state == 'draft':
-                # Capture completion data
-                enrollment = cert.enrollment_id
-                if enrollment:
-                    cert.completion_percentage = enrollment.completion_percentage
-                    cert.time_spent = enrollment.time_spent // 60  # Convert to hours
-
-                cert.state = 'issued'
-                cert.issue_date = fields.Datetime.now()
-
-                # Set expiration if template has one
-                if cert.template_id and cert.template_id.expiration_period:
-                    from dateutil.relativedelta import relativedelta
-                    cert.expiration_date = fields.Datetime.now() + relativedelta(
-                        months=cert.template_id.expiration_period
-                    )
-
-                # Generate PDF
-                cert.action_generate_pdf()
-
-                # Send certificate email
-                cert._send_certificate_email()
+            try:
+                with self.env.cr.savepoint():
+                    if cert in qr_pending:
+                        cert._ensure_qr_codes()
+                    cert._store_pdf(pdfs.get(cert.id))
+                    if cert.render_send_mail:
+                        cert._send_certificate_email()
+                    cert.write({'render_state': 'done', 'render_error': False})
+            except Exception as e:
+                _logger.exception('Certificate %s render failed', cert.name)
+                attempts = cert.render_attempts + 1
+                cert.write({
+                    'render_attempts': attempts,
+                    'render_error': str(e),
+                    'render_state': 'failed' if attempts >= MAX_RENDER_ATTEMPTS else 'pending',
+                })
+
+    @api.model
+    def _cron_render_certificates(self, batch_size=50, max_batches=20):
+        """Cron job: drain the certificate render queue batch by batch."""
+        for __ in range(max_batches):
+            certificates = self._claim_render_batch(batch_size)
+            if not certificates:
+                return
+            certificates._render_queued()
+            self.env.cr.commit()
+        # Work left over: run again right away instead of at the next interval
+        self.env.ref('seitech_elearning.ir_cron_render_certificates')._trigger()
+
+    def action_retry_render(self):
+        """Re-queue failed renders."""
+        self.filtered(lambda c: c.render_state == 'failed')._enqueue_render(send_mail=None)
         return True
 
     def action_revoke(self):
@@ -233,44 +438,232 @@ class Certificate(models.Model):
         return True
 
     def action_generate_pdf(self):
-        """Generate PDF certificate."""
-        self.ensure_one()
-        report = self.env.ref('seitech_elearning.action_report_certificate')
-        pdf_content, content_type = report._render_qweb_pdf([self.id])
-        self.certificate_pdf = pdf_content
-        self.certificate_filename = f'{self.name}.pdf'
+        """Generate PDF certificates."""
+        self._ensure_qr_codes()
+        pdfs = self._render_pdf_batch()
+        for cert in self:
+            cert._store_pdf(pdfs.get(cert.id))
         return True
 
+    def _render_pdf_batch(self):
+        """Render these certificates with one report call per template.
+
+        wkhtmltopdf runs once per template group and its output is split back
+        into one PDF per certificate along the certificate headings. Returns
+        ``{certificate_id: pdf_bytes}``; certificates of a group that could not
+        be rendered or split are left out so callers render them one by one.
+        """
+        Report = self.env['ir.actions.report'].with_context(report_pdf_no_attachment=True)
+        pdfs = {}
+        for template, certificates in self.grouped('template_id').items():
+            if len(certificates) == 1:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    streams = Report._render_qweb_pdf_prepare_streams(CERTIFICATE_REPORT, {}, certificates.ids)
+            except Exception:
+                _logger.warning('Batch render of %s certificates (template %s) failed',
+                                len(certificates), template.id, exc_info=True)
+                continue
+            if set(streams) != set(certificates.ids):
+                _logger.warning('Could not split batch of %s certificates (template %s)',
+                                len(certificates), template.id)
+                continue
+            for cert_id, stream_data in streams.items():
+                pdfs[cert_id] = stream_data['stream'].getvalue()
+                stream_data['stream'].close()
+        return pdfs
+
+    def _store_pdf(self, pdf_content=None):
+        """Attach a rendered PDF, rendering it on its own when not given."""
+        self.ensure_one()
+        if pdf_content is None:
+            pdf_content, __ = self.env['ir.actions.report']._render_qweb_pdf(CERTIFICATE_REPORT, [self.id])
+        self.write({
+            'certificate_pdf': base64.b64encode(pdf_content),
+            'certificate_filename': f'{self.name}.pdf',
+        })
+
     def _send_certificate_email(self):
-        """Send certificate via email."""
-        template = self.env.ref(
-            'seitech_elearning.certificate_issued_email',
-            raise_if_not_found=False
-        )
-        if template:
-            template.send_mail(self.id, force_send=True)
+        """Queue the certificate email."""
+        self.env['seitech.mail.queue'].enqueue('seitech_elearning.certificate_issued_email', self)
 
     @api.model
     def verify_certificate(self, verification_code):
         """Verify certificate by code."""
-        cert = self.search([('verification_code', '=', verification_code)], limit=1)
-        if not cert:
+        result = self.get_verification_result(verification_code)
+        if 'id' in result:
+            result['certificate'] = self.browse(result.pop('id'))
+        return result
+
+    @api.model
+    def get_verification_result(self, verification_code):
+        """Verification result for a code, without loading the certificate record.
+
+        Returns ``{'valid': bool, 'id': int, 'data': dict}`` for known codes and
+        ``{'valid': False, 'error': str}`` otherwise.
+        """
+        lang = self.env.lang or 'en_US'
+        try:
+            row = self._get_verification_row_cached(
+                verification_code or '', self._get_verification_version(), lang,
+            )
+        except MissingError:
             return {'valid': False, 'error': 'Certificate not found'}
-        if cert.state == 'revoked':
-            return {'valid': False, 'error': 'Certificate has been revoked', 'certificate': cert}
-        if cert.state == 'expired':
-            return {'valid': False, 'error': 'Certificate has expired', 'certificate': cert}
-        if cert.state != 'issued':
-            return {'valid': False, 'error': 'Certificate is not valid', 'certificate': cert}
-        return {'valid': True, 'certificate': cert}
+        return self._verification_result(row)
 
     @api.model
-    def _cron_check_expirations(self):
-        """Check and mark expired certificates."""
+    def get_verification_results(self, verification_codes):
+        """Verify many codes with a single query: ``{code: result}``."""
+        codes = list(dict.fromkeys(code for code in verification_codes if code))
+        rows = self._read_verification_rows(codes, self.env.lang or 'en_US')
+        results = {}
+        for code in codes:
+            row = rows.get(code)
+            if row:
+                result = self._verification_result(row)
+                result.pop('id')
+                results[code] = result
+            else:
+                results[code] = {'valid': False, 'error': 'Certificate not found'}
+        return results
+
+    @api.model
+    def _get_verification_version(self):
+        self.env.cr.execute(f"""
+            SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {VERIFICATION_VERSION_SEQUENCE}
+        """)
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _bump_verification_version(self):
+        """Invalidate every cached verification row.
+
+        The sequence is not transactional: it is bumped again after commit,
+        for rows another worker may have cached from the data committed before.
+        """
+        self.env.cr.execute(f"SELECT nextval('{VERIFICATION_VERSION_SEQUENCE}')")
+        if not self.env.cr.postcommit.data.get(VERIFICATION_VERSION_SEQUENCE):
+            self.env.cr.postcommit.data[VERIFICATION_VERSION_SEQUENCE] = True
+            registry = self.env.registry
+
+            @self.env.cr.postcommit.add
+            def bump_after_commit():
+                with registry.cursor() as cr:
+                    cr.execute(f"SELECT nextval('{VERIFICATION_VERSION_SEQUENCE}')")
+
+    @api.model
+    @tools.ormcache('verification_code', 'version', 'lang')
+    def _get_verification_row_cached(self, verification_code, version, lang):
+        # Unknown codes raise instead of returning, so scraping random codes
+        # does not fill the cache with misses
+        row = self._read_verification_rows([verification_code], lang).get(verification_code)
+        if not row:
+            raise MissingError(verification_code)
+        return row
+
+    @api.model
+    def _read_verification_rows(self, verification_codes, lang):
+        """Fetch the public verification data of the given codes in one query."""
+        if not verification_codes:
+            return {}
+        self.flush_model(VERIFICATION_FIELDS)
+        self.env.cr.execute("""
+            SELECT c.id, c.verification_code, c.name, c.state, c.issue_date, c.expiration_date,
+                   c.completion_percentage, p.name,
+                   COALESCE(ch.name->>%s, ch.name->>'en_US')
+              FROM seitech_certificate c
+              JOIN res_users u ON u.id = c.user_id
+              JOIN res_partner p ON p.id = u.partner_id
+              JOIN slide_channel ch ON ch.id = c.channel_id
+             WHERE c.verification_code = ANY(%s)
+        """, (lang, list(verification_codes)))
+        return {
+            code: {
+                'id': cert_id,
+                'state': state,
+                'expiration_date': expiration_date,
+                'data': {
+                    'number': number,
+                    'holder_name': holder_name,
+                    'course_name': course_name,
+                    'issue_date': issue_date.isoformat() if issue_date else None,
+                    'expiration_date': expiration_date.isoformat() if expiration_date else None,
+                    'completion_percentage': completion_percentage,
+                },
+            }
+            for (cert_id, code, number, state, issue_date, expiration_date,
+                 completion_percentage, holder_name, course_name) in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _verification_result(self, row):
+        """Turn a cached verification row into a result, evaluating expiry now."""
+        state = row['state']
+        if state == 'issued' and row['expiration_date'] and row['expiration_date'] < fields.Datetime.now():
+            # Past its expiration date, even if the expiry cron has not run yet
+            state = 'expired'
+        result = {'valid': state == 'issued', 'id': row['id'], 'data': dict(row['data'])}
+        if state == 'revoked':
+            result['error'] = 'Certificate has been revoked'
+        elif state == 'expired':
+            result['error'] = 'Certificate has expired'
+        elif state != 'issued':
+            result['error'] = 'Certificate is not valid'
+        return result
+
+    @api.model
+    def _cron_check_expirations(self, batch_size=1000, max_batches=50):
+        """Mark expired certificates, one UPDATE ... RETURNING per committed batch."""
+        self.flush_model()
         now = fields.Datetime.now()
-        expired = self.search([
-            ('state', '=', 'issued'),
-            ('expiration_date', '!=', False),
-            ('expiration_date', '<', now),
-        ])
-        expired.write({'state': 'expired'})
+        for __ in range(max_batches):
+            self.env.cr.execute("""
+                UPDATE seitech_certificate
+                   SET state = 'expired', write_date = %(now)s, write_uid = %(uid)s
+                 WHERE id IN (
+                        SELECT id FROM seitech_certificate
+                         WHERE state = 'issued'
+                           AND expiration_date IS NOT NULL
+                           AND expiration_date < %(now)s
+                         ORDER BY id
+                         LIMIT %(limit)s
+                           FOR UPDATE SKIP LOCKED
+                       )
+             RETURNING id
+            """, {'now': now, 'uid': self.env.uid, 'limit': batch_size})
+            certificates = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not certificates:
+                break
+            certificates.invalidate_recordset(['state', 'write_date', 'write_uid'])
+            self._bump_verification_version()
+            self.env.cr.commit()
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Certificate verification shows the holder's name
+        if 'name' in vals and self.env['seitech.certificate'].sudo().search_count(
+            [('user_id.partner_id', 'in', self.ids)], limit=1,
+        ):
+            self.env['seitech.certificate']._bump_verification_version()
+        return res
+
+
+class CertificateReport(models.AbstractModel):
+    """Rendering values for the certificate report."""
+    _name = 'report.seitech_elearning.report_certificate'
+    _description = 'Certificate Report'
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        docs = self.env['seitech.certificate'].browse(docids)
+        return {
+            'doc_ids': docids,
+            'doc_model': 'seitech.certificate',
+            'docs': docs,
+            'template_assets': {template.id: template._get_render_assets() for template in docs.template_id},
+        }
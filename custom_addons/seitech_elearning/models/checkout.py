@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+# Post-confirmation retries wait RETRY_BASE_DELAY * 2 ** (attempts - 1)
+# minutes; after MAX_PROVISION_ATTEMPTS the checkout is left for manual retry
+RETRY_BASE_DELAY = 5
+MAX_PROVISION_ATTEMPTS = 5
+
+# Completed checkouts (and their idempotency keys) are kept this long
+CHECKOUT_RETENTION_DAYS = 30
+
+
+class Checkout(models.Model):
+    """A checkout submitted through the order API.
+
+    The record plays two roles. Its idempotency key deduplicates client
+    retries: the first request stores its response and any retry with the
+    same key is answered from it. It is also the job through which the
+    slow post-confirmation steps (enrollment activation, member updates,
+    welcome emails) run in a cron instead of the checkout request.
+    """
+    _name = 'seitech.checkout'
+    _description = 'Checkout'
+    _order = 'id desc'
+
+    idempotency_key = fields.Char(string='Idempotency Key', readonly=True)
+    request_hash = fields.Char(string='Request Hash', readonly=True)
+    order_id = fields.Many2one('sale.order', string='Order', ondelete='set null', index='btree_not_null')
+    response = fields.Text(string='Response', readonly=True)
+    state = fields.Selection([
+        ('received', 'Received'),
+        ('confirmed', 'Awaiting Enrollment'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='received', required=True, index=True)
+    attempts = fields.Integer(string='Attempts', default=0)
+    next_attempt = fields.Datetime(string='Next Attempt')
+    error = fields.Text(string='Last Error')
+
+    def init(self):
+        # _claim() relies on ON CONFLICT (idempotency_key): the unique index must exist
+        create_unique_index(
+            self.env.cr, 'seitech_checkout_idempotency_key_uniq', self._table, ['idempotency_key']
+        )
+
+    @api.model
+    def _claim(self, key, request_hash):
+        """Return ``(checkout, replay)`` for an idempotency key.
+
+        The first request with ``key`` gets a new checkout and ``replay``
+        False. A concurrent request with the same key waits on the unique
+        index until the first one commits, then, like any later retry, gets
+        the stored checkout with ``replay`` True. Callers must compare the
+        stored ``request_hash`` before replaying.
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            INSERT INTO seitech_checkout
+                   (idempotency_key, request_hash, state, attempts, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, 'received', 0, %s, %s, %s, %s)
+                ON CONFLICT (idempotency_key) DO NOTHING
+         RETURNING id
+        """, (key, request_hash, self.env.uid, now, self.env.uid, now))
+        row = self.env.cr.fetchone()
+        if row:
+            return self.browse(row[0]), False
+        return self.search([('idempotency_key', '=', key)], limit=1), True
+
+    def _get_response(self):
+        self.ensure_one()
+        return json.loads(self.response) if self.response else None
+
+    def _set_confirmed(self, order, response):
+        """Store the checkout result and queue the post-confirmation steps."""
+        self.write({
+            'order_id': order.id,
+            'response': json.dumps(response),
+            'state': 'confirmed',
+        })
+        self.env.ref('seitech_elearning.ir_cron_process_checkouts')._trigger()
+
+    # ==================== Post-confirmation ====================
+
+    @api.model
+    def _cron_process_checkouts(self, batch_size=50, max_batches=20):
+        """Cron job: activate the enrollments of confirmed checkouts."""
+        cron = self.env.ref('seitech_elearning.ir_cron_process_checkouts')
+        for __ in range(max_batches):
+            self.flush_model(['state', 'next_attempt'])
+            self.env.cr.execute("""
+                SELECT id FROM seitech_checkout
+                 WHERE state = 'confirmed'
+                   AND (next_attempt IS NULL OR next_attempt <= %s)
+                 ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, (fields.Datetime.now(), batch_size))
+            checkouts = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not checkouts:
+                break
+            checkouts._provision()
+            self.env.cr.commit()
+        else:
+            # Work left over: run again right away instead of at the next interval
+            cron._trigger()
+
+        # Wake up for the earliest retry
+        next_retry = self.search([('state', '=', 'confirmed'), ('next_attempt', '!=', False)],
+                                 order='next_attempt', limit=1)
+        if next_retry:
+            cron._trigger(at=next_retry.next_attempt)
+
+        self.search([
+            ('state', '=', 'done'),
+            ('create_date', '<', fields.Datetime.now() - timedelta(days=CHECKOUT_RETENTION_DAYS)),
+        ]).unlink()
+
+    def _provision(self):
+        """Provision the orders of these checkouts, in one batch if possible."""
+        try:
+            with self.env.cr.savepoint():
+                self.order_id._provision_course_enrollments(activate=True)
+                self.write({'state': 'done', 'error': False, 'next_attempt': False})
+        except Exception as e:
+            self.env.invalidate_all()
+            if len(self) == 1:
+                _logger.exception('Provisioning checkout %s failed', self.id)
+                self._schedule_retry(str(e))
+                return
+            # Isolate the failing checkouts
+            for checkout in self:
+                checkout._provision()
+
+    def _schedule_retry(self, error):
+        attempts = self.attempts + 1
+        self.write({
+            'attempts': attempts,
+            'error': error,
+            'state': 'failed' if attempts >= MAX_PROVISION_ATTEMPTS else 'confirmed',
+            'next_attempt': fields.Datetime.now() + timedelta(minutes=RETRY_BASE_DELAY * 2 ** (attempts - 1)),
+        })
+
+    def action_retry(self):
+        """Re-queue failed checkouts."""
+        self.filtered(lambda c: c.state == 'failed' and c.order_id).write({
+            'state': 'confirmed',
+            'attempts': 0,
+            'next_attempt': False,
+        })
+        self.env.ref('seitech_elearning.ir_cron_process_checkouts')._trigger()
+        return True
@@ -257,9 +257,9 @@ class Discussion(models.Model):
         return {'upvoted': user in self.upvote_ids}
     
     def action_increment_view(self):
-        """Increment view count"""
+        """Increment view count (buffered, applied by cron)"""
         self.ensure_one()
-        self.view_count += 1
+        self.env['seitech.counter.buffer'].sudo().increment(self, 'view_count')
     
     def action_set_best_answer(self, reply_id):
         """Set best answer for this discussion"""
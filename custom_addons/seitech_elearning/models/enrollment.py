@@ -1,8 +1,21 @@
 # -*- coding: utf-8 -*-
+import logging
+from collections import defaultdict
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 from datetime import timedelta
 
+_logger = logging.getLogger(__name__)
+
+# Enrollments created per batch by the bulk enrollment engine
+BULK_ENROLL_BATCH_SIZE = 500
+
+ENROLLMENT_EMAIL_TEMPLATES = {
+    'welcome': 'seitech_elearning.enrollment_welcome_email',
+    'completed': 'seitech_elearning.enrollment_completed_email',
+    'expiring': 'seitech_elearning.enrollment_expiring_email',
+}
+
 
 class Enrollment(models.Model):
     """Course enrollment management."""
@@ -46,6 +59,13 @@ class Enrollment(models.Model):
         required=True,
     )
     expiration_date = fields.Datetime(string='Expiration Date')
+    expiry_warning_sent_for = fields.Datetime(
+        string='Expiry Warning Sent For',
+        copy=False,
+        readonly=True,
+        help='Expiration date the expiry warning was last sent for. '
+             'A new warning is only sent when the expiration date changes.',
+    )
     state = fields.Selection([
         ('draft', 'Draft'),
         ('pending', 'Pending Payment'),
@@ -123,12 +143,110 @@ class Enrollment(models.Model):
          'A student can only enroll once in a course.'),
     ]
 
+    def init(self):
+        # The expiry cron only ever scans active enrollments
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS seitech_enrollment_active_expiration_idx
+                ON seitech_enrollment (expiration_date)
+             WHERE state = 'active' AND expiration_date IS NOT NULL
+        """)
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
             if vals.get('name', _('New')) == _('New'):
                 vals['name'] = self.env['ir.sequence'].next_by_code('seitech.enrollment') or _('New')
-        return super().create(vals_list)
+        enrollments = super().create(vals_list)
+        enrollments._update_channel_counters(1)
+        enrollments._sync_path_nodes()
+        return enrollments
+
+    def write(self, vals):
+        if 'channel_id' not in vals and 'state' not in vals:
+            return super().write(vals)
+        pairs = self._get_path_pairs()
+        self._update_channel_counters(-1)
+        res = super().write(vals)
+        self._update_channel_counters(1)
+        self._sync_path_nodes(pairs)
+        return res
+
+    def unlink(self):
+        pairs = self._get_path_pairs()
+        self._update_channel_counters(-1)
+        res = super().unlink()
+        self._sync_path_nodes(pairs)
+        return res
+
+    def _get_path_pairs(self):
+        return {(enrollment.user_id.id, enrollment.channel_id.id) for enrollment in self}
+
+    def _sync_path_nodes(self, pairs=()):
+        """Refresh the learning path nodes of these enrollments' courses."""
+        self.env['seitech.learning.path.node'].sudo()._sync_enrollment_pairs(
+            set(pairs) | self.exists()._get_path_pairs()
+        )
+
+    def _update_channel_counters(self, sign):
+        """Add (sign=1) or remove (sign=-1) these enrollments from the
+        stored counters on their courses."""
+        deltas = {}
+        for enrollment in self:
+            total, active = deltas.get(enrollment.channel_id.id, (0, 0))
+            deltas[enrollment.channel_id.id] = (
+                total + sign,
+                active + (sign if enrollment.state == 'active' else 0),
+            )
+        self.env['slide.channel'].sudo()._apply_enrollment_deltas(deltas)
+
+    @api.model
+    def _bulk_enroll(self, channel, users, values=None, send_welcome=True, batch_size=BULK_ENROLL_BATCH_SIZE):
+        """Enroll many users in a course with a constant number of queries per batch.
+
+        Users already enrolled (in any state) are skipped. New enrollments are
+        created active, in batches of ``batch_size``; a batch that fails is
+        retried row by row so one bad user does not block the others. All new
+        students are then added to the course members in one call and their
+        welcome emails are queued rather than sent inline.
+
+        Returns a dict with ``enrollments`` (created), ``skipped`` (users already
+        enrolled) and ``errors`` (list of ``(user, message)``).
+        """
+        Enrollment = self.with_context(mail_create_nolog=True, mail_create_nosubscribe=True)
+        existing = self.search_fetch([
+            ('channel_id', '=', channel.id),
+            ('user_id', 'in', users.ids),
+        ], ['user_id'])
+        skipped = existing.user_id
+        pending = users - skipped
+
+        enrollments = self.browse()
+        errors = []
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vals_list = [
+                dict(values or {}, channel_id=channel.id, user_id=user.id, state='active')
+                for user in batch
+            ]
+            try:
+                with self.env.cr.savepoint():
+                    enrollments |= Enrollment.create(vals_list)
+            except Exception:
+                for user, vals in zip(batch, vals_list):
+                    try:
+                        with self.env.cr.savepoint():
+                            enrollments |= Enrollment.create(vals)
+                    except Exception as e:
+                        errors.append((user, str(e)))
+            _logger.info('Bulk enrollment in course %s: %s/%s processed',
+                         channel.id, min(start + batch_size, len(pending)), len(pending))
+
+        if enrollments:
+            channel.sudo()._action_add_members(enrollments.partner_id)
+            if send_welcome:
+                enrollments._send_enrollment_email('welcome')
+
+        return {'enrollments': enrollments, 'skipped': skipped, 'errors': errors}
 
     @api.depends('channel_id.slide_ids', 'user_id')
     def _compute_completion(self):
@@ -155,13 +273,15 @@ class Enrollment(models.Model):
 
     def action_activate(self):
         """Activate enrollment."""
-        for enrollment in self:
-            if enrollment.state in ('draft', 'pending'):
-                enrollment.state = 'active'
-                # Add user to channel members
-                enrollment.channel_id._action_add_members(enrollment.partner_id)
-                # Send welcome email
-                enrollment._send_enrollment_email('welcome')
+        to_activate = self.filtered(lambda e: e.state in ('draft', 'pending'))
+        if not to_activate:
+            return True
+        to_activate.write({'state': 'active'})
+        # Add users to channel members, one call per course
+        for channel, enrollments in to_activate.grouped('channel_id').items():
+            channel._action_add_members(enrollments.partner_id)
+        # Send welcome emails
+        to_activate._send_enrollment_email('welcome')
         return True
 
     def action_complete(self):
@@ -265,40 +385,77 @@ class Enrollment(models.Model):
         return certificate
 
     def _send_enrollment_email(self, template_type):
-        """Send enrollment-related email."""
-        template_map = {
-            'welcome': 'seitech_elearning.enrollment_welcome_email',
-            'completed': 'seitech_elearning.enrollment_completed_email',
-            'expiring': 'seitech_elearning.enrollment_expiring_email',
-        }
-        template_xmlid = template_map.get(template_type)
+        """Queue an enrollment-related email."""
+        template_xmlid = ENROLLMENT_EMAIL_TEMPLATES.get(template_type)
         if template_xmlid:
-            template = self.env.ref(template_xmlid, raise_if_not_found=False)
-            if template:
-                template.send_mail(self.id, force_send=True)
+            self.env['seitech.mail.queue'].enqueue(template_xmlid, self)
 
     @api.model
-    def _cron_check_expirations(self):
-        """Cron job to check and handle expired enrollments."""
+    def _cron_check_expirations(self, batch_size=1000, max_batches=50):
+        """Cron job to check and handle expired enrollments.
+
+        Both passes are set-based: each batch is a single UPDATE ... RETURNING
+        committed on its own, so run time and memory stay bounded however
+        large the enrollment table grows. Leftovers are picked up next run.
+        """
+        self.flush_model()
         now = fields.Datetime.now()
+
         # Mark expired enrollments
-        expired = self.search([
-            ('state', '=', 'active'),
-            ('expiration_date', '!=', False),
-            ('expiration_date', '<', now),
-        ])
-        expired.write({'state': 'expired'})
-
-        # Send expiration warnings (7 days before)
+        for __ in range(max_batches):
+            self.env.cr.execute("""
+                UPDATE seitech_enrollment
+                   SET state = 'expired', write_date = %(now)s, write_uid = %(uid)s
+                 WHERE id IN (
+                        SELECT id FROM seitech_enrollment
+                         WHERE state = 'active'
+                           AND expiration_date IS NOT NULL
+                           AND expiration_date < %(now)s
+                         ORDER BY id
+                         LIMIT %(limit)s
+                           FOR UPDATE SKIP LOCKED
+                       )
+             RETURNING id, channel_id
+            """, {'now': now, 'uid': self.env.uid, 'limit': batch_size})
+            rows = self.env.cr.fetchall()
+            if not rows:
+                break
+            expired_per_channel = defaultdict(int)
+            for __, channel_id in rows:
+                expired_per_channel[channel_id] += 1
+            self.env['slide.channel'].sudo()._apply_enrollment_deltas({
+                channel_id: (0, -count) for channel_id, count in expired_per_channel.items()
+            })
+            self.browse([enrollment_id for enrollment_id, __ in rows]).invalidate_recordset(
+                ['state', 'write_date', 'write_uid']
+            )
+            self.env.cr.commit()
+
+        # Send expiration warnings (7 days before), once per expiration date
         warning_date = now + timedelta(days=7)
-        expiring = self.search([
-            ('state', '=', 'active'),
-            ('expiration_date', '!=', False),
-            ('expiration_date', '>=', now),
-            ('expiration_date', '<=', warning_date),
-        ])
-        for enrollment in expiring:
-            enrollment._send_enrollment_email('expiring')
+        for __ in range(max_batches):
+            self.env.cr.execute("""
+                UPDATE seitech_enrollment
+                   SET expiry_warning_sent_for = expiration_date
+                 WHERE id IN (
+                        SELECT id FROM seitech_enrollment
+                         WHERE state = 'active'
+                           AND expiration_date IS NOT NULL
+                           AND expiration_date BETWEEN %(now)s AND %(warning_date)s
+                           AND expiry_warning_sent_for IS DISTINCT FROM expiration_date
+                         ORDER BY id
+                         LIMIT %(limit)s
+                           FOR UPDATE SKIP LOCKED
+                       )
+             RETURNING id
+            """, {'now': now, 'warning_date': warning_date, 'limit': batch_size})
+            enrollments = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not enrollments:
+                break
+            enrollments.invalidate_recordset(['expiry_warning_sent_for'])
+            # Enqueued in the same transaction as the watermark: exactly once
+            enrollments._send_enrollment_email('expiring')
+            self.env.cr.commit()
 
     def action_view_certificate(self):
         """View the certificate for this enrollment."""
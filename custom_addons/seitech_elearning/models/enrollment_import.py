@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+import base64
+import csv
+import io
+import logging
+from contextlib import contextmanager
+from itertools import islice
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import email_normalize
+
+_logger = logging.getLogger(__name__)
+
+# Rows processed (and committed) per transaction
+IMPORT_CHUNK_SIZE = 500
+
+# Spreadsheet header aliases, normalized to lower_snake_case
+COLUMN_ALIASES = {
+    'email': 'email',
+    'email_address': 'email',
+    'e_mail': 'email',
+    'name': 'name',
+    'full_name': 'name',
+    'first_name': 'first_name',
+    'firstname': 'first_name',
+    'last_name': 'last_name',
+    'lastname': 'last_name',
+    'surname': 'last_name',
+    'phone': 'phone',
+    'phone_number': 'phone',
+}
+
+
+class EnrollmentImport(models.Model):
+    """Streaming import of corporate learners from a CSV or XLSX file.
+
+    The file is read row by row, in chunks committed separately. Each chunk
+    matches its learners against existing partners and users in batch,
+    creates the missing ones and enrolls them through the bulk enrollment
+    engine. ``rows_processed`` and the byte offset ``file_offset`` (into the
+    CSV copy of XLSX files) are the checkpoint an interrupted import resumes
+    from, so each chunk starts reading where the previous one stopped.
+    """
+    _name = 'seitech.enrollment.import'
+    _description = 'Enrollment Import'
+    _order = 'create_date desc'
+
+    name = fields.Char(string='Name', compute='_compute_name', store=True)
+    file = fields.Binary(string='File', attachment=True, required=True)
+    filename = fields.Char(string='File Name')
+
+    # Enrollment options (as in the bulk enrollment wizard)
+    channel_id = fields.Many2one(
+        'slide.channel',
+        string='Course',
+        required=True,
+        domain=[('is_published', '=', True)],
+    )
+    enrollment_type = fields.Selection([
+        ('free', 'Free'),
+        ('corporate', 'Corporate'),
+        ('scholarship', 'Scholarship'),
+    ], string='Enrollment Type', default='corporate', required=True)
+    expiration_date = fields.Datetime(string='Expiration Date')
+    company_sponsor_id = fields.Many2one('res.partner', string='Sponsor Company')
+    send_notification = fields.Boolean(string='Send Notification Email', default=True)
+
+    # Progress
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='draft', required=True, copy=False, index=True)
+    rows_processed = fields.Integer(string='Rows Processed', copy=False, readonly=True)
+    file_offset = fields.Integer(string='File Offset', copy=False, readonly=True,
+                                 help='Byte offset of the next unread row of the CSV file')
+    converted_file = fields.Binary(string='Converted File', attachment=True, copy=False, readonly=True,
+                                   help='CSV copy of an XLSX file, made on the first chunk')
+    partners_created = fields.Integer(string='Contacts Created', copy=False, readonly=True)
+    enrollments_created = fields.Integer(string='Enrollments Created', copy=False, readonly=True)
+    skipped_count = fields.Integer(string='Already Enrolled', copy=False, readonly=True)
+    error_count = fields.Integer(string='Errors', copy=False, readonly=True)
+    error_ids = fields.One2many('seitech.enrollment.import.error', 'import_id', string='Row Errors')
+    last_error = fields.Text(string='Last Error', copy=False, readonly=True)
+
+    @api.depends('filename', 'channel_id')
+    def _compute_name(self):
+        for job in self:
+            job.name = f'{job.filename or _("Import")} → {job.channel_id.name or ""}'
+
+    def action_start(self):
+        """Validate the file and queue the import."""
+        for job in self:
+            job._get_file_type()
+        self.write({'state': 'queued', 'last_error': False})
+        self.env.ref('seitech_elearning.ir_cron_process_enrollment_imports')._trigger()
+        return True
+
+    def action_resume(self):
+        """Resume failed imports from their last checkpoint."""
+        self.filtered(lambda j: j.state == 'failed').action_start()
+        return True
+
+    # ==================== Processing ====================
+
+    @api.model
+    def _cron_process_imports(self, chunk_size=IMPORT_CHUNK_SIZE, max_chunks=20):
+        """Cron job: process queued imports chunk by chunk, committing each."""
+        for __ in range(max_chunks):
+            self.flush_model(['state'])
+            self.env.cr.execute("""
+                SELECT id FROM seitech_enrollment_import
+                 WHERE state = 'queued'
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """)
+            row = self.env.cr.fetchone()
+            if not row:
+                return
+            job = self.browse(row[0])
+            try:
+                job._process_chunk(chunk_size)
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception('Enrollment import %s failed', job.id)
+                job.write({'state': 'failed', 'last_error': str(e)})
+                self.env.cr.commit()
+        # Work left over: run again right away instead of at the next interval
+        self.env.ref('seitech_elearning.ir_cron_process_enrollment_imports')._trigger()
+
+    def _process_chunk(self, chunk_size):
+        """Import the next ``chunk_size`` rows after the checkpoint."""
+        self.ensure_one()
+        with self._open_rows() as rows:
+            chunk = list(islice(rows, chunk_size))
+
+        errors = []
+        learners = {}  # normalized email -> (row number, values)
+        for row_number, values, __ in chunk:
+            if not values:
+                continue
+            email = email_normalize(values.get('email') or '')
+            if not email:
+                errors.append((row_number, values.get('email') or '', 'Missing or invalid email address'))
+                continue
+            # Duplicate lines in the file: the first one wins
+            if email in learners:
+                errors.append((row_number, email, f'Duplicate of row {learners[email][0]}'))
+                continue
+            learners[email] = (row_number, values)
+
+        partners, partners_created, partner_errors = self._get_or_create_partners(learners)
+        errors += partner_errors
+        users = self.env['res.users']._get_or_create_portal_users(
+            self.env['res.partner'].browse([partner.id for partner in partners.values()])
+        )
+
+        rows_by_user = {}
+        enroll_users = self.env['res.users']
+        for email, (row_number, __) in learners.items():
+            partner = partners.get(email)
+            if not partner:
+                continue  # Reported by _get_or_create_partners
+            user = users.get(partner.id)
+            if not user:
+                errors.append((row_number, email, 'Could not create a user for this learner'))
+                continue
+            rows_by_user[user.id] = (row_number, email)
+            enroll_users |= user
+
+        result = self.env['seitech.enrollment']._bulk_enroll(
+            self.channel_id,
+            enroll_users,
+            {
+                'enrollment_type': self.enrollment_type,
+                'expiration_date': self.expiration_date,
+                'company_sponsor_id': self.company_sponsor_id.id if self.company_sponsor_id else False,
+            },
+            send_welcome=self.send_notification,
+        )
+        for user, message in result['errors']:
+            row_number, email = rows_by_user[user.id]
+            errors.append((row_number, email, message))
+
+        self.env['seitech.enrollment.import.error'].create([
+            {'import_id': self.id, 'row_number': row_number, 'email': email, 'message': message}
+            for row_number, email, message in errors
+        ])
+        self.write({
+            'rows_processed': self.rows_processed + len(chunk),
+            'file_offset': chunk[-1][2] if chunk else self.file_offset,
+            'partners_created': self.partners_created + partners_created,
+            'enrollments_created': self.enrollments_created + len(result['enrollments']),
+            'skipped_count': self.skipped_count + len(result['skipped']),
+            'error_count': self.error_count + len(errors),
+            'state': 'done' if len(chunk) < chunk_size else 'queued',
+        })
+        _logger.info('Enrollment import %s: %s rows processed', self.id, self.rows_processed)
+
+    def _get_or_create_partners(self, learners):
+        """Match learners to partners by email, creating the missing ones.
+
+        Returns ``({email: partner}, number_created, errors)``. If the batch
+        creation fails, partners are created one by one and the failing rows
+        are returned as ``(row_number, email, message)`` errors.
+        """
+        Partner = self.env['res.partner'].sudo()
+        partners = {}
+        if learners:
+            self.env.cr.execute("""
+                SELECT DISTINCT ON (lower(email)) lower(email), id
+                  FROM res_partner
+                 WHERE active AND lower(email) = ANY(%s)
+                 ORDER BY lower(email), id
+            """, (list(learners),))
+            partners = {email: Partner.browse(partner_id) for email, partner_id in self.env.cr.fetchall()}
+
+        vals_by_email = {}
+        for email, (__, values) in learners.items():
+            if email not in partners:
+                name = values.get('name') or ' '.join(
+                    part for part in (values.get('first_name'), values.get('last_name')) if part
+                )
+                vals_by_email[email] = {
+                    'name': name or email.split('@')[0],
+                    'email': email,
+                    'phone': values.get('phone') or False,
+                }
+
+        errors = []
+        try:
+            with self.env.cr.savepoint():
+                created = Partner.create(list(vals_by_email.values()))
+            partners.update(zip(vals_by_email, created))
+        except Exception:
+            _logger.warning('Batch partner creation of import %s failed, retrying row by row',
+                            self.id, exc_info=True)
+            created = Partner
+            for email, vals in vals_by_email.items():
+                try:
+                    with self.env.cr.savepoint():
+                        partner = Partner.create(vals)
+                except Exception as e:
+                    errors.append((learners[email][0], email, f'Could not create the contact: {e}'))
+                else:
+                    partners[email] = partner
+                    created |= partner
+        return partners, len(created), errors
+
+    # ==================== File reading ====================
+
+    def _get_file_type(self):
+        self.ensure_one()
+        extension = (self.filename or '').rsplit('.', 1)[-1].lower()
+        if extension not in ('csv', 'xlsx'):
+            raise UserError(_('Only CSV and XLSX files can be imported.'))
+        return extension
+
+    @contextmanager
+    def _open_file(self, field='file'):
+        """Open an uploaded file from the filestore without loading it in memory."""
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', field),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError(_('The import file is missing.'))
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as f:
+                yield f
+        else:
+            yield io.BytesIO(attachment.raw)
+
+    @contextmanager
+    def _open_rows(self):
+        """Yield an iterator of ``(row_number, values, offset)`` over the data
+        rows after the checkpoint.
+
+        ``row_number`` is the line number in the spreadsheet (header is line 1),
+        ``values`` maps the recognised columns to stripped strings (empty for
+        blank rows) and ``offset`` is the byte offset right after the row.
+
+        XLSX files cannot be read from an offset (openpyxl parses the sheet
+        from the top), so they are converted to CSV once, on the first chunk,
+        and read from that copy.
+        """
+        if self._get_file_type() == 'xlsx':
+            if not self.converted_file:
+                self._convert_to_csv()
+            field, dialect = 'converted_file', csv.excel
+        else:
+            field, dialect = 'file', None
+        with self._open_file(field) as f:
+            position = [0]
+
+            def lines():
+                for line in iter(f.readline, b''):
+                    position[0] += len(line)
+                    yield line.decode('utf-8-sig')
+
+            if dialect is None:
+                sample = f.readline().decode('utf-8-sig')
+                f.seek(0)
+                try:
+                    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+                except csv.Error:
+                    dialect = csv.excel
+            # csv.reader pulls lines one at a time, so after the header it
+            # can carry on from any row boundary we seek to
+            reader = csv.reader(lines(), dialect)
+            header = next(reader, None)
+            if self.file_offset:
+                f.seek(self.file_offset)
+                position[0] = self.file_offset
+            yield self._map_rows(header, ((row, position[0]) for row in reader), self.rows_processed + 2)
+
+    def _convert_to_csv(self):
+        """Store a CSV copy of the uploaded XLSX file in ``converted_file``."""
+        try:
+            import openpyxl
+        except ImportError:
+            raise UserError(_('The openpyxl library is required to import XLSX files.'))
+        output = io.StringIO()
+        writer = csv.writer(output, csv.excel)
+        with self._open_file() as f:
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True)
+            try:
+                for row in workbook.active.iter_rows(values_only=True):
+                    writer.writerow(['' if cell is None else cell for cell in row])
+            finally:
+                workbook.close()
+        self.write({'converted_file': base64.b64encode(output.getvalue().encode('utf-8'))})
+
+    @api.model
+    def _map_rows(self, header, rows, first_row):
+        if not header:
+            return
+        columns = [
+            COLUMN_ALIASES.get('_'.join(str(cell or '').strip().lower().split()))
+            for cell in header
+        ]
+        if 'email' not in columns:
+            raise UserError(_('The file must have an "email" column.'))
+        for index, (row, offset) in enumerate(rows, start=first_row):
+            values = {
+                column: str(cell).strip()
+                for column, cell in zip(columns, row)
+                if column and cell not in (None, '')
+            }
+            yield index, values, offset
+
+
+class EnrollmentImportError(models.Model):
+    """A row that could not be imported."""
+    _name = 'seitech.enrollment.import.error'
+    _description = 'Enrollment Import Error'
+    _order = 'import_id, row_number'
+
+    import_id = fields.Many2one(
+        'seitech.enrollment.import',
+        string='Import',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    row_number = fields.Integer(string='Row')
+    email = fields.Char(string='Email')
+    message = fields.Char(string='Error')
@@ -2,12 +2,85 @@
 """Learning path models for personalized learning journeys."""
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from collections import defaultdict
 from datetime import datetime, timedelta
+import heapq
 import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Days of watch history used to measure a learner's pace
+FORECAST_WINDOW_DAYS = 28
+
+# Ordered proficiency levels (seitech.course.skill / seitech.user.skill)
+SKILL_LEVELS = ['awareness', 'foundational', 'intermediate', 'advanced', 'expert']
+# Ordered course difficulty levels (slide.channel)
+DIFFICULTY_LEVELS = ['beginner', 'intermediate', 'advanced', 'expert']
+# Course difficulty aimed at by each path difficulty preference
+PREFERRED_DIFFICULTY = {'beginner': 0, 'intermediate': 1, 'advanced': 2, 'adaptive': None}
+
+# Upper bound on AI generated courses
+MAX_GENERATED_COURSES = 15
+
+# Transitive closures of the path and node prerequisite links:
+# one (descendant_id, ancestor_id) row per direct or indirect prerequisite
+PATH_CLOSURE_TABLE = 'seitech_learning_path_prerequisite_closure'
+NODE_CLOSURE_TABLE = 'seitech_learning_path_node_prerequisite_closure'
+
+
+def init_prerequisite_closure(cr, closure, relation, column, table):
+    """Create a closure table over ``relation`` and fill it when empty."""
+    cr.execute(f"""
+        CREATE TABLE IF NOT EXISTS {closure} (
+            descendant_id integer NOT NULL REFERENCES {table} (id) ON DELETE CASCADE,
+            ancestor_id integer NOT NULL REFERENCES {table} (id) ON DELETE CASCADE,
+            PRIMARY KEY (descendant_id, ancestor_id)
+        )
+    """)
+    cr.execute(f"CREATE INDEX IF NOT EXISTS {closure}_ancestor_idx ON {closure} (ancestor_id, descendant_id)")
+    cr.execute(f"SELECT 1 FROM {closure} LIMIT 1")
+    if not cr.fetchone():
+        cr.execute(f"""
+            WITH RECURSIVE walk(descendant_id, ancestor_id) AS (
+                SELECT {column}, prerequisite_id FROM {relation}
+                 UNION
+                SELECT walk.descendant_id, link.prerequisite_id
+                  FROM walk JOIN {relation} AS link ON link.{column} = walk.ancestor_id
+            )
+            INSERT INTO {closure} (descendant_id, ancestor_id)
+            SELECT descendant_id, ancestor_id FROM walk
+        """)
+
+
+def refresh_prerequisite_closure(cr, closure, relation, column, ids):
+    """Rebuild the closure rows of ``ids`` and of everything depending on them.
+
+    Called after the direct links of ``ids`` changed: only their rows and
+    those of their descendants can be affected. The walk uses UNION, so it
+    terminates on a cycle. Returns True when a refreshed record ends up
+    among its own prerequisites.
+    """
+    ids = tuple(ids)
+    if not ids:
+        return False
+    cr.execute(f"SELECT descendant_id FROM {closure} WHERE ancestor_id IN %s", (ids,))
+    affected = tuple(set(ids) | {row[0] for row in cr.fetchall()})
+    cr.execute(f"DELETE FROM {closure} WHERE descendant_id IN %s", (affected,))
+    cr.execute(f"""
+        WITH RECURSIVE walk(descendant_id, ancestor_id) AS (
+            SELECT {column}, prerequisite_id FROM {relation} WHERE {column} IN %s
+             UNION
+            SELECT walk.descendant_id, link.prerequisite_id
+              FROM walk JOIN {relation} AS link ON link.{column} = walk.ancestor_id
+        )
+        INSERT INTO {closure} (descendant_id, ancestor_id)
+        SELECT descendant_id, ancestor_id FROM walk
+    """, (affected,))
+    cr.execute(f"SELECT 1 FROM {closure} WHERE descendant_id IN %s AND descendant_id = ancestor_id LIMIT 1",
+               (affected,))
+    return bool(cr.fetchone())
+
 
 class LearningPath(models.Model):
     """Personalized learning path for users."""
@@ -232,17 +305,19 @@ class LearningPath(models.Model):
             else:
                 path.progress_percentage = (len(completed) / len(nodes)) * 100
 
-    @api.depends('node_ids', 'node_ids.channel_id.slide_ids', 'weekly_commitment_hours', 'start_date')
+    @api.depends('node_ids.estimated_hours', 'weekly_commitment_hours', 'start_date')
     def _compute_estimates(self):
         """Calculate estimated completion time."""
+        totals = {}
+        path_ids = [path_id for path_id in self.ids if path_id]
+        if path_ids:
+            totals = {
+                path.id: hours for path, hours in self.env['seitech.learning.path.node']._read_group(
+                    [('path_id', 'in', path_ids)], ['path_id'], ['estimated_hours:sum'],
+                )
+            }
         for path in self:
-            total_hours = 0.0
-            for node in path.node_ids:
-                if node.channel_id:
-                    # Sum lesson durations
-                    for slide in node.channel_id.slide_ids:
-                        total_hours += slide.completion_time or 0.25  # Default 15 min
-            
+            total_hours = totals.get(path.id) or 0.0
             path.estimated_hours_total = total_hours
             
             # Calculate completion date
@@ -254,42 +329,141 @@ class LearningPath(models.Model):
 
     def _compute_time_spent(self):
         """Calculate actual time spent on path courses."""
+        minutes = {}
+        if self.node_ids:
+            minutes = {
+                (user.id, channel.id): total for user, channel, total in self.env['seitech.enrollment']._read_group(
+                    [('user_id', 'in', self.user_id.ids), ('channel_id', 'in', self.node_ids.channel_id.ids)],
+                    ['user_id', 'channel_id'], ['time_spent:sum'],
+                )
+            }
         for path in self:
-            total_minutes = 0
-            enrollments = self.env['seitech.enrollment'].search([
-                ('user_id', '=', path.user_id.id),
-                ('channel_id', 'in', path.node_ids.mapped('channel_id').ids),
-            ])
-            total_minutes = sum(enrollments.mapped('time_spent'))
+            total_minutes = sum(
+                minutes.get((path.user_id.id, channel.id), 0) for channel in path.node_ids.channel_id
+            )
             path.hours_spent = total_minutes / 60.0
 
+    def get_completion_forecast(self):
+        """Project the completion date of each path from the learner's pace.
+
+        The pace is the learner's watch time on the path's courses over the
+        last FORECAST_WINDOW_DAYS days (seitech.watch.session), read for all
+        paths in one query. Without recent activity the weekly commitment is
+        used instead. Remaining work is the estimated hours of each course
+        scaled by what is left of it.
+
+        Returns ``{path_id: forecast dict}``.
+        """
+        today = fields.Date.context_today(self)
+        since = fields.Datetime.now() - timedelta(days=FORECAST_WINDOW_DAYS)
+        watched = {}
+        channel_ids = tuple(self.node_ids.channel_id.ids)
+        if channel_ids:
+            self.env['seitech.watch.session'].flush_model(['user_id', 'slide_id', 'start_time', 'duration'])
+            self.env.cr.execute("""
+                SELECT session.user_id, slide.channel_id, SUM(session.duration)
+                  FROM seitech_watch_session AS session
+                  JOIN slide_slide AS slide ON slide.id = session.slide_id
+                 WHERE session.user_id IN %s
+                   AND slide.channel_id IN %s
+                   AND session.start_time >= %s
+              GROUP BY session.user_id, slide.channel_id
+            """, (tuple(self.user_id.ids), channel_ids, since))
+            watched = {(user_id, channel_id): seconds for user_id, channel_id, seconds in self.env.cr.fetchall()}
+
+        forecasts = {}
+        for path in self:
+            nodes = path.node_ids
+            remaining_hours = sum(
+                node.estimated_hours * (1 - min(node.completion_percentage or 0.0, 100.0) / 100)
+                for node in nodes if not node.is_completed
+            )
+            watched_hours = sum(
+                watched.get((path.user_id.id, channel.id), 0) for channel in nodes.channel_id
+            ) / 3600
+            if watched_hours:
+                basis, weekly_hours = 'observed', watched_hours * 7 / FORECAST_WINDOW_DAYS
+            else:
+                basis, weekly_hours = 'planned', float(path.weekly_commitment_hours or 0)
+
+            projected = False
+            if not remaining_hours:
+                projected = today
+            elif weekly_hours:
+                projected = today + timedelta(weeks=remaining_hours / weekly_hours)
+            forecasts[path.id] = {
+                'remaining_hours': round(remaining_hours, 2),
+                'weekly_hours': round(weekly_hours, 2),
+                'basis': basis,
+                'projected_completion_date': projected,
+                'target_completion_date': path.target_completion_date,
+                'on_track': bool(projected) and (
+                    not path.target_completion_date or projected <= path.target_completion_date
+                ),
+            }
+        return forecasts
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'user_id' in vals or 'start_date' in vals:
+            self._refresh_progress()
+        return res
+
+    def _refresh_progress(self):
+        """Recompute the progress of every node of these paths."""
+        self.env['seitech.learning.path.node']._sync_progress(self.ids)
+
+    def init(self):
+        init_prerequisite_closure(
+            self.env.cr, PATH_CLOSURE_TABLE, 'learning_path_prerequisite_rel', 'path_id', self._table,
+        )
+
+    def unlink(self):
+        descendants = self.browse()
+        if self.ids:
+            self.env.cr.execute(
+                f"SELECT DISTINCT descendant_id FROM {PATH_CLOSURE_TABLE} WHERE ancestor_id IN %s",
+                (tuple(self.ids),),
+            )
+            descendants = self.browse([row[0] for row in self.env.cr.fetchall()]) - self
+        res = super().unlink()
+        refresh_prerequisite_closure(
+            self.env.cr, PATH_CLOSURE_TABLE, 'learning_path_prerequisite_rel', 'path_id', descendants.ids,
+        )
+        return res
+
     @api.constrains('prerequisite_path_ids')
     def _check_prerequisite_cycle(self):
-        """Prevent circular prerequisite dependencies."""
+        """Prevent circular prerequisite dependencies (and keep the closure current)."""
         for path in self:
             if path in path.prerequisite_path_ids:
                 raise ValidationError(_('A learning path cannot be its own prerequisite.'))
-            
-            # Check for cycles using DFS
-            visited = set()
-            def has_cycle(current_path):
-                if current_path.id in visited:
-                    return True
-                visited.add(current_path.id)
-                for prereq in current_path.prerequisite_path_ids:
-                    if has_cycle(prereq):
-                        return True
-                visited.remove(current_path.id)
-                return False
-            
-            if has_cycle(path):
-                raise ValidationError(_('Circular prerequisite dependency detected.'))
+        self.flush_model(['prerequisite_path_ids'])
+        if refresh_prerequisite_closure(
+            self.env.cr, PATH_CLOSURE_TABLE, 'learning_path_prerequisite_rel', 'path_id', self.ids,
+        ):
+            raise ValidationError(_('Circular prerequisite dependency detected.'))
+
+    def _get_unfinished_prerequisite_paths(self):
+        """Direct and indirect prerequisite paths not completed yet."""
+        self.ensure_one()
+        self.flush_model(['state'])
+        self.env.cr.execute(f"""
+            SELECT path.id
+              FROM {PATH_CLOSURE_TABLE} AS closure
+              JOIN seitech_learning_path AS path ON path.id = closure.ancestor_id
+             WHERE closure.descendant_id = %s AND path.state != 'completed'
+        """, (self.id,))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
 
     def action_activate(self):
         """Activate the learning path."""
         self.ensure_one()
         if not self.node_ids:
             raise UserError(_('Cannot activate an empty learning path. Please add courses first.'))
+        unfinished = self._get_unfinished_prerequisite_paths()
+        if unfinished:
+            raise UserError(_('Complete the prerequisite paths first: %s') % ', '.join(unfinished.mapped('name')))
         
         self.write({
             'state': 'active',
@@ -376,24 +550,27 @@ class LearningPath(models.Model):
             'weekly_hours': self.weekly_commitment_hours,
         }
         
-        # Call AI generation algorithm
-        recommended_courses = self._ai_recommend_courses(context)
-        
-        # Create path nodes
-        sequence = 10
-        for course_data in recommended_courses:
-            self.env['seitech.learning.path.node'].create({
-                'path_id': self.id,
-                'channel_id': course_data['course_id'],
-                'sequence': sequence,
-                'node_type': course_data.get('type', 'required'),
-                'ai_reason': course_data.get('reason', ''),
-            })
-            sequence += 10
+        # Plan the courses, in prerequisite order
+        recommended_courses = self._ai_recommend_courses(user_skills, completed_courses)
+        
+        # Create all path nodes, then their prerequisite links, in one batch
+        sequence = max(self.node_ids.mapped('sequence'), default=0) + 10
+        nodes = self.env['seitech.learning.path.node'].create([{
+            'path_id': self.id,
+            'channel_id': course_data['course_id'],
+            'sequence': sequence + index * 10,
+            'node_type': course_data.get('type', 'required'),
+            'ai_reason': course_data.get('reason', ''),
+            'ai_confidence': course_data.get('confidence', 0.0),
+        } for index, course_data in enumerate(recommended_courses)])
+        self._link_generated_nodes(nodes, recommended_courses)
         
         self.write({
             'ai_generated': True,
-            'ai_confidence_score': recommended_courses[0].get('confidence', 0.8) if recommended_courses else 0,
+            # Plan order is prerequisite order, so the first course is often a foundation
+            'ai_confidence_score': max(
+                (course.get('confidence', 0.8) for course in recommended_courses), default=0,
+            ),
             'generation_context': json.dumps(context),
             'path_type': 'auto',
         })
@@ -405,59 +582,186 @@ class LearningPath(models.Model):
         
         return True
 
-    def _ai_recommend_courses(self, context):
-        """AI algorithm to recommend courses based on context.
-        
-        Returns list of dicts: [{'course_id': int, 'type': str, 'reason': str, 'confidence': float}]
+    def _link_generated_nodes(self, nodes, recommended_courses):
+        """Insert the prerequisite links of generated nodes in one query.
+
+        The plan is acyclic by construction, so the ORM cycle check is not
+        needed; progress is refreshed once for all nodes.
         """
-        recommended = []
-        
-        # 1. Find courses that teach target skills
-        if context.get('target_skills'):
-            skill_courses = self.env['seitech.course.skill'].search([
-                ('skill_id.name', 'in', context['target_skills']),
-                ('channel_id.is_published', '=', True),
-                ('channel_id', 'not in', [c.id for c in context.get('completed_courses', [])]),
-            ])
-            
-            for cs in skill_courses:
-                recommended.append({
-                    'course_id': cs.channel_id.id,
-                    'type': 'required',
-                    'reason': f'Teaches {cs.skill_id.name} ({cs.proficiency_level})',
-                    'confidence': 0.9,
-                })
-        
-        # 2. Find courses in similar categories
-        if context.get('completed_courses'):
-            categories = context['completed_courses'].mapped('seitech_category_id')
-            similar_courses = self.env['slide.channel'].search([
-                ('seitech_category_id', 'in', categories.ids),
-                ('is_published', '=', True),
-                ('id', 'not in', context.get('completed_courses', []).ids),
-            ], limit=5)
-            
-            for course in similar_courses:
-                if course.id not in [r['course_id'] for r in recommended]:
-                    recommended.append({
-                        'course_id': course.id,
-                        'type': 'optional',
-                        'reason': 'Based on your completed courses',
-                        'confidence': 0.7,
-                    })
-        
-        # 3. Match difficulty preference
-        difficulty_map = {
-            'beginner': 'beginner',
-            'intermediate': 'intermediate',
-            'advanced': 'advanced',
-            'adaptive': 'beginner',  # Start with beginner for adaptive
+        node_by_course = {node.channel_id.id: node.id for node in nodes}
+        links = [
+            (node_by_course[course_data['course_id']], node_by_course[prerequisite_id])
+            for course_data in recommended_courses
+            for prerequisite_id in course_data.get('prerequisites', [])
+            if prerequisite_id in node_by_course
+        ]
+        if links:
+            values = ', '.join(['(%s, %s)'] * len(links))
+            self.env.cr.execute(f"""
+                INSERT INTO path_node_prerequisite_rel (node_id, prerequisite_id)
+                VALUES {values}
+                ON CONFLICT DO NOTHING
+            """, [value for link in links for value in link])
+            nodes.invalidate_recordset(['prerequisite_node_ids', 'dependent_node_ids'])
+            refresh_prerequisite_closure(
+                self.env.cr, NODE_CLOSURE_TABLE, 'path_node_prerequisite_rel', 'node_id', nodes.ids,
+            )
+            nodes._propagate_progress()
+
+    def _ai_recommend_courses(self, user_skills, completed_courses):
+        """Plan the courses covering the path's target skills.
+
+        Builds a skill -> course graph from seitech.course.skill over the
+        target skills and their sub-skills (resolved through parent_path),
+        keeping only courses that teach above the learner's current level.
+        A greedy set cover picks a small course set covering every such
+        skill, favouring primary skills and the preferred difficulty, and
+        adds a foundation course where the level jump is too steep. Courses
+        teaching the same skill at increasing levels become prerequisites,
+        and a topological sort orders the plan.
+
+        Returns list of dicts: [{'course_id': int, 'type': str, 'reason': str,
+        'confidence': float, 'prerequisites': [course ids]}]
+        """
+        excluded = set(completed_courses.ids) | set(self.node_ids.channel_id.ids)
+        if not self.skill_goal_ids:
+            return self._recommend_similar_courses(completed_courses, excluded)
+
+        skills = self.env['seitech.skill'].search_fetch([
+            ('id', 'child_of', self.skill_goal_ids.ids),
+            ('is_active', '=', True),
+        ], ['name'])
+        user_levels = {
+            user_skill.skill_id.id: SKILL_LEVELS.index(user_skill.current_level)
+            for user_skill in user_skills if user_skill.skill_id in skills
         }
-        
-        # Filter and sort by confidence
-        recommended = sorted(recommended, key=lambda x: x['confidence'], reverse=True)
-        
-        return recommended[:15]  # Return top 15 recommendations
+        mappings = self.env['seitech.course.skill'].search_fetch([
+            ('skill_id', 'in', skills.ids),
+            ('channel_id.is_published', '=', True),
+        ], ['channel_id', 'skill_id', 'proficiency_level', 'is_primary', 'weight'])
+
+        # Graph: course -> {skill: (level, importance, primary)}, kept above the learner's level
+        teaches = defaultdict(dict)
+        for mapping in mappings:
+            level = SKILL_LEVELS.index(mapping.proficiency_level)
+            course_id, skill_id = mapping.channel_id.id, mapping.skill_id.id
+            if course_id in excluded or level <= user_levels.get(skill_id, -1):
+                continue
+            importance = (mapping.weight or 0.1) * (2 if mapping.is_primary else 1)
+            teaches[course_id][skill_id] = (level, importance, mapping.is_primary)
+        if not teaches:
+            return []
+        courses = self.env['slide.channel'].browse(list(teaches))
+        courses.fetch(['name', 'difficulty_level', 'duration_hours'])
+        difficulty = {
+            course.id: DIFFICULTY_LEVELS.index(course.difficulty_level) if course.difficulty_level in DIFFICULTY_LEVELS else 0
+            for course in courses
+        }
+        duration = {course.id: course.duration_hours for course in courses}
+        preferred = PREFERRED_DIFFICULTY.get(self.difficulty_preference)
+        if preferred is None:
+            # Adaptive: start from the learner's overall level
+            preferred = min(max(user_levels.values(), default=0) // 2, len(DIFFICULTY_LEVELS) - 1)
+
+        # Greedy set cover of the taught skills
+        uncovered = {skill_id for taught in teaches.values() for skill_id in taught}
+        selected = {}  # course id -> ('required' | 'optional', covered skill ids)
+        while uncovered and len(selected) < MAX_GENERATED_COURSES:
+            def gain(course_id):
+                covered = teaches[course_id].keys() & uncovered
+                return (
+                    sum(teaches[course_id][skill_id][1] for skill_id in covered)
+                    - 0.5 * abs(difficulty[course_id] - preferred),
+                    -duration[course_id],
+                    -course_id,
+                )
+            best = max((c for c in teaches if c not in selected and teaches[c].keys() & uncovered), key=gain, default=None)
+            if best is None:
+                break
+            covered = teaches[best].keys() & uncovered
+            selected[best] = ('required', covered)
+            uncovered -= covered
+
+        # Foundations: bridge jumps of more than one level above the learner
+        if self.difficulty_preference in ('beginner', 'adaptive'):
+            for course_id, (__, covered) in list(selected.items()):
+                for skill_id in covered:
+                    level = teaches[course_id][skill_id][0]
+                    if level - user_levels.get(skill_id, -1) <= 1:
+                        continue
+                    foundation = min(
+                        (c for c in teaches if skill_id in teaches[c] and teaches[c][skill_id][0] < level),
+                        key=lambda c: (teaches[c][skill_id][0], difficulty[c], c),
+                        default=None,
+                    )
+                    if foundation and foundation not in selected and len(selected) < MAX_GENERATED_COURSES:
+                        selected[foundation] = ('optional', {skill_id})
+
+        # Prerequisites: same skill at a lower level, consistent with a global
+        # (difficulty, level) order so the graph cannot have a cycle
+        def rank(course_id):
+            return (difficulty[course_id],
+                    min(taught[0] for taught in teaches[course_id].values()),
+                    course_id)
+        prerequisites = defaultdict(set)
+        by_skill = defaultdict(list)
+        for course_id in selected:
+            for skill_id in teaches[course_id]:
+                by_skill[skill_id].append(course_id)
+        for skill_id, course_ids in by_skill.items():
+            course_ids.sort(key=lambda c: (teaches[c][skill_id][0], rank(c)))
+            for lower, higher in zip(course_ids, course_ids[1:]):
+                if teaches[lower][skill_id][0] < teaches[higher][skill_id][0] and rank(lower) < rank(higher):
+                    prerequisites[higher].add(lower)
+
+        # Topological sort (Kahn), easiest courses first among the ready ones
+        waiting = {course_id: len(prerequisites[course_id]) for course_id in selected}
+        dependents = defaultdict(list)
+        for course_id, lowers in prerequisites.items():
+            for lower in lowers:
+                dependents[lower].append(course_id)
+        ready = [(rank(c), c) for c, count in waiting.items() if not count]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            __, course_id = heapq.heappop(ready)
+            ordered.append(course_id)
+            for dependent in dependents[course_id]:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    heapq.heappush(ready, (rank(dependent), dependent))
+
+        skill_names = {skill.id: skill.name for skill in skills}
+        recommended = []
+        for course_id in ordered:
+            node_type, covered = selected[course_id]
+            names = ', '.join(sorted(skill_names[skill_id] for skill_id in covered))
+            primary = any(teaches[course_id][skill_id][2] for skill_id in covered)
+            recommended.append({
+                'course_id': course_id,
+                'type': node_type,
+                'reason': f'Foundation for {names}' if node_type == 'optional' else f'Teaches {names}',
+                'confidence': 0.6 if node_type == 'optional' else 0.9 if primary else 0.75,
+                'prerequisites': sorted(prerequisites[course_id]),
+            })
+        return recommended
+
+    def _recommend_similar_courses(self, completed_courses, excluded):
+        """Without target skills: courses in the categories of completed ones."""
+        categories = completed_courses.seitech_category_id
+        if not categories:
+            return []
+        similar_courses = self.env['slide.channel'].search([
+            ('seitech_category_id', 'in', categories.ids),
+            ('is_published', '=', True),
+            ('id', 'not in', list(excluded)),
+        ], limit=5)
+        return [{
+            'course_id': course.id,
+            'type': 'optional',
+            'reason': 'Based on your completed courses',
+            'confidence': 0.7,
+        } for course in similar_courses]
 
     def recalculate_path(self):
         """Recalculate path based on current progress."""
@@ -486,9 +790,8 @@ class LearningPath(models.Model):
                         subject=_('Pace Check'),
                     )
         
-        # Unlock next courses
-        for node in self.node_ids.filtered(lambda n: not n.is_unlocked):
-            node._compute_is_unlocked()
+        # Refresh enrollments, completion and unlocks of all nodes
+        self._refresh_progress()
         
         return True
 
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 """Learning path node model representing courses in a learning path."""
+from collections import defaultdict
+
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 
+from .learning_path import NODE_CLOSURE_TABLE, init_prerequisite_closure, refresh_prerequisite_closure
+
 
 class LearningPathNode(models.Model):
     """Individual course node in a learning path."""
@@ -69,34 +73,30 @@ class LearningPathNode(models.Model):
         help='Courses unlocked after completing this one',
     )
     
-    # Unlock mechanism
+    # Unlock mechanism (maintained by the progress engine, see _sync_progress)
     is_unlocked = fields.Boolean(
         string='Unlocked',
-        compute='_compute_is_unlocked',
-        store=True,
+        readonly=True,
         help='Whether the course is available to start',
     )
     unlock_date = fields.Date(
         string='Unlock Date',
-        compute='_compute_unlock_date',
-        store=True,
+        readonly=True,
         help='Date when course becomes available',
     )
     
     # Completion tracking
     is_completed = fields.Boolean(
         string='Completed',
-        compute='_compute_completion',
-        store=True,
+        readonly=True,
     )
     completion_date = fields.Datetime(
         string='Completed On',
-        compute='_compute_completion',
-        store=True,
+        readonly=True,
     )
     completion_percentage = fields.Float(
         string='Progress',
-        compute='_compute_completion',
+        related='enrollment_id.completion_percentage',
         store=True,
     )
     
@@ -104,8 +104,8 @@ class LearningPathNode(models.Model):
     enrollment_id = fields.Many2one(
         'seitech.enrollment',
         string='Enrollment',
-        compute='_compute_enrollment',
-        store=True,
+        readonly=True,
+        index='btree_not_null',
     )
     enrollment_state = fields.Selection(
         string='Enrollment Status',
@@ -115,7 +115,8 @@ class LearningPathNode(models.Model):
     # Time estimates
     estimated_hours = fields.Float(
         string='Est. Hours',
-        related='channel_id.total_time',
+        related='channel_id.duration_hours',
+        store=True,
         help='Estimated hours to complete',
     )
     time_spent = fields.Float(
@@ -145,60 +146,204 @@ class LearningPathNode(models.Model):
          'A course can only appear once in a learning path.'),
     ]
 
-    @api.depends('prerequisite_node_ids', 'prerequisite_node_ids.is_completed')
-    def _compute_is_unlocked(self):
-        """Check if all prerequisites are completed."""
-        for node in self:
-            if not node.prerequisite_node_ids:
-                node.is_unlocked = True
-            else:
-                # All prerequisites must be completed
-                node.is_unlocked = all(prereq.is_completed for prereq in node.prerequisite_node_ids)
+    def init(self):
+        # Enrollment changes look their nodes up by (learner, course)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS seitech_learning_path_node_user_channel_idx
+                ON seitech_learning_path_node (user_id, channel_id)
+        """)
+        init_prerequisite_closure(
+            self.env.cr, NODE_CLOSURE_TABLE, 'path_node_prerequisite_rel', 'node_id', self._table,
+        )
 
-    @api.depends('prerequisite_node_ids', 'prerequisite_node_ids.completion_date', 'path_id.start_date')
-    def _compute_unlock_date(self):
-        """Calculate when course will be unlocked."""
-        for node in self:
-            if not node.prerequisite_node_ids:
-                node.unlock_date = node.path_id.start_date or fields.Date.today()
-            else:
-                # Get latest prerequisite completion date
-                prereq_dates = node.prerequisite_node_ids.filtered(
-                    lambda n: n.completion_date
-                ).mapped('completion_date')
-                
-                if prereq_dates:
-                    node.unlock_date = max(prereq_dates).date()
-                elif all(node.prerequisite_node_ids.mapped('is_completed')):
-                    node.unlock_date = fields.Date.today()
+    @api.model_create_multi
+    def create(self, vals_list):
+        nodes = super().create(vals_list)
+        nodes._propagate_progress()
+        return nodes
+
+    def write(self, vals):
+        dependents = self.dependent_node_ids if 'dependent_node_ids' in vals else self.browse()
+        res = super().write(vals)
+        if dependents - self.dependent_node_ids:
+            # Unlinked dependents lost ancestors the constraint did not see
+            self.flush_model(['dependent_node_ids'])
+            refresh_prerequisite_closure(
+                self.env.cr, NODE_CLOSURE_TABLE, 'path_node_prerequisite_rel', 'node_id',
+                (dependents - self.dependent_node_ids).ids,
+            )
+        if {'path_id', 'channel_id', 'prerequisite_node_ids', 'dependent_node_ids'} & set(vals):
+            (self | dependents | self.dependent_node_ids)._propagate_progress()
+        return res
+
+    def unlink(self):
+        dependents = self.dependent_node_ids - self
+        res = super().unlink()
+        dependents = dependents.exists()
+        refresh_prerequisite_closure(
+            self.env.cr, NODE_CLOSURE_TABLE, 'path_node_prerequisite_rel', 'node_id', dependents.ids,
+        )
+        dependents._propagate_progress()
+        return res
+
+    # ==================== Progress engine ====================
+
+    def _propagate_progress(self):
+        """Refresh these nodes and every node downstream of them."""
+        if self:
+            self._sync_progress(self.path_id.ids, self.ids)
+
+    @api.model
+    def _sync_enrollment_pairs(self, pairs):
+        """Refresh the nodes (and their dependents) of ``(user_id, channel_id)`` pairs."""
+        pairs = [pair for pair in set(pairs) if all(pair)]
+        if not pairs:
+            return
+        self.env['seitech.learning.path'].flush_model(['user_id'])
+        self.flush_model(['user_id', 'channel_id'])
+        values = ', '.join(['(%s, %s)'] * len(pairs))
+        self.env.cr.execute(f"""
+            SELECT id, path_id FROM seitech_learning_path_node
+             WHERE (user_id, channel_id) IN (VALUES {values})
+        """, [value for pair in pairs for value in pair])
+        rows = self.env.cr.fetchall()
+        if rows:
+            self._sync_progress({path_id for __, path_id in rows}, [node_id for node_id, __ in rows])
+
+    @api.model
+    def _sync_progress(self, path_ids, seed_ids=None):
+        """Progress engine: refresh enrollment, completion and unlock state.
+
+        The nodes of ``path_ids`` and their prerequisite edges are loaded in
+        one query each and walked in topological order, so every node sees
+        the refreshed completion of its prerequisites. Only ``seed_ids`` and
+        the nodes downstream of them are refreshed (all nodes when None).
+        Enrollments are resolved in a single query and changed nodes are
+        written in one UPDATE: the query count does not grow with the paths.
+        """
+        path_ids = tuple(set(path_ids))
+        if not path_ids:
+            return
+        fnames = ['enrollment_id', 'is_completed', 'completion_date', 'is_unlocked', 'unlock_date']
+        self.env['seitech.learning.path'].flush_model(['user_id', 'start_date'])
+        self.flush_model(['path_id', 'channel_id', 'prerequisite_node_ids'] + fnames)
+        cr = self.env.cr
+
+        cr.execute("""
+            SELECT node.id, node.channel_id, path.user_id, path.start_date,
+                   node.enrollment_id, node.is_completed, node.completion_date,
+                   node.is_unlocked, node.unlock_date
+              FROM seitech_learning_path_node AS node
+              JOIN seitech_learning_path AS path ON path.id = node.path_id
+             WHERE node.path_id IN %s
+        """, (path_ids,))
+        nodes = {row['id']: row for row in cr.dictfetchall()}
+        cr.execute("""
+            SELECT rel.node_id, rel.prerequisite_id
+              FROM path_node_prerequisite_rel AS rel
+              JOIN seitech_learning_path_node AS node ON node.id = rel.node_id
+             WHERE node.path_id IN %s
+        """, (path_ids,))
+        prerequisites = defaultdict(list)
+        dependents = defaultdict(list)
+        for node_id, prerequisite_id in cr.fetchall():
+            if prerequisite_id in nodes:
+                prerequisites[node_id].append(prerequisite_id)
+                dependents[prerequisite_id].append(node_id)
+
+        # The seeds and everything downstream of them
+        if seed_ids is None:
+            affected = set(nodes)
+        else:
+            affected = set()
+            stack = [node_id for node_id in seed_ids if node_id in nodes]
+            while stack:
+                node_id = stack.pop()
+                if node_id not in affected:
+                    affected.add(node_id)
+                    stack.extend(dependents[node_id])
+        if not affected:
+            return
+
+        # Latest enrollment of each (learner, course)
+        pairs = {(nodes[node_id]['user_id'], nodes[node_id]['channel_id']) for node_id in affected}
+        enrollments = {}
+        for enrollment in self.env['seitech.enrollment'].sudo().search_fetch([
+            ('user_id', 'in', list({user_id for user_id, __ in pairs})),
+            ('channel_id', 'in', list({channel_id for __, channel_id in pairs})),
+        ], ['user_id', 'channel_id', 'state', 'last_activity_date'], order='create_date desc, id desc'):
+            enrollments.setdefault((enrollment.user_id.id, enrollment.channel_id.id), enrollment)
+
+        now = fields.Datetime.now()
+        today = fields.Date.context_today(self)
+        updates = {}
+        for node_id in self._topological_order(nodes, prerequisites):
+            if node_id not in affected:
+                continue
+            node = nodes[node_id]
+            enrollment = enrollments.get((node['user_id'], node['channel_id']))
+            is_completed = bool(enrollment) and enrollment.state == 'completed'
+            completion_date = None
+            if is_completed:
+                completion_date = (node['is_completed'] and node['completion_date']) or enrollment.last_activity_date or now
+
+            prerequisite_nodes = [nodes[prerequisite_id] for prerequisite_id in prerequisites[node_id]]
+            is_unlocked = all(prerequisite['is_completed'] for prerequisite in prerequisite_nodes)
+            unlock_date = None
+            if is_unlocked:
+                dates = [p['completion_date'] for p in prerequisite_nodes if p['completion_date']]
+                if dates:
+                    unlock_date = max(dates).date()
+                elif not prerequisite_nodes and node['start_date']:
+                    unlock_date = node['start_date']
                 else:
-                    node.unlock_date = False
+                    unlock_date = node['unlock_date'] or today
 
-    @api.depends('user_id', 'channel_id')
-    def _compute_enrollment(self):
-        """Find related enrollment."""
-        for node in self:
-            if node.user_id and node.channel_id:
-                enrollment = self.env['seitech.enrollment'].search([
-                    ('user_id', '=', node.user_id.id),
-                    ('channel_id', '=', node.channel_id.id),
-                ], limit=1, order='create_date desc')
-                node.enrollment_id = enrollment
-            else:
-                node.enrollment_id = False
+            values = (enrollment.id if enrollment else None, is_completed, completion_date, is_unlocked, unlock_date)
+            current = (node['enrollment_id'], bool(node['is_completed']), node['completion_date'],
+                       bool(node['is_unlocked']), node['unlock_date'])
+            # Downstream nodes read the refreshed values
+            node.update(is_completed=is_completed, completion_date=completion_date)
+            if values != current:
+                updates[node_id] = values
 
-    @api.depends('enrollment_id', 'enrollment_id.state', 'enrollment_id.completion_percentage')
-    def _compute_completion(self):
-        """Calculate completion status."""
-        for node in self:
-            if node.enrollment_id:
-                node.is_completed = node.enrollment_id.state == 'completed'
-                node.completion_date = node.enrollment_id.completion_date if node.is_completed else False
-                node.completion_percentage = node.enrollment_id.completion_percentage
-            else:
-                node.is_completed = False
-                node.completion_date = False
-                node.completion_percentage = 0.0
+        if not updates:
+            return
+        rows = ', '.join(['(%s, %s::int, %s::bool, %s::timestamp, %s::bool, %s::date)'] * len(updates))
+        cr.execute(f"""
+            UPDATE seitech_learning_path_node AS node
+               SET enrollment_id = value.enrollment_id,
+                   is_completed = value.is_completed,
+                   completion_date = value.completion_date,
+                   is_unlocked = value.is_unlocked,
+                   unlock_date = value.unlock_date
+              FROM (VALUES {rows}) AS value(id, enrollment_id, is_completed, completion_date, is_unlocked, unlock_date)
+             WHERE node.id = value.id
+        """, [value for node_id, values in updates.items() for value in (node_id, *values)])
+        changed = self.browse(list(updates))
+        changed.invalidate_recordset(fnames)
+        # The UPDATE bypassed the ORM: recompute what depends on these fields
+        changed.modified(fnames)
+
+    @api.model
+    def _topological_order(self, nodes, prerequisites):
+        """Node ids with every node after its prerequisites (Kahn's algorithm)."""
+        remaining = {node_id: len(prerequisites[node_id]) for node_id in nodes}
+        dependents = defaultdict(list)
+        for node_id in nodes:
+            for prerequisite_id in prerequisites[node_id]:
+                dependents[prerequisite_id].append(node_id)
+        ready = sorted(node_id for node_id, count in remaining.items() if not count)
+        order = []
+        while ready:
+            node_id = ready.pop()
+            order.append(node_id)
+            for dependent_id in dependents[node_id]:
+                remaining[dependent_id] -= 1
+                if not remaining[dependent_id]:
+                    ready.append(dependent_id)
+        # Nodes left over sit on a cycle (prevented by the constraint): append them
+        return order + sorted(set(nodes) - set(order))
 
     def _compute_time_spent(self):
         """Calculate time spent on course."""
@@ -208,31 +353,36 @@ class LearningPathNode(models.Model):
             else:
                 node.time_spent = 0.0
 
-    @api.constrains('prerequisite_node_ids')
+    @api.constrains('prerequisite_node_ids', 'dependent_node_ids')
     def _check_prerequisite_cycle(self):
-        """Prevent circular prerequisite dependencies."""
+        """Prevent circular prerequisite dependencies (and keep the closure current)."""
         for node in self:
             if node in node.prerequisite_node_ids:
                 raise ValidationError(_('A node cannot be its own prerequisite.'))
             
             # Check same path
-            if any(prereq.path_id != node.path_id for prereq in node.prerequisite_node_ids):
+            if any(prereq.path_id != node.path_id for prereq in node.prerequisite_node_ids | node.dependent_node_ids):
                 raise ValidationError(_('Prerequisites must be from the same learning path.'))
-            
-            # Check for cycles using DFS
-            visited = set()
-            def has_cycle(current_node):
-                if current_node.id in visited:
-                    return True
-                visited.add(current_node.id)
-                for prereq in current_node.prerequisite_node_ids:
-                    if has_cycle(prereq):
-                        return True
-                visited.remove(current_node.id)
-                return False
-            
-            if has_cycle(node):
-                raise ValidationError(_('Circular prerequisite dependency detected.'))
+        
+        self.flush_model(['prerequisite_node_ids', 'dependent_node_ids'])
+        if refresh_prerequisite_closure(
+            self.env.cr, NODE_CLOSURE_TABLE, 'path_node_prerequisite_rel', 'node_id',
+            (self | self.dependent_node_ids).ids,
+        ):
+            raise ValidationError(_('Circular prerequisite dependency detected.'))
+
+    def _all_prerequisites_completed(self):
+        """Whether every direct and indirect prerequisite is completed."""
+        self.ensure_one()
+        self.flush_model(['is_completed'])
+        self.env.cr.execute(f"""
+            SELECT 1
+              FROM {NODE_CLOSURE_TABLE} AS closure
+              JOIN seitech_learning_path_node AS node ON node.id = closure.ancestor_id
+             WHERE closure.descendant_id = %s AND node.is_completed IS NOT TRUE
+             LIMIT 1
+        """, (self.id,))
+        return not self.env.cr.fetchone()
 
     @api.constrains('deadline', 'path_id.target_completion_date')
     def _check_deadline(self):
@@ -248,7 +398,7 @@ class LearningPathNode(models.Model):
         """Enroll user in this course."""
         self.ensure_one()
         
-        if not self.is_unlocked:
+        if not self.is_unlocked or not self._all_prerequisites_completed():
             raise UserError(_('This course is locked. Complete prerequisites first.'))
         
         # Check if already enrolled
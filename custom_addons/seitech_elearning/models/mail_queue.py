@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Retry delays grow as RETRY_BASE_DELAY * 2 ** (attempts - 1), in minutes
+RETRY_BASE_DELAY = 5
+MAX_SEND_ATTEMPTS = 5
+
+# Sent entries are kept this long (they back the rate limit window)
+SENT_RETENTION_DAYS = 7
+
+
+class MailTemplate(models.Model):
+    _inherit = 'mail.template'
+
+    seitech_rate_limit = fields.Integer(
+        string='Rate Limit (per minute)',
+        default=0,
+        help='Maximum number of emails of this template sent per minute by the '
+             'e-learning mail queue. 0 = no limit.',
+    )
+
+
+class MailQueue(models.Model):
+    """Outbound notification emails, sent in batches by a cron.
+
+    Request handlers only enqueue. The cron renders the queued emails per
+    template, sends each batch over a single SMTP session per mail server,
+    retries failures with exponential backoff and honours the per-template
+    rate limits.
+    """
+    _name = 'seitech.mail.queue'
+    _description = 'E-Learning Mail Queue'
+    _order = 'next_attempt, id'
+
+    template_id = fields.Many2one('mail.template', string='Template', required=True, ondelete='cascade')
+    res_id = fields.Integer(string='Record ID', required=True)
+    mail_id = fields.Many2one('mail.mail', string='Email', ondelete='set null')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, index=True)
+    attempts = fields.Integer(string='Attempts', default=0)
+    next_attempt = fields.Datetime(string='Next Attempt', default=fields.Datetime.now, required=True)
+    sent_at = fields.Datetime(string='Sent At', index=True)
+    error = fields.Text(string='Last Error')
+
+    @api.model
+    def enqueue(self, template, records):
+        """Queue ``template`` (record or XML id) for each of ``records``."""
+        if isinstance(template, str):
+            template = self.env.ref(template, raise_if_not_found=False)
+        if not template or not records:
+            return self.browse()
+        entries = self.sudo().create([
+            {'template_id': template.id, 'res_id': res_id}
+            for res_id in records.ids
+        ])
+        self.env.ref('seitech_elearning.ir_cron_send_mail_queue')._trigger()
+        return entries
+
+    @api.model
+    def _claim_batch(self, batch_size):
+        """Lock a batch of due entries; SKIP LOCKED lets workers run side by side."""
+        self.flush_model(['state', 'next_attempt'])
+        self.env.cr.execute("""
+            SELECT id FROM seitech_mail_queue
+             WHERE state = 'pending'
+               AND next_attempt <= %s
+             ORDER BY next_attempt, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (fields.Datetime.now(), batch_size))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _send_batch(self):
+        """Render and send a claimed batch of entries."""
+        now = fields.Datetime.now()
+        sent_last_minute = dict(self._read_group(
+            [('state', '=', 'sent'), ('sent_at', '>', now - timedelta(minutes=1)),
+             ('template_id', 'in', self.template_id.ids)],
+            ['template_id'], ['__count'],
+        ))
+
+        to_send = self.browse()
+        for template, entries in self.grouped('template_id').items():
+            if template.seitech_rate_limit:
+                allowed = max(template.seitech_rate_limit - sent_last_minute.get(template, 0), 0)
+                entries[allowed:].write({'next_attempt': now + timedelta(minutes=1)})
+                entries = entries[:allowed]
+
+            to_render = entries.filtered(lambda e: not e.mail_id)
+            if to_render:
+                # Records deleted since they were queued would fail the whole batch
+                existing = set(self.env[template.model].sudo().browse(to_render.mapped('res_id')).exists().ids)
+                orphans = to_render.filtered(lambda e: e.res_id not in existing)
+                orphans.write({'state': 'failed', 'error': 'Record no longer exists'})
+                entries -= orphans
+                to_render -= orphans
+            if to_render:
+                try:
+                    with self.env.cr.savepoint():
+                        mails = template.sudo().send_mail_batch(to_render.mapped('res_id'))
+                except Exception as e:
+                    _logger.exception('Rendering %s queued emails of template %s failed',
+                                      len(to_render), template.id)
+                    to_render._schedule_retry(str(e))
+                    entries -= to_render
+                else:
+                    # The order of the rendered mails is not guaranteed: match on res_id
+                    mails_by_res_id = defaultdict(list)
+                    for mail in mails:
+                        mails_by_res_id[mail.res_id].append(mail)
+                    for entry in to_render:
+                        if mails_by_res_id[entry.res_id]:
+                            entry.mail_id = mails_by_res_id[entry.res_id].pop(0)
+                        else:
+                            entry._schedule_retry('No email rendered')
+                            entries -= entry
+            to_send |= entries
+
+        mails = to_send.mail_id.sudo()
+        mails.filtered(lambda m: m.state == 'exception').write({'state': 'outgoing'})
+        # mail.mail batches per mail server and reuses one SMTP session per batch
+        mails.send(raise_exception=False)
+
+        sent = self.browse()
+        for entry in to_send:
+            mail = entry.mail_id.sudo().exists()
+            if not mail or mail.state == 'sent':
+                sent |= entry
+            else:
+                entry._schedule_retry(mail.failure_reason or 'Email not sent')
+        sent.write({'state': 'sent', 'sent_at': now, 'error': False})
+
+    def _schedule_retry(self, error):
+        for entry in self:
+            attempts = entry.attempts + 1
+            entry.write({
+                'attempts': attempts,
+                'error': error,
+                'state': 'failed' if attempts >= MAX_SEND_ATTEMPTS else 'pending',
+                'next_attempt': fields.Datetime.now() + timedelta(
+                    minutes=RETRY_BASE_DELAY * 2 ** (attempts - 1)
+                ),
+            })
+
+    @api.model
+    def _cron_send_mail_queue(self, batch_size=200, max_batches=10):
+        """Cron job: send due queued emails batch by batch."""
+        cron = self.env.ref('seitech_elearning.ir_cron_send_mail_queue')
+        for __ in range(max_batches):
+            entries = self._claim_batch(batch_size)
+            if not entries:
+                break
+            entries._send_batch()
+            self.env.cr.commit()
+        else:
+            # Work left over: run again right away instead of at the next interval
+            cron._trigger()
+
+        # Wake up for the earliest deferred entry (rate limit or retry backoff)
+        next_pending = self.search([('state', '=', 'pending')], order='next_attempt', limit=1)
+        if next_pending:
+            cron._trigger(at=next_pending.next_attempt)
+
+        self.search([
+            ('state', '=', 'sent'),
+            ('sent_at', '<', fields.Datetime.now() - timedelta(days=SENT_RETENTION_DAYS)),
+        ]).unlink()
+
+    def action_retry(self):
+        """Re-queue failed emails."""
+        self.filtered(lambda e: e.state == 'failed').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        self.env.ref('seitech_elearning.ir_cron_send_mail_queue')._trigger()
+        return True
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+import logging
 from odoo import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
 
 class ResUsers(models.Model):
     _inherit = 'res.users'
@@ -85,3 +88,51 @@ class ResUsers(models.Model):
             elif user.seitech_role in ('student', 'student_admin'):
                 group = self.env.ref('seitech_elearning.group_elearning_student')
                 user.groups_id = [(4, group.id)]
+
+    @api.model
+    def _get_or_create_portal_users(self, partners):
+        """Return ``{partner_id: user}``, creating portal users where needed.
+
+        Users are matched by partner first, then by login (case-insensitive
+        email). Only partners with neither get a new portal user. Partners
+        whose user could not be created are left out of the result.
+        """
+        Users = self.sudo()
+        result = {}
+        for user in Users.search([('partner_id', 'in', partners.ids)]):
+            result.setdefault(user.partner_id.id, user)
+
+        remaining = partners.filtered(lambda p: p.id not in result and p.email)
+        if remaining:
+            emails = list({partner.email.strip().lower() for partner in remaining})
+            self.env.cr.execute(
+                "SELECT id, lower(login) FROM res_users WHERE active AND lower(login) = ANY(%s)",
+                (emails,),
+            )
+            by_login = {login: Users.browse(user_id) for user_id, login in self.env.cr.fetchall()}
+            for partner in remaining:
+                user = by_login.get(partner.email.strip().lower())
+                if user:
+                    result[partner.id] = user
+
+        missing = remaining.filtered(lambda p: p.id not in result)
+        portal_group = self.env.ref('base.group_portal', raise_if_not_found=False)
+        if missing and not portal_group:
+            _logger.error("Portal group not found - base.group_portal does not exist")
+            return result
+        for partner in missing:
+            try:
+                with self.env.cr.savepoint():
+                    # In Odoo 19, we must set group_ids during creation to override defaults
+                    # The default _default_groups assigns base.group_user which conflicts with portal
+                    result[partner.id] = Users.with_context(no_reset_password=True).create({
+                        'name': partner.name,
+                        'login': partner.email,
+                        'email': partner.email,
+                        'partner_id': partner.id,
+                        'active': True,
+                        'group_ids': [(6, 0, [portal_group.id])],  # Replace all groups with just portal
+                    })
+            except Exception as e:
+                _logger.exception(f"Could not create portal user for {partner.email}: {e}")
+        return result
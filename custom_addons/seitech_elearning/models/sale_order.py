@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 """Sale order extension for course purchases."""
+import logging
+
 from odoo import models, fields, api, _
 
+_logger = logging.getLogger(__name__)
+
 
 class SaleOrder(models.Model):
     """Extend sale.order to handle course enrollments."""
@@ -14,84 +18,61 @@ class SaleOrder(models.Model):
         return result
 
     def _create_course_enrollments(self):
-        """Create course enrollments for purchased course products."""
-        Enrollment = self.env['seitech.enrollment']
-        Channel = self.env['slide.channel']
-
-        for order in self:
-            for line in order.order_line:
-                # Find courses linked to this product
-                course = Channel.search([
-                    ('product_id', '=', line.product_id.id),
-                ], limit=1)
-
-                if course and order.partner_id:
-                    # Get user from partner
-                    user = self.env['res.users'].search([
-                        ('partner_id', '=', order.partner_id.id),
-                    ], limit=1)
-
-                    if not user:
-                        # Create portal user for the partner
-                        user = self._create_portal_user(order.partner_id)
-
-                    if user:
-                        # Check if already enrolled
-                        existing = Enrollment.search([
-                            ('channel_id', '=', course.id),
-                            ('user_id', '=', user.id),
-                        ], limit=1)
-
-                        if not existing:
-                            enrollment = Enrollment.create({
-                                'channel_id': course.id,
-                                'user_id': user.id,
-                                'enrollment_type': 'paid',
-                                'amount_paid': line.price_total,
-                                'sale_order_id': order.id,
-                                'state': 'pending',
-                            })
-                            # Will be activated when payment is confirmed
-
-    def _create_portal_user(self, partner):
-        """Create a portal user for the partner."""
-        self.ensure_one()
-        if not partner.email:
-            return None
-
-        # Check if user already exists with this email
-        existing_user = self.env['res.users'].search([
-            ('login', '=', partner.email),
-        ], limit=1)
-        if existing_user:
-            return existing_user
-
-        # Check if user exists by partner
-        existing_user = self.env['res.users'].search([
-            ('partner_id', '=', partner.id),
-        ], limit=1)
-        if existing_user:
-            return existing_user
-
-        # Create portal user directly
-        try:
-            portal_group = self.env.ref('base.group_portal', raise_if_not_found=False)
-            if not portal_group:
-                return None
-
-            # In Odoo 19, we must set group_ids during creation to override defaults
-            # The default _default_groups assigns base.group_user which conflicts with portal
-            user = self.env['res.users'].with_context(no_reset_password=True).create({
-                'name': partner.name,
-                'login': partner.email,
-                'email': partner.email,
-                'partner_id': partner.id,
-                'active': True,
-                'group_ids': [(6, 0, [portal_group.id])],  # Replace all groups with just portal
-            })
-            return user
-        except Exception:
-            return None
+        """Create pending course enrollments for purchased course products."""
+        return self._provision_course_enrollments()
+
+    def _provision_course_enrollments(self, activate=False):
+        """Enroll the customers of these orders in the courses they bought.
+
+        Product to course and partner to user mappings are resolved for all
+        orders at once, existing enrollments are read in one query and the
+        missing ones are created in a single batch, as ``pending`` (activated
+        on payment) unless ``activate`` is set. With ``activate``, existing
+        draft or pending enrollments of these orders' courses are activated
+        too.
+
+        Returns every enrollment matching the order lines, new or existing.
+        """
+        Enrollment = self.env['seitech.enrollment'].sudo()
+        lines = self.order_line.filtered(lambda l: l.product_id and l.order_id.partner_id)
+        courses_by_product = self.env['slide.channel'].sudo()._get_courses_by_product(lines.product_id)
+        lines = lines.filtered(lambda l: l.product_id.id in courses_by_product)
+        if not lines:
+            return Enrollment
+        users = self.env['res.users'].sudo()._get_or_create_portal_users(lines.order_id.partner_id)
+
+        # (course, user) -> line; a course bought twice is enrolled once
+        wanted = {}
+        for line in lines:
+            user = users.get(line.order_id.partner_id.id)
+            if user:
+                wanted.setdefault((courses_by_product[line.product_id.id].id, user.id), line)
+        if not wanted:
+            return Enrollment
+
+        course_ids = {course_id for course_id, __ in wanted}
+        user_ids = {user_id for __, user_id in wanted}
+        existing = Enrollment.search_fetch([
+            ('channel_id', 'in', list(course_ids)),
+            ('user_id', 'in', list(user_ids)),
+        ], ['channel_id', 'user_id', 'state'])
+        existing = existing.filtered(lambda e: (e.channel_id.id, e.user_id.id) in wanted)
+        enrolled = {(e.channel_id.id, e.user_id.id) for e in existing}
+
+        created = Enrollment.with_context(mail_create_nolog=True, mail_create_nosubscribe=True).create([{
+            'channel_id': course_id,
+            'user_id': user_id,
+            'enrollment_type': 'paid',
+            'amount_paid': line.price_total,
+            'sale_order_id': line.order_id.id,
+            'state': 'pending',
+        } for (course_id, user_id), line in wanted.items() if (course_id, user_id) not in enrolled])
+        _logger.info('Provisioned %s enrollments for orders %s', len(created), self.ids)
+
+        enrollments = existing | created
+        if activate:
+            enrollments.action_activate()
+        return enrollments
 
 
 class SaleOrderLine(models.Model):
@@ -107,15 +88,9 @@ class SaleOrderLine(models.Model):
 
     @api.depends('product_id')
     def _compute_course_id(self):
-        Channel = self.env['slide.channel']
+        courses_by_product = self.env['slide.channel']._get_courses_by_product(self.product_id)
         for line in self:
-            if line.product_id:
-                course = Channel.search([
-                    ('product_id', '=', line.product_id.id),
-                ], limit=1)
-                line.course_id = course.id if course else False
-            else:
-                line.course_id = False
+            line.course_id = courses_by_product.get(line.product_id.id, False)
 
 
 class AccountPayment(models.Model):
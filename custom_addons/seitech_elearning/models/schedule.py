@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
 from datetime import timedelta
 
+# Attendee states that occupy a seat
+SEAT_STATES = ('held', 'registered', 'attended')
+
+# How long a seat hold lasts before it is released
+SEAT_HOLD_MINUTES = 10
+
+# Schedule and attendee fields that decide whether and when a reminder is due
+REMINDER_SCHEDULE_FIELDS = ('start_datetime', 'reminder_time', 'send_reminder', 'state')
+
 
 class Schedule(models.Model):
     """Live class scheduling for courses."""
@@ -88,6 +98,19 @@ class Schedule(models.Model):
         default=True,
     )
     registration_deadline = fields.Datetime(string='Registration Deadline')
+    seats_taken = fields.Integer(
+        string='Seats Taken',
+        default=0,
+        readonly=True,
+        copy=False,
+        help='Held, registered and attended seats. Maintained atomically on '
+             'registration so concurrent sign-ups cannot overbook.',
+    )
+    waitlist_count = fields.Integer(
+        string='Waitlisted',
+        compute='_compute_attendee_count',
+        store=True,
+    )
 
     # Attendees
     attendee_ids = fields.One2many(
@@ -136,6 +159,13 @@ class Schedule(models.Model):
         string='Calendar Event',
     )
 
+    def init(self):
+        # Calendar and upcoming queries filter on state and a start time window
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS seitech_schedule_state_start_idx
+                ON seitech_schedule (state, start_datetime)
+        """)
+
     @api.model
     def _tz_get(self):
         return [(x, x) for x in sorted(
@@ -153,14 +183,21 @@ class Schedule(models.Model):
 
     @api.depends('attendee_ids', 'attendee_ids.state')
     def _compute_attendee_count(self):
+        counts = defaultdict(int)
+        saved = self.filtered('id')
+        if saved:
+            for schedule, state, count in self.env['seitech.schedule.attendee']._read_group(
+                [('schedule_id', 'in', saved.ids)], ['schedule_id', 'state'], ['__count'],
+            ):
+                counts[schedule.id, state] += count
+        for schedule in self - saved:
+            # Unsaved form: count the attendee lines in memory
+            for attendee in schedule.attendee_ids:
+                counts[schedule.id, attendee.state] += 1
         for schedule in self:
-            attendees = schedule.attendee_ids
-            schedule.attendee_count = len(attendees.filtered(
-                lambda a: a.state in ('registered', 'attended')
-            ))
-            schedule.actual_attendee_count = len(attendees.filtered(
-                lambda a: a.state == 'attended'
-            ))
+            schedule.attendee_count = counts[schedule.id, 'registered'] + counts[schedule.id, 'attended']
+            schedule.actual_attendee_count = counts[schedule.id, 'attended']
+            schedule.waitlist_count = counts[schedule.id, 'waitlisted']
 
     @api.constrains('start_datetime', 'end_datetime')
     def _check_dates(self):
@@ -170,6 +207,133 @@ class Schedule(models.Model):
                     _('End time must be after start time.')
                 )
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'max_attendees' in vals:
+            self._promote_waitlist()
+        if any(field in vals for field in REMINDER_SCHEDULE_FIELDS):
+            self.env['seitech.schedule.reminder']._sync(schedules=self)
+        return res
+
+    # ==================== Seat reservation ====================
+
+    def _reserve_seat(self):
+        """Atomically take a seat. Returns False when the class is full.
+
+        The conditional UPDATE locks the schedule row until the end of the
+        transaction, so concurrent registrations are serialized on it and the
+        capacity check cannot be raced.
+        """
+        self.ensure_one()
+        self.flush_recordset(['max_attendees', 'seats_taken'])
+        self.env.cr.execute("""
+            UPDATE seitech_schedule
+               SET seats_taken = seats_taken + 1
+             WHERE id = %s
+               AND (COALESCE(max_attendees, 0) = 0 OR seats_taken < max_attendees)
+         RETURNING seats_taken
+        """, (self.id,))
+        reserved = bool(self.env.cr.fetchone())
+        self.invalidate_recordset(['seats_taken'])
+        return reserved
+
+    @api.model
+    def _apply_seat_deltas(self, deltas):
+        """Shift the stored seat counters in place.
+
+        :param deltas: dict ``{schedule_id: seats_delta}``
+        """
+        deltas = {schedule_id: delta for schedule_id, delta in deltas.items() if schedule_id and delta}
+        if not deltas:
+            return
+        values = ', '.join(['(%s, %s)'] * len(deltas))
+        params = [value for item in deltas.items() for value in item]
+        self.env.cr.execute(f"""
+            UPDATE seitech_schedule AS schedule
+               SET seats_taken = GREATEST(schedule.seats_taken + delta.seats, 0)
+              FROM (VALUES {values}) AS delta(id, seats)
+             WHERE schedule.id = delta.id
+        """, params)
+        self.browse(list(deltas)).invalidate_recordset(['seats_taken'])
+
+    def action_recompute_seats(self):
+        """Resynchronise the seat counters from the attendee table."""
+        schedules = self or self.search([])
+        if not schedules:
+            return True
+        self.env['seitech.schedule.attendee'].flush_model(['schedule_id', 'state'])
+        self.env.cr.execute("""
+            UPDATE seitech_schedule AS schedule
+               SET seats_taken = (
+                       SELECT COUNT(*) FROM seitech_schedule_attendee
+                        WHERE schedule_id = schedule.id AND state IN %s
+                   )
+             WHERE schedule.id IN %s
+        """, (SEAT_STATES, tuple(schedules.ids)))
+        schedules.invalidate_recordset(['seats_taken'])
+        return True
+
+    def _register(self, user, notes='', hold=False, waitlist=False):
+        """Register ``user``, holding a seat for a few minutes if ``hold``.
+
+        When the class is full the user joins the waitlist if ``waitlist``,
+        otherwise a UserError is raised. Returns the attendee.
+        """
+        self.ensure_one()
+        Attendee = self.env['seitech.schedule.attendee']
+        attendee = Attendee.search([
+            ('schedule_id', '=', self.id),
+            ('user_id', '=', user.id),
+        ], limit=1)
+        if attendee.state in ('registered', 'attended'):
+            raise UserError(_('You are already registered for this session'))
+        if attendee.state == 'held':
+            if not hold:
+                attendee._confirm_hold()
+            return attendee
+        if attendee.state == 'waitlisted':
+            raise UserError(_('You are already on the waitlist for this session'))
+
+        if self._reserve_seat():
+            vals = {
+                'state': 'held' if hold else 'registered',
+                'hold_expires_at': fields.Datetime.now() + timedelta(minutes=SEAT_HOLD_MINUTES) if hold else False,
+            }
+            Attendee = Attendee.with_context(seat_reserved=True)
+        elif waitlist:
+            vals = {'state': 'waitlisted', 'hold_expires_at': False}
+        else:
+            raise UserError(_('This session is fully booked'))
+
+        vals.update(registration_date=fields.Datetime.now(), notes=notes)
+        if attendee:
+            # Cancelled or absent before: the (schedule, user) row is reused
+            attendee.with_context(Attendee.env.context).write(vals)
+            return attendee
+        return Attendee.create(dict(vals, schedule_id=self.id, user_id=user.id))
+
+    def _promote_waitlist(self):
+        """Give freed seats to waitlisted attendees, first come first served,
+        and let them know by email."""
+        Attendee = self.env['seitech.schedule.attendee'].with_context(seat_reserved=True)
+        promoted = Attendee
+        for schedule in self.filtered(lambda s: s.state == 'scheduled'):
+            while True:
+                self.env.cr.execute("""
+                    SELECT id FROM seitech_schedule_attendee
+                     WHERE schedule_id = %s AND state = 'waitlisted'
+                     ORDER BY registration_date, id
+                     LIMIT 1
+                       FOR UPDATE SKIP LOCKED
+                """, (schedule.id,))
+                row = self.env.cr.fetchone()
+                if not row or not schedule._reserve_seat():
+                    break
+                attendee = Attendee.browse(row[0])
+                attendee.write({'state': 'registered'})
+                promoted |= attendee
+        self.env['seitech.mail.queue'].enqueue('seitech_elearning.schedule_waitlist_promoted_email', promoted)
+
     def action_schedule(self):
         """Schedule the class."""
         for schedule in self:
@@ -211,36 +375,28 @@ class Schedule(models.Model):
 
     def _notify_cancellation(self):
         """Send cancellation notification to attendees."""
-        template = self.env.ref(
+        self.env['seitech.mail.queue'].enqueue(
             'seitech_elearning.schedule_cancelled_email',
-            raise_if_not_found=False
+            self.attendee_ids.filtered(lambda a: a.state == 'registered'),
         )
-        if template:
-            for attendee in self.attendee_ids.filtered(lambda a: a.state == 'registered'):
-                template.send_mail(attendee.id, force_send=False)
 
     @api.model
-    def _cron_send_reminders(self):
-        """Send reminders for upcoming classes."""
-        now = fields.Datetime.now()
-        schedules = self.search([
-            ('state', '=', 'scheduled'),
-            ('send_reminder', '=', True),
-        ])
-        for schedule in schedules:
-            reminder_time = now + timedelta(hours=schedule.reminder_time)
-            if schedule.start_datetime <= reminder_time:
-                schedule._send_reminder_emails()
+    def _cron_send_reminders(self, batch_size=500, max_batches=20):
+        """Cron job: send the due reminders from the reminder queue."""
+        Reminder = self.env['seitech.schedule.reminder']
+        for __ in range(max_batches):
+            attendees = Reminder._pop_due(batch_size)
+            if not attendees:
+                break
+            self.env['seitech.mail.queue'].enqueue('seitech_elearning.schedule_reminder_email', attendees)
+            self.env.cr.commit()
 
     def _send_reminder_emails(self):
         """Send reminder emails to attendees."""
-        template = self.env.ref(
+        self.env['seitech.mail.queue'].enqueue(
             'seitech_elearning.schedule_reminder_email',
-            raise_if_not_found=False
+            self.attendee_ids.filtered(lambda a: a.state == 'registered'),
         )
-        if template:
-            for attendee in self.attendee_ids.filtered(lambda a: a.state == 'registered'):
-                template.send_mail(attendee.id, force_send=False)
 
     def action_view_attendees(self):
         """View attendees for this schedule."""
@@ -284,11 +440,20 @@ class ScheduleAttendee(models.Model):
     )
 
     state = fields.Selection([
+        ('held', 'Seat Held'),
+        ('waitlisted', 'Waitlisted'),
         ('registered', 'Registered'),
         ('attended', 'Attended'),
         ('absent', 'Absent'),
         ('cancelled', 'Cancelled'),
-    ], string='Status', default='registered')
+    ], string='Status', default='registered', index=True)
+    hold_expires_at = fields.Datetime(string='Hold Expires At', copy=False)
+    reminder_sent_for = fields.Datetime(
+        string='Reminded For',
+        copy=False,
+        readonly=True,
+        help='Session start time the last reminder was sent for.',
+    )
 
     registration_date = fields.Datetime(
         string='Registration Date',
@@ -302,6 +467,94 @@ class ScheduleAttendee(models.Model):
          'User is already registered for this session.'),
     ]
 
+    def init(self):
+        # Seed the seat counters (new column on upgrade) and fix any drift
+        self.env.cr.execute("""
+            UPDATE seitech_schedule AS schedule
+               SET seats_taken = seats.taken
+              FROM (
+                    SELECT schedule.id, COUNT(attendee.id) AS taken
+                      FROM seitech_schedule AS schedule
+                 LEFT JOIN seitech_schedule_attendee AS attendee
+                        ON attendee.schedule_id = schedule.id AND attendee.state IN %s
+                  GROUP BY schedule.id
+                   ) AS seats
+             WHERE schedule.id = seats.id
+               AND schedule.seats_taken IS DISTINCT FROM seats.taken
+        """, (SEAT_STATES,))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attendees = super().create(vals_list)
+        if not self.env.context.get('seat_reserved'):
+            attendees._update_seat_counters(1)
+        self.env['seitech.schedule.reminder']._sync(attendees=attendees)
+        return attendees
+
+    def write(self, vals):
+        if 'state' not in vals and 'schedule_id' not in vals:
+            return super().write(vals)
+        freed = self.filtered(lambda a: a.state in SEAT_STATES).schedule_id
+        # With seat_reserved the attendee already holds its seat: either it
+        # was just taken by _reserve_seat() or a held seat is being confirmed
+        seat_reserved = self.env.context.get('seat_reserved')
+        if not seat_reserved:
+            self._update_seat_counters(-1)
+        res = super().write(vals)
+        if not seat_reserved:
+            self._update_seat_counters(1)
+        if vals.get('state') not in SEAT_STATES:
+            freed._promote_waitlist()
+        self.env['seitech.schedule.reminder']._sync(attendees=self)
+        return res
+
+    def unlink(self):
+        freed = self.filtered(lambda a: a.state in SEAT_STATES).schedule_id
+        self._update_seat_counters(-1)
+        res = super().unlink()
+        freed.exists()._promote_waitlist()
+        return res
+
+    def _update_seat_counters(self, sign):
+        """Add (sign=1) or remove (sign=-1) the seats of these attendees."""
+        deltas = defaultdict(int)
+        for attendee in self:
+            if attendee.state in SEAT_STATES:
+                deltas[attendee.schedule_id.id] += sign
+        self.env['seitech.schedule'].sudo()._apply_seat_deltas(deltas)
+
+    def _confirm_hold(self):
+        """Turn held seats into registrations."""
+        held = self.filtered(lambda a: a.state == 'held')
+        if any(a.hold_expires_at and a.hold_expires_at < fields.Datetime.now() for a in held):
+            raise UserError(_('Your seat hold has expired'))
+        held.with_context(seat_reserved=True).write({'state': 'registered', 'hold_expires_at': False})
+        return True
+
+    @api.model
+    def _cron_release_expired_holds(self):
+        """Release expired seat holds in one UPDATE and refill from the waitlists."""
+        self.flush_model(['state', 'hold_expires_at'])
+        self.env.cr.execute("""
+            UPDATE seitech_schedule_attendee
+               SET state = 'cancelled', hold_expires_at = NULL
+             WHERE state = 'held' AND hold_expires_at < %s
+         RETURNING id, schedule_id
+        """, (fields.Datetime.now(),))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return
+        released = defaultdict(int)
+        for __, schedule_id in rows:
+            released[schedule_id] -= 1
+        attendees = self.browse([attendee_id for attendee_id, __ in rows])
+        attendees.invalidate_recordset(['state', 'hold_expires_at'])
+        # The UPDATE bypassed the ORM: recompute the schedules' stored counts
+        attendees.modified(['state'])
+        Schedule = self.env['seitech.schedule']
+        Schedule._apply_seat_deltas(released)
+        Schedule.browse(list(released))._promote_waitlist()
+
     def action_mark_attended(self):
         """Mark attendee as present."""
         for attendee in self:
@@ -314,5 +567,127 @@ class ScheduleAttendee(models.Model):
         self.write({'state': 'absent'})
 
     def action_cancel(self):
-        """Cancel registration."""
-        self.write({'state': 'cancelled'})
+        """Cancel registration (frees the seat for the waitlist)."""
+        self.write({'state': 'cancelled', 'hold_expires_at': False})
+
+
+class ScheduleReminder(models.Model):
+    """Pending live class reminders, one row per registered attendee.
+
+    Rows are kept in sync with the attendee and schedule they depend on and
+    carry the time the reminder is due. The cron pops only due rows, so a
+    tick costs time proportional to the reminders it sends. Popping deletes
+    the row and stamps the attendee's ``reminder_sent_for`` in the same
+    transaction as the emails are queued: each reminder is sent once per
+    session start time, and again only if the session is rescheduled.
+    """
+    _name = 'seitech.schedule.reminder'
+    _description = 'Live Class Reminder'
+    _order = 'remind_at, id'
+
+    attendee_id = fields.Many2one(
+        'seitech.schedule.attendee',
+        string='Attendee',
+        required=True,
+        ondelete='cascade',
+    )
+    schedule_id = fields.Many2one(
+        'seitech.schedule',
+        string='Schedule',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    remind_at = fields.Datetime(string='Remind At', required=True, index=True)
+
+    _sql_constraints = [
+        ('unique_attendee', 'UNIQUE(attendee_id)', 'An attendee has a single pending reminder.'),
+    ]
+
+    def init(self):
+        self.env.cr.execute("SELECT 1 FROM seitech_schedule_reminder LIMIT 1")
+        if not self.env.cr.fetchone():
+            # First install: queue the reminders not yet due. Those already
+            # in their window were handled by the former scan-based cron.
+            self._sync(future_only=True)
+
+    @api.model
+    def _sync(self, attendees=None, schedules=None, future_only=False):
+        """Rebuild the pending reminders of ``attendees`` or ``schedules``.
+
+        Without either, the reminders of every attendee are rebuilt.
+        """
+        if (attendees is not None and not attendees) or (schedules is not None and not schedules):
+            return
+        self.env['seitech.schedule'].flush_model(REMINDER_SCHEDULE_FIELDS)
+        self.env['seitech.schedule.attendee'].flush_model(['schedule_id', 'state', 'reminder_sent_for'])
+
+        now = fields.Datetime.now()
+        params = {'uid': self.env.uid, 'now': now}
+        conditions = []
+        if attendees is not None:
+            params['ids'] = tuple(attendees.ids)
+            conditions.append('attendee.id IN %(ids)s')
+            self.env.cr.execute("DELETE FROM seitech_schedule_reminder WHERE attendee_id IN %(ids)s", params)
+        elif schedules is not None:
+            params['ids'] = tuple(schedules.ids)
+            conditions.append('attendee.schedule_id IN %(ids)s')
+            self.env.cr.execute("DELETE FROM seitech_schedule_reminder WHERE schedule_id IN %(ids)s", params)
+        else:
+            self.env.cr.execute("DELETE FROM seitech_schedule_reminder")
+        if future_only:
+            conditions.append('schedule.start_datetime - make_interval(hours => COALESCE(schedule.reminder_time, 0)) > %(now)s')
+
+        self.env.cr.execute(f"""
+            INSERT INTO seitech_schedule_reminder
+                   (attendee_id, schedule_id, remind_at, create_uid, create_date, write_uid, write_date)
+            SELECT attendee.id, schedule.id,
+                   schedule.start_datetime - make_interval(hours => COALESCE(schedule.reminder_time, 0)),
+                   %(uid)s, %(now)s, %(uid)s, %(now)s
+              FROM seitech_schedule_attendee AS attendee
+              JOIN seitech_schedule AS schedule ON schedule.id = attendee.schedule_id
+             WHERE attendee.state = 'registered'
+               AND schedule.state = 'scheduled'
+               AND schedule.send_reminder
+               AND schedule.start_datetime > %(now)s
+               AND attendee.reminder_sent_for IS DISTINCT FROM schedule.start_datetime
+               {''.join(f' AND {condition}' for condition in conditions)}
+        """, params)
+        self.invalidate_model()
+
+    @api.model
+    def _pop_due(self, limit):
+        """Remove up to ``limit`` due reminders and return their attendees.
+
+        SKIP LOCKED lets concurrent workers pop disjoint batches. The popped
+        attendees are stamped with the start time they were reminded for.
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            DELETE FROM seitech_schedule_reminder
+             WHERE id IN (
+                   SELECT id FROM seitech_schedule_reminder
+                    WHERE remind_at <= %s
+                    ORDER BY remind_at, id
+                    LIMIT %s
+                      FOR UPDATE SKIP LOCKED
+             )
+         RETURNING attendee_id
+        """, (now, limit))
+        attendee_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not attendee_ids:
+            return self.env['seitech.schedule.attendee']
+        self.invalidate_model()
+        # Sessions that started since the row was queued are not reminded
+        self.env.cr.execute("""
+            UPDATE seitech_schedule_attendee AS attendee
+               SET reminder_sent_for = schedule.start_datetime
+              FROM seitech_schedule AS schedule
+             WHERE schedule.id = attendee.schedule_id
+               AND attendee.id IN %s
+               AND schedule.start_datetime > %s
+         RETURNING attendee.id
+        """, (tuple(attendee_ids), now))
+        attendees = self.env['seitech.schedule.attendee'].browse([row[0] for row in self.env.cr.fetchall()])
+        attendees.invalidate_recordset(['reminder_sent_for'])
+        return attendees
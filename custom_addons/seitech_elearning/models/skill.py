@@ -195,29 +195,62 @@ class Skill(models.Model):
             skill.trend_score = (recent_enrollments * 0.6) + (recent_acquisitions * 0.4)
             skill.is_trending = skill.trend_score > 10  # Threshold for trending
 
+    def init(self):
+        # parent_path prefix lookups (child_of, descendants) need a pattern index
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS seitech_skill_parent_path_pattern_idx
+                ON seitech_skill (parent_path text_pattern_ops)
+        """)
+
     @api.constrains('parent_id')
     def _check_parent_recursion(self):
         """Prevent circular parent relationships."""
-        if not self._check_recursion():
+        if self._has_cycle():
             raise ValidationError(_('You cannot create recursive skill hierarchies.'))
 
     def get_full_path(self):
         """Get full hierarchical path of skill."""
         self.ensure_one()
-        path = [self.name]
-        current = self.parent_id
-        while current:
-            path.insert(0, current.name)
-            current = current.parent_id
-        return ' > '.join(path)
+        return self.get_full_paths()[self.id]
+
+    def get_full_paths(self, separator=' > '):
+        """Return ``{skill id: full path}`` for all these skills.
+
+        The ancestors are read from ``parent_path``, so the names of every
+        skill on every path are fetched in a single query.
+        """
+        self.flush_model(['parent_id'])
+        self.fetch(['parent_path'])
+        paths = {
+            skill.id: [int(ancestor_id) for ancestor_id in skill.parent_path.strip('/').split('/')]
+            for skill in self
+        }
+        ancestors = self.browse({ancestor_id for path in paths.values() for ancestor_id in path})
+        ancestors.fetch(['name'])
+        names = {ancestor.id: ancestor.name for ancestor in ancestors}
+        return {
+            skill_id: separator.join(names[ancestor_id] for ancestor_id in path)
+            for skill_id, path in paths.items()
+        }
 
     def get_all_children(self):
         """Get all descendant skills."""
         self.ensure_one()
-        children = self.child_ids
-        for child in self.child_ids:
-            children |= child.get_all_children()
-        return children
+        return self.search([('id', 'child_of', self.id), ('id', '!=', self.id)])
+
+    def get_ancestors(self):
+        """Get all ancestor skills, from the root down."""
+        self.ensure_one()
+        self.flush_model(['parent_id'])
+        ancestor_ids = self.parent_path.strip('/').split('/')[:-1]
+        return self.browse([int(ancestor_id) for ancestor_id in ancestor_ids])
+
+    def get_courses(self, include_subskills=True):
+        """Get the courses teaching these skills (and their sub-skills)."""
+        operator = 'child_of' if include_subskills else 'in'
+        return self.env['seitech.course.skill'].search_fetch(
+            [('skill_id', operator, self.ids)], ['channel_id'],
+        ).channel_id
 
     def get_related_skills(self, limit=5):
         """Get related skills based on course overlap."""
@@ -1,6 +1,21 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from collections import defaultdict
+
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
+
+# Catalogue price bands: (key, label, lower bound, upper bound exclusive)
+PRICE_BANDS = [
+    ('free', 'Free', 0, 0),
+    ('under_100', 'Under 100', 0, 100),
+    ('100_500', '100 - 500', 100, 500),
+    ('500_1000', '500 - 1,000', 500, 1000),
+    ('over_1000', 'Over 1,000', 1000, None),
+]
+
+# Hours assumed for a lesson without a completion time (15 minutes)
+DEFAULT_LESSON_HOURS = 0.25
 
 
 class SlideChannel(models.Model):
@@ -17,9 +32,17 @@ class SlideChannel(models.Model):
     )
     sale_price = fields.Float(string='Sale Price', digits='Product Price')
     is_on_sale = fields.Boolean(string='On Sale', default=False)
+    price_band = fields.Selection(
+        [(key, label) for key, label, _lower, _upper in PRICE_BANDS],
+        string='Price Band',
+        compute='_compute_price_band',
+        store=True,
+        index=True,
+    )
     product_id = fields.Many2one(
         'product.product',
         string='Product',
+        index='btree_not_null',
         help='Product linked for e-commerce integration',
     )
 
@@ -73,15 +96,36 @@ class SlideChannel(models.Model):
         'channel_id',
         string='Enrollments',
     )
+    # Counters are maintained incrementally by seitech.enrollment
     enrollment_count = fields.Integer(
         string='Enrollments',
-        compute='_compute_enrollment_count',
-        store=True,
+        default=0,
+        readonly=True,
+        copy=False,
+        index=True,
     )
     active_enrollment_count = fields.Integer(
         string='Active Enrollments',
-        compute='_compute_enrollment_count',
+        default=0,
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
+    # Estimated study time, kept up to date by the ORM as lessons change
+    duration_hours = fields.Float(
+        string='Estimated Hours',
+        compute='_compute_duration_hours',
         store=True,
+        help='Sum of the lesson completion times (15 minutes per lesson without one)',
+    )
+
+    # Curriculum cache key, bumped from a sequence whenever slides change
+    curriculum_version = fields.Integer(
+        string='Curriculum Version',
+        default=0,
+        readonly=True,
+        copy=False,
     )
 
     # Certificates
@@ -120,16 +164,147 @@ class SlideChannel(models.Model):
     is_enrollment_open = fields.Boolean(
         string='Enrollment Open',
         compute='_compute_is_enrollment_open',
+        search='_search_is_enrollment_open',
     )
 
-    @api.depends('enrollment_ids', 'enrollment_ids.state')
-    def _compute_enrollment_count(self):
-        for channel in self:
-            enrollments = channel.enrollment_ids
-            channel.enrollment_count = len(enrollments)
-            channel.active_enrollment_count = len(
-                enrollments.filtered(lambda e: e.state == 'active')
-            )
+    @api.model_create_multi
+    def create(self, vals_list):
+        channels = super().create(vals_list)
+        # Sellable courses get their product up front, not at checkout
+        channels.filtered('is_published')._prepare_products()
+        return channels
+
+    def write(self, vals):
+        res = super().write(vals)
+        if vals.get('is_published'):
+            self._prepare_products()
+        if 'name' in vals:
+            # Certificate verification shows the course name
+            self.env['seitech.certificate']._bump_verification_version()
+        return res
+
+    def init(self):
+        super().init()
+        self.env.cr.execute("""
+            CREATE SEQUENCE IF NOT EXISTS slide_channel_curriculum_version_seq
+        """)
+
+    def _bump_curriculum_version(self):
+        """Invalidate the cached curriculum of these courses.
+
+        Versions come from a database sequence rather than ``+ 1`` so that a
+        value is never reused after a rolled back transaction.
+        """
+        if not self.ids:
+            return
+        self.env.cr.execute("""
+            UPDATE slide_channel
+               SET curriculum_version = nextval('slide_channel_curriculum_version_seq')
+             WHERE id IN %s
+        """, (tuple(self.ids),))
+        self.invalidate_recordset(['curriculum_version'])
+
+    def _get_curriculum(self):
+        """Return the section -> lessons tree of the course.
+
+        The tree is cached per curriculum version and language; callers must
+        treat it as read-only.
+        """
+        self.ensure_one()
+        return self._get_curriculum_cached(self.id, self.curriculum_version, self.env.lang)
+
+    def _get_curriculum_section(self, section_id):
+        """Return one section of the curriculum (0 = uncategorized), or None."""
+        self.ensure_one()
+        sections = self._get_curriculum()['sections']
+        return next((section for section in sections if section['id'] == section_id), None)
+
+    @api.model
+    @tools.ormcache('channel_id', 'version', 'lang')
+    def _get_curriculum_cached(self, channel_id, version, lang):
+        slides = self.env['slide.slide'].sudo().with_context(lang=lang).search_fetch(
+            [('channel_id', '=', channel_id)],
+            ['name', 'is_category', 'category_id', 'slide_type', 'completion_time', 'is_preview'],
+            order='sequence, id',
+        )
+
+        sections = {}
+        for slide in slides:
+            if slide.is_category:
+                sections.setdefault(slide.id, {'id': slide.id, 'slides': []})['name'] = slide.name
+                continue
+            section_id = slide.category_id.id or 0
+            section = sections.setdefault(section_id, {
+                'id': section_id,
+                'name': 'Uncategorized',
+                'slides': [],
+            })
+            section['slides'].append({
+                'id': slide.id,
+                'name': slide.name,
+                'slideType': slide.slide_type,
+                'duration': slide.completion_time or 0,
+                'isPreview': slide.is_preview or False,
+            })
+
+        tree = [section for section in sections.values() if section['slides']]
+        for section in tree:
+            section['slideCount'] = len(section['slides'])
+            section['duration'] = sum(s['duration'] for s in section['slides'])
+        return {
+            'version': version,
+            'sections': tree,
+            'outline': [{
+                key: value for key, value in section.items() if key != 'slides'
+            } for section in tree],
+        }
+
+    def _apply_enrollment_deltas(self, deltas):
+        """Shift the stored enrollment counters in place.
+
+        :param deltas: dict ``{channel_id: (total_delta, active_delta)}``
+        """
+        deltas = {
+            channel_id: delta for channel_id, delta in deltas.items()
+            if channel_id and any(delta)
+        }
+        if not deltas:
+            return
+        values = ', '.join(['(%s, %s, %s)'] * len(deltas))
+        params = [value for channel_id, (total, active) in deltas.items() for value in (channel_id, total, active)]
+        self.env.cr.execute(f"""
+            UPDATE slide_channel AS channel
+               SET enrollment_count = channel.enrollment_count + delta.total,
+                   active_enrollment_count = channel.active_enrollment_count + delta.active
+              FROM (VALUES {values}) AS delta(id, total, active)
+             WHERE channel.id = delta.id
+        """, params)
+        self.browse(list(deltas)).invalidate_recordset(
+            ['enrollment_count', 'active_enrollment_count', 'is_enrollment_open']
+        )
+
+    def action_recompute_enrollment_counters(self):
+        """Resynchronise the stored counters from the enrollment table."""
+        channels = self or self.search([])
+        if not channels:
+            return True
+        self.env['seitech.enrollment'].flush_model(['channel_id', 'state'])
+        self.env.cr.execute("""
+            UPDATE slide_channel AS channel
+               SET enrollment_count = (
+                       SELECT COUNT(*) FROM seitech_enrollment
+                        WHERE channel_id = channel.id
+                   ),
+                   active_enrollment_count = (
+                       SELECT COUNT(*) FROM seitech_enrollment
+                        WHERE channel_id = channel.id AND state = 'active'
+                   )
+             WHERE channel.id IN %s
+        """, (tuple(channels.ids),))
+        channels.invalidate_recordset(
+            ['enrollment_count', 'active_enrollment_count', 'is_enrollment_open']
+        )
+        return True
 
     @api.depends('is_paid', 'list_price', 'is_on_sale', 'sale_price', 'currency_id')
     def _compute_display_price(self):
@@ -141,6 +316,34 @@ class SlideChannel(models.Model):
             else:
                 channel.display_price = f'{channel.currency_id.symbol}{channel.list_price:.2f}'
 
+    @api.depends('slide_ids.completion_time', 'slide_ids.is_category', 'slide_ids.active')
+    def _compute_duration_hours(self):
+        hours = defaultdict(float)
+        channel_ids = [channel_id for channel_id in self.ids if channel_id]
+        if channel_ids:
+            Slide = self.env['slide.slide']
+            lessons = [('channel_id', 'in', channel_ids), ('is_category', '=', False)]
+            for channel, total in Slide._read_group(lessons, ['channel_id'], ['completion_time:sum']):
+                hours[channel.id] += total or 0.0
+            for channel, count in Slide._read_group(
+                lessons + [('completion_time', '=', 0)], ['channel_id'], ['__count'],
+            ):
+                hours[channel.id] += count * DEFAULT_LESSON_HOURS
+        for channel in self:
+            channel.duration_hours = hours[channel.id]
+
+    @api.depends('is_paid', 'list_price')
+    def _compute_price_band(self):
+        for channel in self:
+            # Negative prices (data entry errors) fall in the free band too
+            channel.price_band = 'free'
+            if not channel.is_paid or channel.list_price <= 0:
+                continue
+            for key, _label, lower, upper in PRICE_BANDS[1:]:
+                if channel.list_price >= lower and (upper is None or channel.list_price < upper):
+                    channel.price_band = key
+                    break
+
     @api.depends('enrollment_deadline', 'max_enrollments', 'active_enrollment_count')
     def _compute_is_enrollment_open(self):
         today = fields.Date.today()
@@ -149,6 +352,27 @@ class SlideChannel(models.Model):
             capacity_ok = not channel.max_enrollments or channel.active_enrollment_count < channel.max_enrollments
             channel.is_enrollment_open = deadline_ok and capacity_ok
 
+    def _search_is_enrollment_open(self, operator, value):
+        if operator in ('=', '!='):
+            values = {bool(value)}
+        elif operator in ('in', 'not in'):
+            values = {bool(v) for v in value}
+        else:
+            raise UserError(_('Unsupported search on "Enrollment Open": %s', operator))
+        if operator in ('!=', 'not in'):
+            values = {True, False} - values
+        if len(values) != 1:
+            return [] if values else [('id', 'in', [])]
+
+        self.flush_model(['enrollment_deadline', 'max_enrollments', 'active_enrollment_count'])
+        open_channels = SQL("""
+            SELECT id
+              FROM slide_channel
+             WHERE (enrollment_deadline IS NULL OR enrollment_deadline >= %s)
+               AND (COALESCE(max_enrollments, 0) = 0 OR active_enrollment_count < max_enrollments)
+        """, fields.Date.today())
+        return [('id', 'in' if True in values else 'not in', open_channels)]
+
     @api.constrains('min_completion_for_certificate')
     def _check_min_completion(self):
         for channel in self:
@@ -162,23 +386,98 @@ class SlideChannel(models.Model):
                 if channel.start_date > channel.end_date:
                     raise ValidationError('End date must be after start date.')
 
+    @api.model
+    def _get_catalogue_facets(self, domain, category_id=None, level=None, delivery=None):
+        """Return catalogue facet counts computed from one grouped aggregation.
+
+        ``domain`` holds the non-faceted filters (publication, search, price
+        limits). Each facet is counted against every *other* active facet, so
+        a value's count is the number of courses selecting it would yield.
+        ``total`` is the number of courses matching all filters.
+        """
+        groups = self._read_group(
+            domain,
+            groupby=['seitech_category_id', 'difficulty_level', 'channel_type', 'price_band'],
+            aggregates=['__count', 'list_price:min', 'list_price:max'],
+        )
+
+        selected = {'category': category_id, 'level': level, 'delivery': delivery}
+        counts = {key: defaultdict(int) for key in ('category', 'level', 'delivery', 'price')}
+        categories = self.env['seitech.course.category']
+        total = 0
+        price_min = price_max = None
+        for category, difficulty, channel_type, band, count, cell_min, cell_max in groups:
+            cell = {'category': category.id, 'level': difficulty, 'delivery': channel_type}
+            mismatched = [key for key, value in selected.items() if value and cell[key] != value]
+            categories |= category
+            if not mismatched:
+                total += count
+                counts['price'][band] += count
+                price_min = cell_min if price_min is None else min(price_min, cell_min)
+                price_max = cell_max if price_max is None else max(price_max, cell_max)
+            for key in selected:
+                if not mismatched or mismatched == [key]:
+                    counts[key][cell[key]] += count
+
+        def selection_facet(field_name, key):
+            selection = self._fields[field_name]._description_selection(self.env)
+            return [{
+                'value': value,
+                'label': label,
+                'count': counts[key][value],
+            } for value, label in selection]
+
+        return {
+            'total': total,
+            'categories': [{
+                'id': category.id,
+                'name': category.name,
+                'slug': category.slug or str(category.id),
+                'count': counts['category'][category.id],
+            } for category in categories.sorted()],
+            'levels': selection_facet('difficulty_level', 'level'),
+            'deliveryMethods': selection_facet('channel_type', 'delivery'),
+            'priceBands': [{
+                'value': key,
+                'label': label,
+                'min': lower,
+                'max': upper,
+                'count': counts['price'][key],
+            } for key, label, lower, upper in PRICE_BANDS],
+            'priceRange': {'min': price_min or 0, 'max': price_max or 0},
+        }
+
+    @api.model
+    def _get_courses_by_product(self, products):
+        """Return ``{product_id: course}`` for the courses sold as ``products``."""
+        courses_by_product = {}
+        if products:
+            for course in self.search_fetch([('product_id', 'in', products.ids)], ['product_id']):
+                courses_by_product.setdefault(course.product_id.id, course)
+        return courses_by_product
+
     def action_create_product(self):
         """Create a linked product for e-commerce."""
         self.ensure_one()
-        if self.product_id:
-            return
+        self._prepare_products()
+        return self.product_id
 
-        product = self.env['product.product'].create({
-            'name': self.name,
+    def _prepare_products(self):
+        """Create the missing e-commerce products of these courses in one batch."""
+        channels = self.filtered(lambda c: not c.product_id)
+        if not channels:
+            return
+        products = self.env['product.product'].sudo().create([{
+            'name': channel.name,
             'type': 'service',
-            'list_price': self.list_price,
+            'list_price': channel.list_price,
             'sale_ok': True,
             'purchase_ok': False,
-            'description_sale': self.description_short,
-            'image_1920': self.image_1920,
-        })
-        self.product_id = product.id
-        return product
+            'description_sale': channel.description_short,
+            'image_1920': channel.image_1920,
+        } for channel in channels])
+        for channel, product in zip(channels, products):
+            channel.product_id = product
 
     def action_view_enrollments(self):
         """View all enrollments for this course."""
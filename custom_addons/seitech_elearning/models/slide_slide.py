@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
 
+# Fields that shape the cached course curriculum (see slide.channel)
+CURRICULUM_FIELDS = {
+    'name', 'sequence', 'is_category', 'category_id', 'channel_id',
+    'slide_type', 'completion_time', 'is_preview', 'active',
+}
+
 
 class SlideSlide(models.Model):
     """Extends slide.slide with additional lesson features."""
@@ -108,6 +114,26 @@ class SlideSlide(models.Model):
         help='Allow non-enrolled users to preview this lesson',
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        slides = super().create(vals_list)
+        slides.channel_id._bump_curriculum_version()
+        return slides
+
+    def write(self, vals):
+        if not CURRICULUM_FIELDS.intersection(vals):
+            return super().write(vals)
+        channels = self.channel_id
+        res = super().write(vals)
+        (channels | self.channel_id)._bump_curriculum_version()
+        return res
+
+    def unlink(self):
+        channels = self.channel_id
+        res = super().unlink()
+        channels._bump_curriculum_version()
+        return res
+
     @api.depends('resource_ids')
     def _compute_resource_count(self):
         for slide in self:
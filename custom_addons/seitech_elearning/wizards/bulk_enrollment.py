@@ -2,6 +2,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+# Jobs above this many students end on a report instead of a notification
+LARGE_JOB_SIZE = 100
+
 
 class BulkEnrollmentWizard(models.TransientModel):
     """Wizard for bulk enrollment of users to courses."""
@@ -35,6 +38,14 @@ class BulkEnrollmentWizard(models.TransientModel):
     )
     notes = fields.Text(string='Notes')
 
+    # Report
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('done', 'Done'),
+    ], default='draft')
+    result_message = fields.Char(string='Result', readonly=True)
+    error_log = fields.Text(string='Errors', readonly=True)
+
     @api.onchange('enrollment_type')
     def _onchange_enrollment_type(self):
         if self.enrollment_type != 'corporate':
@@ -43,41 +54,20 @@ class BulkEnrollmentWizard(models.TransientModel):
     def action_enroll(self):
         """Create enrollments for selected users."""
         self.ensure_one()
-        Enrollment = self.env['seitech.enrollment']
-
-        created = 0
-        skipped = 0
-        errors = []
-
-        for user in self.user_ids:
-            # Check if already enrolled
-            existing = Enrollment.search([
-                ('channel_id', '=', self.channel_id.id),
-                ('user_id', '=', user.id),
-            ], limit=1)
-
-            if existing:
-                skipped += 1
-                continue
-
-            try:
-                enrollment = Enrollment.create({
-                    'channel_id': self.channel_id.id,
-                    'user_id': user.id,
-                    'enrollment_type': self.enrollment_type,
-                    'expiration_date': self.expiration_date,
-                    'company_sponsor_id': self.company_sponsor_id.id if self.company_sponsor_id else False,
-                    'notes': self.notes,
-                    'state': 'active',
-                })
-                enrollment.action_activate()
-                created += 1
-
-                if self.send_notification:
-                    enrollment._send_enrollment_email('welcome')
-
-            except Exception as e:
-                errors.append(f'{user.name}: {str(e)}')
+        result = self.env['seitech.enrollment']._bulk_enroll(
+            self.channel_id,
+            self.user_ids,
+            {
+                'enrollment_type': self.enrollment_type,
+                'expiration_date': self.expiration_date,
+                'company_sponsor_id': self.company_sponsor_id.id if self.company_sponsor_id else False,
+                'notes': self.notes,
+            },
+            send_welcome=self.send_notification,
+        )
+        created = len(result['enrollments'])
+        skipped = len(result['skipped'])
+        errors = [f'{user.name}: {message}' for user, message in result['errors']]
 
         # Show result
         message = f'Enrolled {created} students successfully.'
@@ -86,6 +76,22 @@ class BulkEnrollmentWizard(models.TransientModel):
         if errors:
             message += f' {len(errors)} errors occurred.'
 
+        if errors or len(self.user_ids) > LARGE_JOB_SIZE:
+            # Large jobs and failures get a full report in the wizard
+            self.write({
+                'state': 'done',
+                'result_message': message,
+                'error_log': '\n'.join(errors),
+            })
+            return {
+                'type': 'ir.actions.act_window',
+                'name': 'Bulk Enrollment Report',
+                'res_model': self._name,
+                'res_id': self.id,
+                'view_mode': 'form',
+                'target': 'new',
+            }
+
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
@@ -72,44 +72,17 @@ class CertificateGenerationWizard(models.TransientModel):
     def action_generate(self):
         """Generate certificates for eligible enrollments."""
         self.ensure_one()
-        Certificate = self.env['seitech.certificate']
 
         if not self.enrollment_ids:
             raise UserError(_('No eligible enrollments found.'))
 
-        created = 0
-        errors = []
-
-        for enrollment in self.enrollment_ids:
-            try:
-                certificate = Certificate.create({
-                    'enrollment_id': enrollment.id,
-                    'channel_id': self.channel_id.id,
-                    'user_id': enrollment.user_id.id,
-                    'template_id': self.template_id.id if self.template_id else False,
-                    'issue_date': self.issue_date,
-                    'instructor_id': self.instructor_id.id if self.instructor_id else False,
-                    'completion_date': fields.Datetime.now(),
-                    'completion_percentage': enrollment.completion_percentage,
-                    'time_spent': enrollment.time_spent // 60,
-                })
-
-                # Issue the certificate
-                certificate.action_issue()
-
-                # Link to enrollment
-                enrollment.certificate_id = certificate.id
-
-                if self.send_notification:
-                    certificate._send_certificate_email()
-
-                created += 1
-
-            except Exception as e:
-                errors.append(f'{enrollment.user_id.name}: {str(e)}')
+        certificates, errors = self._issue_certificates(self.enrollment_ids)
 
         # Show result
-        message = f'Generated {created} certificates successfully.'
+        message = (
+            f'Issued {len(certificates)} certificates. '
+            'PDFs are being generated in the background.'
+        )
         if errors:
             message += f' {len(errors)} errors occurred.'
 
@@ -123,3 +96,45 @@ class CertificateGenerationWizard(models.TransientModel):
                 'sticky': False,
             }
         }
+
+    def _issue_certificates(self, enrollments):
+        """Create and issue the certificates of ``enrollments``, in one batch if possible.
+
+        Returns ``(certificates, errors)``; when the batch fails, each
+        enrollment is retried on its own so one bad record does not block
+        the others.
+        """
+        try:
+            with self.env.cr.savepoint():
+                completion_date = fields.Datetime.now()
+                certificates = self.env['seitech.certificate'].create([{
+                    'enrollment_id': enrollment.id,
+                    'channel_id': self.channel_id.id,
+                    'user_id': enrollment.user_id.id,
+                    'template_id': self.template_id.id if self.template_id else False,
+                    'issue_date': self.issue_date,
+                    'instructor_id': self.instructor_id.id if self.instructor_id else False,
+                    'completion_date': completion_date,
+                    'completion_percentage': enrollment.completion_percentage,
+                    'time_spent': enrollment.time_spent // 60,
+                } for enrollment in enrollments])
+
+                # Issue the certificates; PDFs and emails are handled by the render queue
+                certificates.action_issue(send_mail=self.send_notification)
+
+                # Link to enrollments
+                for enrollment, certificate in zip(enrollments, certificates):
+                    enrollment.certificate_id = certificate.id
+            return certificates, []
+        except Exception as e:
+            self.env.invalidate_all()
+            if len(enrollments) == 1:
+                return self.env['seitech.certificate'], [f'{enrollments.user_id.name}: {e}']
+            # Isolate the failing enrollments
+            certificates = self.env['seitech.certificate']
+            errors = []
+            for enrollment in enrollments:
+                issued, enrollment_errors = self._issue_certificates(enrollment)
+                certificates |= issued
+                errors += enrollment_errors
+            return certificates, errors
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Generate the missing QR codes of issued certificates.
+
+QR codes are generated lazily when a certificate is first rendered or
+verified. This script backfills them in bulk (e.g. before a mass reprint),
+committing after every batch so it can be interrupted and resumed.
+
+Usage:
+    python backfill_certificate_qr_codes.py
+    python backfill_certificate_qr_codes.py --batch-size 1000
+"""
+import argparse
+import sys
+
+sys.path.insert(0, '/opt/odoo/odoo')
+
+import odoo
+from odoo import api, SUPERUSER_ID
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill certificate QR codes.')
+    parser.add_argument('--database', default='seitech', help='Odoo database name')
+    parser.add_argument('--config', default='/opt/odoo/config/odoo.conf', help='Odoo configuration file')
+    parser.add_argument('--batch-size', type=int, default=500, help='Certificates per transaction')
+    args = parser.parse_args()
+
+    odoo.tools.config.parse_config([f'--config={args.config}'])
+    registry = odoo.modules.registry.Registry.new(args.database)
+
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        total = env['seitech.certificate']._backfill_qr_codes(batch_size=args.batch_size)
+
+    print(f'✓ Checked QR codes of {total} certificates')
+
+
+if __name__ == '__main__':
+    main()
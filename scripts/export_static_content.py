@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Export published CMS and catalogue content to static JSON files.
+
+The Next.js build can read these files instead of calling the live Odoo
+endpoints. Every published seitech.cms.* record, course, course category
+and active instructor profile is streamed into versioned JSON files.
+
+Exports are incremental: manifest.json records a source stamp and a content
+hash per file. Files whose source records did not change since the last
+export are skipped without being serialized, re-serialized files are only
+rewritten when their content differs, and files whose records were
+unpublished or deleted are removed.
+
+Usage:
+    python export_static_content.py --output frontend/public/content
+    python export_static_content.py --output frontend/public/content --full
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, '/opt/odoo/odoo')
+
+import odoo
+from odoo import api, SUPERUSER_ID
+
+SCHEMA_VERSION = 1
+BATCH_SIZE = 200
+MANIFEST = 'manifest.json'
+
+# Exported values that change without a write_date bump
+COURSE_COUNTERS = ['enrollment_count', 'members_count', 'rating_avg', 'rating_count']
+CATEGORY_COUNTERS = ['course_count']
+INSTRUCTOR_COUNTERS = ['course_count', 'average_rating', 'total_reviews']
+
+
+# ============ Helpers ============
+
+def iter_records(env, model, domain, order='id'):
+    """Yield records in batches, dropping the ORM cache between batches."""
+    Model = env[model]
+    ids = Model.search(domain, order=order).ids
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield from Model.browse(ids[start:start + BATCH_SIZE])
+        env.invalidate_all()
+
+
+def stamp(*records):
+    """Latest write_date among the given records (empty records ignored)."""
+    dates = [record.write_date for record in records if record and record.write_date]
+    return max(dates).isoformat() if dates else ''
+
+
+def table_stamp(env, model, domain):
+    """Count and latest write_date of the records matching ``domain``."""
+    [(count, last_write)] = env[model]._read_group(domain, aggregates=['__count', 'write_date:max'])
+    return f'{count}@{last_write.isoformat() if last_write else ""}'
+
+
+def counters_stamp(env, model, domain, field_names):
+    """Hash of counters that change without touching write_date.
+
+    Counters such as enrollment_count are updated in SQL and ratings are
+    computed from other tables, so they are compared by value.
+    """
+    digest = hashlib.sha1()
+    for record in iter_records(env, model, domain):
+        digest.update(repr(record_counters(record, field_names)).encode())
+    return digest.hexdigest()
+
+
+def record_counters(record, field_names):
+    return [record.id] + [record[name] for name in field_names]
+
+
+def safe_name(value):
+    """Make a slug or id usable as a file name."""
+    return re.sub(r'[^\w.-]+', '-', str(value)).strip('-') or 'item'
+
+
+def json_value(data):
+    yield json.dumps(data, default=str)
+
+
+def json_list(items):
+    """Serialize an iterable of dicts as a JSON array, item by item."""
+    yield '['
+    for index, item in enumerate(items):
+        if index:
+            yield ', '
+        yield json.dumps(item, default=str)
+    yield ']'
+
+
+# ============ CMS ============
+
+def cms_units(env):
+    """Yield (path, stamp, chunks) for every CMS export file."""
+    if 'seitech.cms.content' not in env:
+        return
+    content = env['seitech.cms.content']
+    version = str(content.get_content_version())
+    published = [('is_published', '=', True)]
+
+    # Composite documents span several models: stamped by the content version
+    yield 'cms/settings.json', version, lambda: json_value(content._build_settings())
+    yield 'cms/homepage.json', version, lambda: json_value(content._build_homepage())
+    menu_types = env['seitech.cms.navigation']._fields['menu_type'].get_values(env)
+    for menu_type in menu_types:
+        yield (f'cms/navigation/{menu_type}.json', version,
+               lambda menu_type=menu_type: json_value(content._build_navigation(menu_type)))
+    for page in iter_records(env, 'seitech.cms.page', published):
+        yield (f'cms/pages/{safe_name(page.slug)}.json', version,
+               lambda page=page: json_value(page.get_api_data()))
+
+    collections = [
+        ('testimonials', 'seitech.cms.testimonial', 'sequence, id desc'),
+        ('faqs', 'seitech.cms.faq', 'sequence, id'),
+        ('faq-categories', 'seitech.cms.faq.category', 'sequence, name'),
+        ('team', 'seitech.cms.team.member', 'sequence, name'),
+        ('partners', 'seitech.cms.partner', 'partner_type, sequence, name'),
+        ('services', 'seitech.cms.service', 'category_id, sequence, name'),
+        ('service-categories', 'seitech.cms.service.category', 'sequence, name'),
+        ('statistics', 'seitech.cms.statistic', 'sequence'),
+    ]
+    for name, model, order in collections:
+        yield (f'cms/{name}.json', version,
+               lambda model=model, order=order: json_list(
+                   record.get_api_data() for record in iter_records(env, model, published, order)))
+
+    # Detail documents for routes with their own page
+    for member in iter_records(env, 'seitech.cms.team.member', published + [('slug', '!=', False)]):
+        yield (f'cms/team/{safe_name(member.slug)}.json', stamp(member),
+               lambda member=member: json_value(member.get_api_data()))
+    for service in iter_records(env, 'seitech.cms.service', published):
+        yield (f'cms/services/{safe_name(service.slug)}.json', stamp(service, service.category_id),
+               lambda service=service: json_value(service.get_api_data()))
+
+
+# ============ Catalogue ============
+
+def instructor_data(instructor):
+    """Public instructor profile (no contact or revenue details)."""
+    return {
+        'id': instructor.id,
+        'name': instructor.name,
+        'title': instructor.title or '',
+        'expertise': instructor.expertise or '',
+        'shortBio': instructor.short_bio or '',
+        'bio': instructor.bio or '',
+        'qualifications': instructor.qualifications or '',
+        'image': f'/web/image/seitech.instructor/{instructor.id}/image' if instructor.image else None,
+        'courseCount': instructor.course_count,
+        'averageRating': instructor.average_rating,
+        'totalReviews': instructor.total_reviews,
+        'isFeatured': instructor.is_featured,
+        'social': {
+            'linkedin': instructor.linkedin_url or '',
+            'twitter': instructor.twitter_url or '',
+            'youtube': instructor.youtube_url or '',
+        },
+    }
+
+
+def category_data(category):
+    return {
+        'id': category.id,
+        'name': category.name,
+        'slug': category.slug or str(category.id),
+        'description': category.description or '',
+        'icon': category.icon or '',
+        'imageUrl': f'/web/image/seitech.course.category/{category.id}/image' if category.image else None,
+        'courseCount': category.course_count or 0,
+        'parentId': category.parent_id.id if category.parent_id else None,
+    }
+
+
+def catalogue_units(env):
+    """Yield (path, stamp, chunks) for every catalogue export file."""
+    if 'seitech.course.category' not in env:
+        return
+    from odoo.addons.seitech_elearning.controllers.course_api import CourseApiController
+    serializer = CourseApiController()
+
+    courses_domain = [('is_published', '=', True)]
+    categories_domain = [('is_published', '=', True)]
+    instructors_domain = [('state', '=', 'active')]
+    catalogue_stamp = '|'.join([
+        table_stamp(env, 'slide.channel', courses_domain),
+        table_stamp(env, 'seitech.course.category', categories_domain),
+        table_stamp(env, 'seitech.instructor', instructors_domain),
+        counters_stamp(env, 'slide.channel', courses_domain, COURSE_COUNTERS),
+        counters_stamp(env, 'seitech.course.category', categories_domain, CATEGORY_COUNTERS),
+        counters_stamp(env, 'seitech.instructor', instructors_domain, INSTRUCTOR_COUNTERS),
+    ])
+
+    yield ('catalogue/courses.json', catalogue_stamp,
+           lambda: json_list(serializer._get_course_data(course) for course in iter_records(
+               env, 'slide.channel', courses_domain, 'enrollment_count desc, id')))
+    yield ('catalogue/categories.json', catalogue_stamp,
+           lambda: json_list(category_data(category) for category in iter_records(
+               env, 'seitech.course.category', categories_domain, 'sequence, name')))
+    yield ('catalogue/instructors.json', catalogue_stamp,
+           lambda: json_list(instructor_data(instructor) for instructor in iter_records(
+               env, 'seitech.instructor', instructors_domain, 'name')))
+
+    for course in iter_records(env, 'slide.channel', courses_domain):
+        course_stamp = (f'{stamp(course, course.seitech_category_id, course.primary_instructor_id)}'
+                        f'#{course.curriculum_version}#{record_counters(course, COURSE_COUNTERS)}')
+
+        def course_detail(course=course):
+            data = serializer._get_course_data(course)
+            data['curriculum'] = course._get_curriculum()['sections']
+            data['faqs'] = []
+            return json_value(data)
+
+        yield f'catalogue/courses/{safe_name(course.seo_name or course.id)}.json', course_stamp, course_detail
+
+    for instructor in iter_records(env, 'seitech.instructor', instructors_domain):
+        instructor_stamp = f'{stamp(instructor)}#{record_counters(instructor, INSTRUCTOR_COUNTERS)}'
+        yield (f'catalogue/instructors/{instructor.id}.json', instructor_stamp,
+               lambda instructor=instructor: json_value(instructor_data(instructor)))
+
+
+# ============ Export ============
+
+def load_manifest(root):
+    path = os.path.join(root, MANIFEST)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('schema') == SCHEMA_VERSION:
+            return manifest
+    return {'schema': SCHEMA_VERSION, 'version': 0, 'files': {}}
+
+
+def write_file(root, path, chunks, version):
+    """Stream ``chunks`` into a temporary file next to ``path``.
+
+    Returns the temporary file name and the hash of the data part.
+    """
+    target = os.path.join(root, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    digest = hashlib.sha1()
+    tmp = f'{target}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(f'{{"version": {version}, "data": ')
+        for chunk in chunks:
+            digest.update(chunk.encode('utf-8'))
+            f.write(chunk)
+        f.write('}\n')
+    return tmp, digest.hexdigest()
+
+
+def export(env, root, full=False):
+    manifest = load_manifest(root)
+    files = manifest['files']
+    version = manifest['version'] + 1
+    stats = {'written': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0, 'duplicates': 0}
+    seen = set()
+
+    for units in (cms_units(env), catalogue_units(env)):
+        for path, source_stamp, build in units:
+            if path in seen:
+                # e.g. two courses with the same seo_name: the first one wins
+                print(f'⚠ Duplicate export path {path}, skipped', file=sys.stderr)
+                stats['duplicates'] += 1
+                continue
+            seen.add(path)
+            entry = files.get(path)
+            exists = os.path.exists(os.path.join(root, path))
+            if not full and exists and entry and entry['stamp'] == source_stamp:
+                stats['skipped'] += 1
+                continue
+            tmp, digest = write_file(root, path, build(), version)
+            if exists and entry and entry['hash'] == digest:
+                os.remove(tmp)
+                entry['stamp'] = source_stamp
+                stats['unchanged'] += 1
+                continue
+            os.replace(tmp, os.path.join(root, path))
+            files[path] = {'stamp': source_stamp, 'hash': digest, 'version': version}
+            stats['written'] += 1
+
+    for path in set(files) - seen:
+        target = os.path.join(root, path)
+        if os.path.exists(target):
+            os.remove(target)
+        del files[path]
+        stats['removed'] += 1
+
+    if stats['written'] or stats['removed']:
+        manifest['version'] = version
+        manifest['exportedAt'] = datetime.now(timezone.utc).isoformat()
+    with open(os.path.join(root, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest['version'], stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export CMS and catalogue content to static JSON.')
+    parser.add_argument('--output', required=True, help='Export directory')
+    parser.add_argument('--database', default='seitech', help='Odoo database name')
+    parser.add_argument('--config', default='/opt/odoo/config/odoo.conf', help='Odoo configuration file')
+    parser.add_argument('--full', action='store_true', help='Rebuild every file, ignoring source stamps')
+    args = parser.parse_args()
+
+    odoo.tools.config.parse_config([f'--config={args.config}'])
+    registry = odoo.modules.registry.Registry.new(args.database)
+
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        version, stats = export(env, args.output, full=args.full)
+
+    print(f"✓ Export version {version}: {stats['written']} written, {stats['unchanged']} unchanged, "
+          f"{stats['skipped']} skipped, {stats['removed']} removed, {stats['duplicates']} duplicates")
+
+
+if __name__ == '__main__':
+    main()